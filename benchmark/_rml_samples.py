@@ -0,0 +1,101 @@
+"""
+Synthetic RML sources used by the benchmarks
+"""
+import os
+
+_PETAL = '''
+<petal name="petal_{i}" param="name, items, flag">
+    <formatter>
+        <text.chat temperature="0.2" max_tokens="256">
+            <message role="'system'">
+                You are assistant number {i}. Answer the question of the user politely.
+                    Keep the answer short, and use the same language as the user.
+                Escaped characters: << >> {{{{braces}}}}
+            </message>
+            <if cond="flag">
+                <message role="'user'">Hello, my name is {{name}}!</message>
+            </if>
+            <for in="items" var="item">
+                <message role="'assistant'">Item {{item}} of {{len(items)}}</message>
+            </for>
+        </text.chat>
+    </formatter>
+    <parser>
+        Answer: {{result = __}}
+    </parser>
+</petal>
+'''
+
+_TEMPLATE = '''
+<!-- Template number {i} -->
+<template name="template_{i}" param="prefix, suffix" slot="@body">
+    <dict>
+        <dict-item key="content">{{prefix}}<body/>{{suffix}}</dict-item>
+        <option name="'index'" value="{i}"/>
+    </dict>
+</template>
+'''
+
+
+def large_rml_source(n_petals: int) -> str:
+    return ''.join(_PETAL.format(i=i) + _TEMPLATE.format(i=i) for i in range(n_petals))
+
+
+CHAT_PETAL = '''
+<import path="common"/>
+
+<template name="context" param="chunks" slot="@title">
+    <for in="chunks" var="chunk">
+        [<title/> {chunk['id']}] {chunk['text']}
+    </for>
+</template>
+
+<petal name="rag" param="question, chunks, history, flag">
+    <formatter>
+        <text.chat temperature="0.2" max_tokens="256">
+            <message role="'system'">
+                You are a helpful assistant. Answer the question with the context below.
+                <context chunks="chunks">Chunk</context>
+            </message>
+            <for in="history" var="turn">
+                <message role="turn['role']">{turn['content']}</message>
+            </for>
+            <if cond="flag">
+                <message role="'user'">{question}</message>
+            </if>
+        </text.chat>
+    </formatter>
+    <parser>
+        Answer: {result = __}
+    </parser>
+</petal>
+'''
+
+
+def chat_petal_args(n_chunks: int = 20, n_turns: int = 10) -> dict:
+    return {
+        'question': 'What is Rosemary?',
+        'chunks': [{'id': i, 'text': f'Rosemary is a template engine, chunk {i}.'} for i in range(n_chunks)],
+        'history': [{'role': 'user' if i % 2 == 0 else 'assistant', 'content': f'Message {i}'}
+                    for i in range(n_turns)],
+        'flag': True,
+    }
+
+
+def write_rml(directory: str, name: str, src: str) -> str:
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(src)
+    return path
+
+
+def placeholder_petal(n_placeholders: int) -> str:
+    lines = '\n'.join(f'Field {i}: {{user["name"]}} / {{values[{i} % len(values)] * 2}} / {{flag and "yes"}}'
+                      for i in range(n_placeholders))
+    return f'''
+<petal name="placeholders" param="user, values, flag">
+    <formatter>
+        {lines}
+    </formatter>
+</petal>
+'''
@@ -0,0 +1,78 @@
+"""
+Benchmark of evaluating the placeholders of a placeholder-heavy template,
+comparing evaluation of the raw source strings with the cached code objects of DataExpression,
+and of evaluating bare names and attribute paths with eval and with the direct lookups of DataExpression.
+
+Run from the repository root: python -m benchmark.bench_data_expression
+"""
+import tempfile
+import time
+from types import SimpleNamespace
+
+from src.rosemary_ai.parser.data_expression import DataExpression, new_context
+from src.rosemary_ai.parser.transformer import TextToken
+from src.rosemary_ai.rosemary import _build
+
+from ._rml_samples import placeholder_petal, write_rml
+
+N_PLACEHOLDERS = 200
+REPEAT = 200
+SIMPLE_SOURCES = ['name', 'flag', 'user.name', 'user.address.city']
+SIMPLE_REPEAT = 100000
+
+
+def _bench_simple_expressions():
+    context = new_context({'name': 'Alice', 'flag': True,
+                           'user': SimpleNamespace(name='Alice', address=SimpleNamespace(city='Paris'))})
+    print(f'{len(SIMPLE_SOURCES)} names and attribute paths, {SIMPLE_REPEAT} rounds')
+    for lookup in [False, True]:
+        expressions = [DataExpression(source) for source in SIMPLE_SOURCES]
+        if not lookup:
+            for expression in expressions:
+                expression._name = None  # noqa, evaluated by eval as any other expression
+        start = time.perf_counter()
+        for _ in range(SIMPLE_REPEAT):
+            for expression in expressions:
+                expression.evaluate(context)
+        elapsed = time.perf_counter() - start
+        print(f'{"direct lookups" if lookup else "eval":<23} {elapsed / SIMPLE_REPEAT * 1e6:8.3f} us per round')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        rosemary = _build(write_rml(directory, 'placeholders.rml', placeholder_petal(N_PLACEHOLDERS)))
+
+    petal = rosemary.namespace['placeholders']
+    sources = [token.text for token in petal.formatter_rml.children[0].text_tokens
+               if token.type == TextToken.TYPE.INDICATOR]
+    expressions = [DataExpression(source) for source in sources]
+    context = {'user': {'name': 'Alice'}, 'values': list(range(10)), 'flag': True}
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for source in sources:
+            eval(source, context.copy())
+    source_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for expression in expressions:
+            expression.evaluate(context)
+    cached_elapsed = time.perf_counter() - start
+
+    formatter = rosemary.get_formatter('placeholders')
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        formatter(**context)
+    format_elapsed = time.perf_counter() - start
+
+    print(f'{len(sources)} placeholders, {REPEAT} rounds')
+    print(f'eval of source strings: {source_elapsed / REPEAT * 1000:8.3f} ms per round')
+    print(f'cached code objects:    {cached_elapsed / REPEAT * 1000:8.3f} ms per round')
+    print(f'format the petal:       {format_elapsed / REPEAT * 1000:8.3f} ms per round')
+
+    _bench_simple_expressions()
+
+
+if __name__ == '__main__':
+    main()
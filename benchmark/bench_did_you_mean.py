@@ -0,0 +1,97 @@
+"""
+Benchmark of the spelling suggestions for unknown names, comparing the former brute-force did_you_mean,
+which generated every single-edit variant of the name, with the symmetric deletion index.
+
+Run from the repository root: python -m benchmark.bench_did_you_mean
+"""
+import random
+import time
+from typing import Set
+
+from src.rosemary_ai._utils.str_utils import did_you_mean, SuggestionIndex
+from src.rosemary_ai.parser._utils import RESERVED_ATTR_NAMES
+
+VALID_CHARACTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_'
+WORDS = ['chat', 'message', 'user', 'system', 'prompt', 'summary', 'translate', 'review', 'code', 'query', 'answer',
+         'context', 'history', 'title', 'item', 'list', 'format', 'parse', 'image', 'file', 'tool', 'search', 'plan',
+         'step', 'role', 'name', 'value', 'result', 'score', 'report']
+NAMESPACE_SIZES = [100, 1000, 5000]
+N_QUERIES = 2000
+
+
+def brute_force_did_you_mean(s: str, candidates: Set[str]) -> str | None:
+    for i in range(len(s)):
+        prefix = s[:i]
+        suffix = s[i + 1:]
+        if prefix + suffix in candidates:
+            return prefix + suffix
+        for c in VALID_CHARACTERS:
+            if prefix + c + suffix in candidates:
+                return prefix + c + suffix
+            if prefix + c + s[i] + suffix in candidates:
+                return prefix + c + s[i] + suffix
+    return None
+
+
+def _names(size: int, rng: random.Random) -> Set[str]:
+    names = set()
+    while len(names) < size:
+        names.add('_'.join(rng.sample(WORDS, rng.randint(1, 3))))
+    return names
+
+
+def _typo(name: str, rng: random.Random) -> str:
+    i = rng.randrange(len(name))
+    match rng.randrange(3):
+        case 0:
+            return name[:i] + name[i + 1:]
+        case 1:
+            return name[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz') + name[i + 1:]
+        case _:
+            return name[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz') + name[i:]
+
+
+def _measure(name_sets, func) -> float:
+    start = time.perf_counter()
+    for names, queries in name_sets:
+        for query in queries:
+            func(query, names)
+    return time.perf_counter() - start
+
+
+def _report(title: str, name_sets, suggest=did_you_mean):
+    n_queries = sum(len(queries) for _, queries in name_sets)
+    brute_force = _measure(name_sets, brute_force_did_you_mean)
+    indexed = _measure(name_sets, suggest)
+
+    print(title)
+    print(f'  brute force:          {brute_force / n_queries * 1e6:8.1f} us per lookup')
+    print(f'  suggestion index:     {indexed / n_queries * 1e6:8.1f} us per lookup')
+
+
+def main():
+    rng = random.Random(0)
+
+    attribute_sets = [(names, [_typo(rng.choice(sorted(names)), rng) for _ in range(N_QUERIES // 10)])
+                      for names in RESERVED_ATTR_NAMES.values() if names]
+    _report(f'reserved attribute names ({len(attribute_sets)} sets)', attribute_sets)
+
+    for size in NAMESPACE_SIZES:
+        names = _names(size, rng)
+        sorted_names = sorted(names)
+        queries = [_typo(rng.choice(sorted_names), rng) for _ in range(N_QUERIES)]
+
+        start = time.perf_counter()
+        index = SuggestionIndex(names)
+        build_elapsed = time.perf_counter() - start
+
+        _report(f'namespace of {size} names', [(names, queries)], lambda query, _: index.suggest(query, 1))
+        start = time.perf_counter()
+        for query in queries:
+            index.suggest(query, limit=5)
+        print(f'  top 5 within 2 edits: {(time.perf_counter() - start) / len(queries) * 1e6:8.1f} us per lookup'
+              f' (index built in {build_elapsed * 1000:.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark of building long texts from many fragments with the FormatExecutor, comparing the previous concatenation
+of each fragment to the text of the scope, which copies the whole text every time, with the buffers of fragments
+joined once at the end of the scope. The time per fragment should stay flat as the number of fragments grows.
+
+Run from the repository root: python -m benchmark.bench_format_executor
+"""
+import tempfile
+import time
+
+from src.rosemary_ai.parser.compiler import compiled_formatter
+from src.rosemary_ai.parser.data_expression import DataExpression
+from src.rosemary_ai.parser.environment import build_environment
+from src.rosemary_ai.parser.executor import FormatExecutor
+from src.rosemary_ai.rosemary import _build
+
+from ._rml_samples import CHAT_PETAL, chat_petal_args, write_rml
+
+N_FRAGMENTS = [1000, 3000, 10000, 30000]
+N_CHUNKS = [100, 1000, 3000]
+FRAGMENT = 'Rosemary is a template engine. '
+
+
+class ConcatFormatExecutor(FormatExecutor):
+    """
+    The previous implementation, concatenating each fragment to the text of the scope.
+    """
+
+    def execute(self, value, variables):
+        if isinstance(value, DataExpression):
+            value = str(value.evaluate(variables))
+
+        if self.scope_stack[-1] is None:
+            self.scope_stack[-1] = value
+        elif isinstance(self.scope_stack[-1], str) and isinstance(value, str):
+            self.scope_stack[-1] += value
+        elif not isinstance(self.scope_stack[-1], list):
+            self.scope_stack[-1] = [self.scope_stack[-1], value]
+        elif isinstance(value, str) and isinstance(self.scope_stack[-1][-1], str):
+            self.scope_stack[-1][-1] += value
+        else:
+            self.scope_stack[-1].append(value)
+
+        return True
+
+    def end_scope(self, scope_type: str, succeed=True):
+        if scope_type == 'list' or scope_type == 'dict':
+            return
+        obj = self.scope_stack.pop()
+        if not succeed:
+            return
+        if scope_type == 'list_item':
+            self.scope_stack[-1] += [obj]
+        else:
+            self.scope_stack[-1][self.key_stack.pop()] = obj
+
+    def get_result(self):
+        return self.scope_stack[0]
+
+
+def _build_text(executor_class, n_fragments: int) -> str:
+    executor = executor_class()
+    executor.begin_scope('dict')
+    executor.begin_scope('dict_item', 'content')
+    for _ in range(n_fragments):
+        executor.execute(FRAGMENT, {})
+    executor.end_scope('dict_item')
+    return executor.get_result()['content']
+
+
+def _format(executor_class, petal, args):
+    executor = executor_class()
+    compiled_formatter(petal)(build_environment(petal, dict(args)), executor)
+    return executor.get_result()
+
+
+def main():
+    print('fragments in a dict item:')
+    for n_fragments in N_FRAGMENTS:
+        times = []
+        for executor_class in [ConcatFormatExecutor, FormatExecutor]:
+            start = time.perf_counter()
+            text = _build_text(executor_class, n_fragments)
+            times.append(time.perf_counter() - start)
+            assert len(text) == n_fragments * len(FRAGMENT)
+        print(f'  {n_fragments:>7} fragments: concatenation {times[0] / n_fragments * 1e9:8.1f} ns per fragment, '
+              f'buffers {times[1] / n_fragments * 1e9:6.1f} ns per fragment')
+
+    with tempfile.TemporaryDirectory() as directory:
+        rosemary = _build(write_rml(directory, 'chat.rml', CHAT_PETAL))
+    petal = rosemary.namespace['rag']
+
+    print('RAG prompt:')
+    for n_chunks in N_CHUNKS:
+        args = chat_petal_args(n_chunks)
+        times = []
+        results = []
+        for executor_class in [ConcatFormatExecutor, FormatExecutor]:
+            start = time.perf_counter()
+            results.append(_format(executor_class, petal, args))
+            times.append(time.perf_counter() - start)
+        assert results[0] == results[1]
+        size = len(results[1]['messages'][0]['system'])
+        print(f'  {n_chunks:>5} chunks ({size / 1000:6.0f} kB): concatenation {times[0] * 1000:8.1f} ms, '
+              f'buffers {times[1] * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
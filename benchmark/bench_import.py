@@ -0,0 +1,44 @@
+"""
+Benchmark of the import time of the package, and of the first load of the built-in templates,
+which is deferred until they are used.
+
+Run from the repository root: python -m benchmark.bench_import
+"""
+import statistics
+import subprocess
+import sys
+
+REPEAT = 5
+
+_IMPORT_CODE = '''
+import time
+start = time.perf_counter()
+import src.rosemary_ai
+print(time.perf_counter() - start)
+'''
+
+_COMMON_CODE = '''
+import time
+import src.rosemary_ai
+from src.rosemary_ai.parser.rml_parser import get_common_namespace
+start = time.perf_counter()
+get_common_namespace()
+print(time.perf_counter() - start)
+'''
+
+
+def _run(code: str) -> float:
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    import_times = [_run(_IMPORT_CODE) for _ in range(REPEAT)]
+    common_times = [_run(_COMMON_CODE) for _ in range(REPEAT)]
+
+    print(f'import rosemary_ai:        median {statistics.median(import_times) * 1000:8.2f} ms')
+    print(f'first common namespace:    median {statistics.median(common_times) * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
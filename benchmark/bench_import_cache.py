@@ -0,0 +1,52 @@
+"""
+Benchmark of loading one RML file per tenant, where all the files import the same large library,
+with and without the process-wide cache of imported files.
+
+Run from the repository root: python -m benchmark.bench_import_cache
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Tuple
+
+from src.rosemary_ai.parser.import_cache import IMPORT_CACHE
+from src.rosemary_ai.rosemary import _build, set_import_cache_size
+
+from ._rml_samples import large_rml_source, write_rml
+
+N_TENANTS = 20
+LIBRARY_SIZE = 50
+
+
+def _load_tenants(directory: str) -> Tuple[float, int]:
+    IMPORT_CACHE.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    tenants = [_build(os.path.join(directory, f'tenant_{i}.rml')) for i in range(N_TENANTS)]
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(tenants) == N_TENANTS
+    return elapsed, peak
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        write_rml(directory, 'library.rml', large_rml_source(LIBRARY_SIZE))
+        for i in range(N_TENANTS):
+            write_rml(directory, f'tenant_{i}.rml', '<import path="library.rml" as="lib"/>')
+
+        set_import_cache_size(0)
+        uncached_elapsed, uncached_peak = _load_tenants(directory)
+        set_import_cache_size(256)
+        cached_elapsed, cached_peak = _load_tenants(directory)
+
+    print(f'{N_TENANTS} tenants importing a library of {LIBRARY_SIZE} petals and templates')
+    print(f'without the import cache: {uncached_elapsed * 1000:8.1f} ms, peak memory {uncached_peak / 2 ** 20:6.1f} MiB')
+    print(f'with the import cache:    {cached_elapsed * 1000:8.1f} ms, peak memory {cached_peak / 2 ** 20:6.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of loading a large RML file of which only a few petals are used, comparing the full parse on load
+with the lazy mode, where the petals and templates are indexed on load and each of them is parsed on first use,
+and of loading a file importing many files of which only one is used, where the lazy mode only loads that one.
+
+Run from the repository root: python -m benchmark.bench_lazy_parse
+"""
+import gc
+import tempfile
+import time
+import tracemalloc
+
+from src.rosemary_ai.parser.rml_parser import RosemaryParser
+from src.rosemary_ai.rosemary import set_lazy_parse, set_import_cache_size, _format
+
+from ._rml_samples import large_rml_source, write_rml
+
+N_PETALS = [200, 1000, 3000]
+N_USED = 20
+N_IMPORTED_FILES = 20
+N_IMPORTED_PETALS = 200
+ARGS = {'name': 'Rosemary', 'items': [1, 2, 3], 'flag': True}
+
+
+def _load_and_use(path: str) -> (float, float):
+    start = time.perf_counter()
+    namespace = RosemaryParser(path).namespace
+    load_elapsed = time.perf_counter() - start
+    outputs = [_format(namespace[f'petal_{i}'], ARGS) for i in range(N_USED)]
+    assert len(outputs) == N_USED
+    return load_elapsed, time.perf_counter() - start - load_elapsed
+
+
+def _memory(path: str) -> int:
+    gc.collect()
+    tracemalloc.start()
+    namespace = RosemaryParser(path).namespace
+    for i in range(N_USED):
+        _format(namespace[f'petal_{i}'], ARGS)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def _imports(directory: str):
+    imports = []
+    for i in range(N_IMPORTED_FILES):
+        write_rml(directory, f'lib_{i}.rml', '<import path="common"/>\n' + large_rml_source(N_IMPORTED_PETALS))
+        imports.append(f'<import path="lib_{i}.rml" as="lib_{i}"/>')
+    path = write_rml(directory, 'imports.rml', '\n'.join(imports))
+
+    print(f'{N_IMPORTED_FILES} imported files of {N_IMPORTED_PETALS} petals and templates, one petal used:')
+    for lazy in [False, True]:
+        set_lazy_parse(lazy)
+        try:
+            start = time.perf_counter()
+            namespace = RosemaryParser(path).namespace
+            load_elapsed = time.perf_counter() - start
+            _format(namespace['lib_0.petal_0'], ARGS)
+            use_elapsed = time.perf_counter() - start - load_elapsed
+        finally:
+            set_lazy_parse(False)
+        print(f'  {"lazy" if lazy else "full":>4}: load {load_elapsed * 1000:9.1f} ms, '
+              f'first use {use_elapsed * 1000:7.1f} ms')
+
+
+def main():
+    set_import_cache_size(0)
+    with tempfile.TemporaryDirectory() as directory:
+        for n_petals in N_PETALS:
+            src = '<import path="common"/>\n' + large_rml_source(n_petals)
+            path = write_rml(directory, f'petals_{n_petals}.rml', src)
+            print(f'{n_petals} petals and templates, {N_USED} petals used:')
+            for lazy in [False, True]:
+                set_lazy_parse(lazy)
+                try:
+                    load_elapsed, use_elapsed = _load_and_use(path)
+                    size = _memory(path)
+                finally:
+                    set_lazy_parse(False)
+                print(f'  {"lazy" if lazy else "full":>4}: load {load_elapsed * 1000:9.1f} ms, '
+                      f'first use {use_elapsed * 1000:7.1f} ms, memory {size / 2 ** 20:7.2f} MiB')
+
+        _imports(directory)
+
+
+if __name__ == '__main__':
+    main()
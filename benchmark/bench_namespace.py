@@ -0,0 +1,74 @@
+"""
+Benchmark of name lookups in nested namespaces, comparing the walk over the parent chains
+with the resolved names cached in each namespace.
+
+Run from the repository root: python -m benchmark.bench_namespace
+"""
+import time
+
+from src.rosemary_ai.parser.namespace import Namespace
+
+DEPTH = 8
+N_NAMES = 50
+REPEAT = 20000
+
+
+def _walk(namespace: Namespace, full_name_or_names):
+    # the lookup before the resolved names were cached, which split the name again at each parent
+    if isinstance(full_name_or_names, str):
+        return _walk(namespace, tuple(full_name_or_names.split('.')))
+    name = full_name_or_names[0]
+    if name in namespace._local:  # noqa
+        value = namespace._local[name]  # noqa
+    elif namespace._parent is not None:  # noqa
+        value = _walk(namespace._parent, name)  # noqa
+    else:
+        raise KeyError(name)
+    return value if len(full_name_or_names) == 1 else _walk(value, full_name_or_names[1:])
+
+
+def _nested_namespaces():
+    root = Namespace()
+    for i in range(N_NAMES):
+        root.append(f'template_{i}', object())
+
+    library = Namespace()
+    for i in range(N_NAMES):
+        library.append(f'element_{i}', object())
+    root.append('lib', library)
+
+    namespace = root
+    for depth in range(DEPTH):
+        corolla = Namespace(namespace)
+        corolla.append(f'local_{depth}', object())
+        namespace.append(f'corolla_{depth}', corolla)
+        namespace = corolla
+
+    return namespace
+
+
+def main():
+    namespace = _nested_namespaces()
+    names = ['template_0', f'template_{N_NAMES - 1}', 'lib.element_7', f'local_{DEPTH - 1}', 'local_0']
+    indicators = [tuple(name.split('.')) for name in names]
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for indicator in indicators:
+            _walk(namespace, indicator)
+    walk_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for indicator in indicators:
+            namespace[indicator]  # noqa
+    cached_elapsed = time.perf_counter() - start
+
+    n_lookups = REPEAT * len(indicators)
+    print(f'{DEPTH} nested corollas, {len(indicators)} names')
+    print(f'walk over the parents: {walk_elapsed / n_lookups * 1e9:8.1f} ns per lookup')
+    print(f'resolved names:        {cached_elapsed / n_lookups * 1e9:8.1f} ns per lookup')
+
+
+if __name__ == '__main__':
+    main()
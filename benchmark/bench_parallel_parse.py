@@ -0,0 +1,71 @@
+"""
+Benchmark of loading a large import graph, parsing the imported files in the current process only,
+or in a pool of worker processes, with both parser algorithms. The first load with a pool includes starting
+its workers, which is paid once per process. The pool is only used if the files are large enough for the algorithm.
+
+Run from the repository root: python -m benchmark.bench_parallel_parse
+"""
+import os
+import tempfile
+import time
+from typing import Tuple
+
+from src.rosemary_ai.parser import rml_parser
+from src.rosemary_ai.parser.import_cache import IMPORT_CACHE
+from src.rosemary_ai.parser.rml_parser import PARSER_ALGORITHMS, MIN_PARALLEL_PARSE_SIZE
+from src.rosemary_ai.rosemary import _build, set_parse_workers, set_import_cache_size, set_rml_parser
+
+from ._rml_samples import large_rml_source, write_rml
+
+N_GROUPS = 4
+FILES_PER_GROUP = 4
+PETALS_PER_FILE = 5
+REPEAT = 3
+
+
+def _write_import_graph(directory: str) -> str:
+    library = large_rml_source(PETALS_PER_FILE)
+    for group in range(N_GROUPS):
+        imports = ''.join(f'<import path="file_{group}_{i}.rml" as="f{i}"/>' for i in range(FILES_PER_GROUP))
+        write_rml(directory, f'group_{group}.rml', imports)
+        for i in range(FILES_PER_GROUP):
+            write_rml(directory, f'file_{group}_{i}.rml', library)
+
+    imports = ''.join(f'<import path="group_{group}.rml" as="g{group}"/>' for group in range(N_GROUPS))
+    return write_rml(directory, 'main.rml', imports)
+
+
+def _load(path: str, workers: int) -> Tuple[float, float]:
+    set_parse_workers(workers)
+    elapsed = []
+    for _ in range(REPEAT + 1):
+        IMPORT_CACHE.clear()
+        start = time.perf_counter()
+        _build(path)
+        elapsed.append(time.perf_counter() - start)
+    return elapsed[0], min(elapsed[1:])
+
+
+def main():
+    set_import_cache_size(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = _write_import_graph(directory)
+
+        n_files = N_GROUPS * (FILES_PER_GROUP + 1) + 1
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f'{n_files} files, {size // 1024} KiB, {os.cpu_count()} cores')
+        for algorithm in PARSER_ALGORITHMS:
+            set_rml_parser(algorithm)
+            print(f'{algorithm} (pool from {MIN_PARALLEL_PARSE_SIZE[algorithm] // 1024} KiB per wave):')
+            for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+                first, best = _load(path, workers)
+                pool = 'pool' if workers > 1 and rml_parser._PARSE_POOL is not None else 'no pool'
+                print(f'  {workers:3d} workers: first {first * 1000:8.1f} ms, then {best * 1000:8.1f} ms ({pool})')
+
+    set_rml_parser('earley')
+    set_parse_workers(1)
+    set_import_cache_size(256)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark of parsing long responses with many items extracted by a "for ... try" loop, comparing the previous
+ParseExecutor, which sliced off the matched part of the string and copied the assignments for each snapshot,
+with the cursor over the string and the snapshots sharing the assignments, executing the texts and placeholders
+one by one, or each run of them in a single call, which only saves the dispatch of each value.
+
+Run from the repository root: python -m benchmark.bench_parse_executor
+"""
+import tempfile
+import time
+
+from src.rosemary_ai.parser.compiler import compiled_parser
+from src.rosemary_ai.parser.data_expression import DataExpression
+from src.rosemary_ai.parser.environment import build_environment
+from src.rosemary_ai.parser.executor import Executor, ParseExecutor
+from src.rosemary_ai.rosemary import _build
+
+from ._rml_samples import write_rml
+
+N_ITEMS = [500, 1000, 2000, 4000]
+
+ITEMS_PETAL = '''
+<petal name="items" target="res" init="[]">
+    <formatter>x</formatter>
+    <parser>
+        Items:
+        <for range="100000" var="i" try="True">
+            - {res.append(__)};
+        </for>
+        END
+    </parser>
+</petal>
+'''
+
+
+class SlicingParseExecutor(ParseExecutor):
+    """
+    The previous implementation, slicing the string after each match and copying the assignments for each snapshot.
+    """
+
+    execute_run = Executor.execute_run
+
+    def __init__(self, raw_str: str, target: str, target_obj, is_parse_strict: bool):
+        super().__init__(raw_str, target, target_obj, is_parse_strict)
+        self.assign_with_var_list = []
+
+    def execute(self, value, variables):
+        if isinstance(value, DataExpression):
+            if self.last_target_repr_with_var is None:
+                self.last_target_repr_with_var = (value, variables.copy())
+        elif isinstance(value, str):
+            if not self.is_parse_strict:
+                value = value.strip()
+            pos = self.raw_str.find(value)
+            if pos == -1:
+                return False
+            leading = self.raw_str[:pos]
+            if self.last_target_repr_with_var is not None:
+                self._store_assignment(leading)
+                self.last_target_repr_with_var = None
+            self.raw_str = self.raw_str[pos + len(value):]
+
+        return True
+
+    def get_snapshot(self):
+        return self.raw_str, self.last_target_repr_with_var, self.assign_with_var_list.copy()
+
+    def back_to_snapshot(self, state):
+        self.raw_str, self.last_target_repr_with_var, self.assign_with_var_list = state
+
+    def activate_assignments(self, assign_remain: bool):
+        if self.last_target_repr_with_var is not None and assign_remain:
+            self._store_assignment(self.raw_str)
+        result = self.target_obj
+        for assign, env in self.assign_with_var_list:
+            env[self.target] = result
+            assign.execute(env, False)
+            result = env.get(self.target)
+        return result
+
+    def _store_assignment(self, value: str):
+        target_repr, var = self.last_target_repr_with_var
+        var['__'] = value
+        self.assign_with_var_list += [(target_repr, var)]
+
+
+class CursorParseExecutor(ParseExecutor):
+    """
+    The cursor over the string, executing the texts and placeholders of a run one by one.
+    """
+    execute_run = Executor.execute_run
+
+
+def _response(n_items: int) -> str:
+    return 'Items:\n' + ''.join(f'- item number {i} with some text to make the response longer;\n'
+                                for i in range(n_items)) + 'END'
+
+
+def _parse(executor_class, petal, raw_str: str):
+    target_obj = []
+    env = build_environment(petal, {petal.target: target_obj})
+    executor = executor_class(raw_str, petal.target, target_obj, petal.is_parse_strict)
+    succeed = compiled_parser(petal)(env, executor)
+    return executor.activate_assignments(succeed)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        rosemary = _build(write_rml(directory, 'items.rml', ITEMS_PETAL))
+    petal = rosemary.namespace['items']
+
+    for n_items in N_ITEMS:
+        raw_str = _response(n_items)
+        times = []
+        results = []
+        for executor_class in [SlicingParseExecutor, CursorParseExecutor, ParseExecutor]:
+            start = time.perf_counter()
+            results.append(_parse(executor_class, petal, raw_str))
+            times.append(time.perf_counter() - start)
+        assert results[0] == results[1] == results[2] and len(results[2]) == n_items
+        print(f'{n_items:>5} items ({len(raw_str) / 1000:4.0f} kB): slicing {times[0] * 1000:8.1f} ms, '
+              f'cursor {times[1] * 1000:7.1f} ms, batched runs {times[2] * 1000:7.1f} ms, '
+              f'{times[2] / n_items * 1e6:5.1f} us per item')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark of parsing the cumulative responses of a stream, comparing parsing each of them from scratch, as the streams
+did before, with keeping the state of the parser between them, and with feeding it the deltas of the stream instead.
+The total time should grow about linearly with the length of the response instead of quadratically.
+
+Run from the repository root: python -m benchmark.bench_parse_stream
+"""
+import tempfile
+import time
+
+from src.rosemary_ai.rosemary import _build, _parse, _ParseStream
+
+from ._rml_samples import write_rml
+
+N_TOKENS = [500, 1000, 2000, 4000]
+TOKEN_SIZE = 4
+
+STREAM_PETALS = '''
+<petal name="items" target="res" init="[]">
+    <formatter>x</formatter>
+    <parser>
+        Items:
+        <for range="100000" var="i" try="True">
+            - {res.append(__)};
+        </for>
+        END
+    </parser>
+</petal>
+
+<petal name="answer" target="res" init="{}">
+    <formatter>x</formatter>
+    <parser>
+        Thought: {res['thought'] = __}
+        Answer: {res['answer'] = __}
+    </parser>
+</petal>
+'''
+
+
+def _response(petal_name: str, n_tokens: int) -> str:
+    size = n_tokens * TOKEN_SIZE
+    if petal_name == 'items':
+        items = []
+        while sum(map(len, items)) < size:
+            items.append(f'- item number {len(items)} with some text;\n')
+        return 'Items:\n' + ''.join(items) + 'END'
+    return 'Thought: ' + 'let me think. ' * (size // 28) + '\nAnswer: ' + 'the answer. ' * (size // 24)
+
+
+def _chunks(raw_str: str):
+    # the cumulative responses yielded by the generators
+    for end in range(0, len(raw_str) + TOKEN_SIZE, TOKEN_SIZE):
+        yield raw_str[:end]
+
+
+def _deltas(raw_str: str):
+    # the deltas yielded by the delta streams of the generators
+    for start in range(0, len(raw_str), TOKEN_SIZE):
+        yield raw_str[start:start + TOKEN_SIZE]
+
+
+def _stream_from_scratch(petal, raw_str: str):
+    results = []
+    for chunk in _chunks(raw_str):
+        results.append(_parse(petal, {}, chunk))
+    return results[-1], len(results)
+
+
+def _stream_incremental(petal, raw_str: str):
+    parse_stream = _ParseStream(petal, {}, None)
+    n_emitted = 0
+    for chunk in _chunks(raw_str):
+        n_emitted += parse_stream.feed(chunk)
+    return (parse_stream.result, parse_stream.succeed), n_emitted
+
+
+def _stream_delta(petal, raw_str: str):
+    parse_stream = _ParseStream(petal, {}, None)
+    n_emitted = 0
+    for delta in _deltas(raw_str):
+        n_emitted += parse_stream.feed_delta(delta)
+    return (parse_stream.result, parse_stream.succeed), n_emitted
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        rosemary = _build(write_rml(directory, 'stream.rml', STREAM_PETALS))
+
+    for petal_name in ['items', 'answer']:
+        petal = rosemary.namespace[petal_name]
+        print(f'{petal_name}:')
+        for n_tokens in N_TOKENS:
+            raw_str = _response(petal_name, n_tokens)
+            times = []
+            results = []
+            for stream in [_stream_from_scratch, _stream_incremental, _stream_delta]:
+                start = time.perf_counter()
+                results.append(stream(petal, raw_str))
+                times.append(time.perf_counter() - start)
+            (expected, n_chunks), (result, n_emitted), (delta_result, _) = results
+            assert result == delta_result == expected and expected[1]
+            print(f'  {n_tokens:>5} tokens: from scratch {times[0] * 1000:8.1f} ms, '
+                  f'incremental {times[1] * 1000:7.1f} ms, deltas {times[2] * 1000:7.1f} ms, '
+                  f'{n_emitted} of {n_chunks} results emitted')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark of formatting a petal with the interpreter (traverse.py) and with the compiled closures (compiler.py).
+
+Run from the repository root: python -m benchmark.bench_petal
+"""
+import tempfile
+import time
+
+from src.rosemary_ai.parser.compiler import compiled_formatter
+from src.rosemary_ai.parser.environment import build_environment
+from src.rosemary_ai.parser.executor import FormatExecutor
+from src.rosemary_ai.parser.traverse import traverse_all
+from src.rosemary_ai.rosemary import _build
+
+from ._rml_samples import CHAT_PETAL, chat_petal_args, write_rml
+
+REPEAT = 2000
+
+
+def _interpret(petal, args):
+    executor = FormatExecutor()
+    traverse_all(build_environment(petal, dict(args)), petal.formatter_rml.children, executor)
+    return executor.get_result()
+
+
+def _compiled(petal, args):
+    executor = FormatExecutor()
+    compiled_formatter(petal)(build_environment(petal, dict(args)), executor)
+    return executor.get_result()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        rosemary = _build(write_rml(directory, 'chat.rml', CHAT_PETAL))
+
+    petal = rosemary.namespace['rag']
+    args = chat_petal_args()
+
+    assert _interpret(petal, args) == _compiled(petal, args)
+
+    for name, func in [('interpreter', _interpret), ('compiled', _compiled)]:
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            func(petal, args)
+        elapsed = time.perf_counter() - start
+        print(f'{name:>12}: {elapsed / REPEAT * 1e6:10.1f} us per call')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark of RML lexing throughput, comparing the contextual lexer Lark generates from the grammar,
+whose text terminals are lookahead regexes, with the hand-written RmlLexer, on sources with long text bodies.
+
+Run from the repository root: python -m benchmark.bench_rml_lexer
+"""
+import random
+import time
+
+from lark import Lark
+
+from src.rosemary_ai.parser.lexer import RmlLexer
+from src.rosemary_ai.parser.rml_parser import get_lark_parser, GRAMMAR_PATH
+from src.rosemary_ai.parser.transformer import TreeToRmlTreeTransformer
+from src.rosemary_ai._utils.file_utils import read_and_close_file_to_root
+
+from ._rml_samples import large_rml_source
+
+TEXT_BODY_SIZES_MB = [1, 4]
+WORDS = ['the', 'user', 'asks', 'for', 'a', 'summary', 'of', 'review', 'answer', 'with', 'example', 'code', '[0]',
+         '<<tag>>', '{{literal}}']
+
+
+def long_text_source(size_mb: int, rng: random.Random) -> str:
+    """
+    A petal whose formatter has few-shot examples of about size_mb megabytes, with a few placeholders.
+    """
+    examples = []
+    size = 0
+    while size < size_mb * 1024 * 1024:
+        example = ('            Q: ' + ' '.join(rng.choices(WORDS, k=20)) + '\n'
+                   '            A: ' + ' '.join(rng.choices(WORDS, k=40)) + '\n')
+        if len(examples) % 100 == 0:
+            example += '            {example_' + str(len(examples)) + '}\n'
+        examples.append(example)
+        size += len(example)
+
+    return ('<petal name="few_shot">\n    <formatter>\n        <message role="\'user\'">\n'
+            + ''.join(examples) + '        </message>\n    </formatter>\n</petal>\n')
+
+
+def _throughput(func, src: str, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(src)
+        best = min(best, time.perf_counter() - start)
+    return len(src.encode('utf-8')) / 2 ** 20 / best
+
+
+def main():
+    contextual = Lark(read_and_close_file_to_root(GRAMMAR_PATH), start='rosemary', parser='lalr',
+                      transformer=TreeToRmlTreeTransformer())
+    hand_written = get_lark_parser('lalr')
+    rml_lexer = RmlLexer(hand_written.lexer_conf)
+
+    rng = random.Random(0)
+    sources = [('200 petals and templates', large_rml_source(200))]
+    sources += [(f'{size_mb} MB of few-shot examples', long_text_source(size_mb, rng)) for size_mb in TEXT_BODY_SIZES_MB]
+
+    for name, src in sources:
+        assert str(contextual.parse(src)) == str(hand_written.parse(src))
+        print(f'{name} ({len(src.encode("utf-8")) / 2 ** 20:.2f} MB):')
+        print(f'  parse, contextual lexer:   {_throughput(contextual.parse, src):8.2f} MB/s')
+        print(f'  parse, RmlLexer:           {_throughput(hand_written.parse, src):8.2f} MB/s')
+        print(f'  RmlLexer tokens only:      {_throughput(lambda s: list(rml_lexer.lex(s)), src):8.2f} MB/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of the memory used by the RML trees of a large synthetic template library, comparing the compact
+RmlElement nodes with the former dict-backed nodes, which owned fresh containers and indicator tuples.
+
+Run from the repository root: python -m benchmark.bench_rml_memory
+"""
+import gc
+import tracemalloc
+
+from src.rosemary_ai.parser.transformer import TreeToRmlTreeTransformer, RmlElement
+
+from ._rml_samples import large_rml_source
+from .bench_rml_parser import two_pass_lalr_parser
+
+LIBRARY_SIZE = 1000
+
+
+class _DictElement:
+    def __init__(self, is_text, indicator, text_tokens, children, attributes):
+        self.is_text = is_text
+        self.indicator = indicator
+        self.text_tokens = text_tokens
+        self.children = children
+        self.attributes = attributes
+
+
+class _DictToken:
+    def __init__(self, text_type, text):
+        self.type = text_type
+        self.text = text
+
+
+def _to_dict_nodes(element: RmlElement) -> _DictElement:
+    return _DictElement(element.is_text, tuple(list(element.indicator)),
+                        [_DictToken(token.type, token.text) for token in element.text_tokens],
+                        [_to_dict_nodes(child) for child in element.children],
+                        {name: value for name, value in element.attributes.items()})
+
+
+def _count_nodes(element: RmlElement) -> int:
+    return 1 + len(element.text_tokens) + sum(_count_nodes(child) for child in element.children)
+
+
+def _measure(build) -> (object, int):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    lark_tree = two_pass_lalr_parser().parse(large_rml_source(LIBRARY_SIZE))
+
+    tree, compact_size = _measure(lambda: TreeToRmlTreeTransformer().transform(lark_tree))
+    # the dict-backed nodes share the strings of the compact tree, so the strings only count for the compact nodes
+    _, dict_size = _measure(lambda: _to_dict_nodes(tree))
+
+    n_nodes = _count_nodes(tree)
+    print(f'{LIBRARY_SIZE} petals and templates, {n_nodes} elements and text tokens')
+    print(f'dict-backed nodes: {dict_size / 2 ** 20:7.2f} MiB, {dict_size / n_nodes:6.1f} bytes per node')
+    print(f'compact nodes:     {compact_size / 2 ** 20:7.2f} MiB, {compact_size / n_nodes:6.1f} bytes per node')
+
+
+if __name__ == '__main__':
+    main()
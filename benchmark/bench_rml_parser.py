@@ -0,0 +1,73 @@
+"""
+Benchmark of RML parsing throughput and peak memory, comparing the LALR parser with the Earley parser,
+and the RML tree built during LALR parsing with the former second pass over the Lark parse tree.
+
+Run from the repository root: python -m benchmark.bench_rml_parser
+"""
+import gc
+import time
+import tracemalloc
+
+from src.rosemary_ai.parser.rml_parser import get_lark_parser, parse_rml_tree, PARSER_ALGORITHMS, GRAMMAR_PATH
+from src.rosemary_ai.parser.transformer import TreeToRmlTreeTransformer
+from src.rosemary_ai._utils.file_utils import read_and_close_file_to_root
+from lark import Lark
+
+from ._rml_samples import large_rml_source
+
+SIZES = [10, 50, 200]
+
+
+def bench_construction(algorithm: str, repeat: int = 3) -> float:
+    grammar = read_and_close_file_to_root(GRAMMAR_PATH)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        Lark(grammar, start='rosemary', parser=algorithm)
+    return (time.perf_counter() - start) / repeat
+
+
+def two_pass_lalr_parser() -> Lark:
+    return Lark(read_and_close_file_to_root(GRAMMAR_PATH), start='rosemary', parser='lalr')
+
+
+def two_pass_parse(parser: Lark, src: str):
+    return TreeToRmlTreeTransformer().transform(parser.parse(src))
+
+
+def bench_parse(parse, src: str, repeat: int = 3) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(src)
+    return (time.perf_counter() - start) / repeat
+
+
+def peak_memory(parse, src: str) -> int:
+    gc.collect()
+    tracemalloc.start()
+    parse(src)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    for algorithm in PARSER_ALGORITHMS:
+        print(f'{algorithm:>6}: grammar construction {bench_construction(algorithm) * 1000:8.2f} ms')
+
+    plain_lalr = two_pass_lalr_parser()
+    parsers = [('lalr, 2 passes', lambda src: two_pass_parse(plain_lalr, src))]
+    parsers += [(algorithm, lambda src, parser=get_lark_parser(algorithm): parse_rml_tree(parser, src))
+                for algorithm in PARSER_ALGORITHMS]
+
+    for n_petals in SIZES:
+        src = large_rml_source(n_petals)
+        size_kb = len(src.encode('utf-8')) / 1024
+        for name, parse in parsers:
+            elapsed = bench_parse(parse, src)
+            peak_mb = peak_memory(parse, src) / 2 ** 20
+            print(f'{name:>14}: {n_petals:4d} petals ({size_kb:8.1f} KB) '
+                  f'{elapsed * 1000:10.2f} ms, {size_kb / elapsed:8.1f} KB/s, peak {peak_mb:7.2f} MiB')
+
+
+if __name__ == '__main__':
+    main()
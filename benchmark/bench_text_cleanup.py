@@ -0,0 +1,154 @@
+"""
+Benchmark of the text cleanup applied to the text bodies of RML elements, comparing the former implementation,
+which split the text into lists of lines and rebuilt them line by line, with the single pass over the text.
+
+Run from the repository root: python -m benchmark.bench_text_cleanup
+"""
+import random
+import time
+from typing import List, Tuple
+
+from src.rosemary_ai.parser.transformer import TextToken, cleandoc
+
+SIZES_MB = [1, 4, 16]
+WORDS = ['the', 'user', 'asks', 'for', 'a', 'summary', 'of', 'review', 'answer', 'with', 'example', 'code']
+
+
+def reference_calc_leading_size(line: str) -> int:
+    leading_size = 0
+    while line.startswith(' ') or line.startswith('\t'):
+        leading_size += 1 if line[0] == ' ' else 4
+        line = line[1:]
+
+    return leading_size
+
+
+def reference_clean_leading_ws_line(line: str, to_clean: int) -> str:
+    leading_size = reference_calc_leading_size(line)
+    line = line.lstrip()
+    if leading_size > to_clean:
+        remain_size = leading_size - to_clean
+        line = '\t' * (remain_size // 4) + ' ' * (remain_size % 4) + line
+
+    return line
+
+
+def reference_clean_leading_ws_lines(text: str, to_clean: int) -> str:
+    if to_clean == 0:
+        return text
+    lines = text.splitlines()
+    cleaned_lines = []
+    if lines:
+        cleaned_lines += [lines[0]]
+        lines = lines[1:]
+    for line in lines:
+        cleaned_lines += [reference_clean_leading_ws_line(line, to_clean)]
+
+    return '\n'.join(cleaned_lines)
+
+
+def reference_calc_leading_ws_and_remove_leading(text: str) -> Tuple[int, str]:
+    if not text:
+        return 0, ''
+    lines = list(reversed(text.splitlines()))
+    line = ''
+    while lines and not lines[-1].strip():
+        line = lines.pop()
+
+    if lines:
+        line = lines.pop()
+
+    leading_size = reference_calc_leading_size(line)
+
+    lines += [line]
+
+    return (leading_size,
+            '\n'.join(reference_clean_leading_ws_line(line, leading_size) for line in reversed(lines)))
+
+
+def reference_remove_trailing_blank_lines(text: str) -> str:
+    lines = text.splitlines()
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return '\n'.join(lines)
+
+
+def reference_cleandoc(items: List[TextToken]):
+    if not items:
+        return []
+    cleaned = []
+
+    items = list(reversed(items))
+
+    while items and items[-1].type == TextToken.TYPE.INDICATOR:
+        cleaned += [items.pop()]
+    if not items:
+        return cleaned
+    leading_ws, non_empty_part = reference_calc_leading_ws_and_remove_leading(items.pop().text)
+    if non_empty_part:
+        cleaned += [TextToken(TextToken.TYPE.PLAIN_TEXT, non_empty_part)]
+
+    for item in reversed(items):
+        if item.type == TextToken.TYPE.INDICATOR:
+            cleaned += [item]
+        else:
+            cleaned_line = reference_clean_leading_ws_lines(item.text, leading_ws)
+            if cleaned_line:
+                cleaned += [TextToken(TextToken.TYPE.PLAIN_TEXT, cleaned_line)]
+
+    if cleaned and cleaned[-1].type == TextToken.TYPE.PLAIN_TEXT:
+        cleaned[-1].text = reference_remove_trailing_blank_lines(cleaned[-1].text)
+        if not cleaned[-1].text:
+            cleaned.pop()
+
+    return cleaned
+
+
+def text_body(size_mb: int, indent: str, rng: random.Random) -> List[TextToken]:
+    """
+    The text tokens of an element body with few-shot examples of about size_mb megabytes, indented by indent
+    and interleaved with placeholders.
+    """
+    lines = []
+    size = 0
+    while size < size_mb * 1024 * 1024:
+        extra_indent = '    ' * rng.randrange(3)
+        line = indent + extra_indent + ' '.join(rng.choices(WORDS, k=rng.randint(4, 16)))
+        lines.append(line)
+        size += len(line) + 1
+
+    tokens = []
+    for i in range(0, len(lines), 1000):
+        tokens.append(TextToken(TextToken.TYPE.PLAIN_TEXT, '\n' + '\n'.join(lines[i:i + 1000]) + '\n' + indent))
+        tokens.append(TextToken(TextToken.TYPE.INDICATOR, 'example'))
+    tokens.append(TextToken(TextToken.TYPE.PLAIN_TEXT, '\n' + indent[:len(indent) // 2]))
+    return tokens
+
+
+def _measure(func, tokens: List[TextToken], repeat: int = 3) -> Tuple[float, List[Tuple[str, str]]]:
+    best = float('inf')
+    result = []
+    for _ in range(repeat):
+        copied = [TextToken(token.type, token.text) for token in tokens]
+        start = time.perf_counter()
+        result = func(copied)
+        best = min(best, time.perf_counter() - start)
+    return best, [(token.type, token.text) for token in result]
+
+
+def main():
+    rng = random.Random(0)
+    for indent in ['        ', '\t\t']:
+        for size_mb in SIZES_MB:
+            tokens = text_body(size_mb, indent, rng)
+            reference, reference_result = _measure(reference_cleandoc, tokens)
+            single_pass, result = _measure(cleandoc, tokens)
+            assert result == reference_result
+
+            print(f'{size_mb:3d} MB, indented by {indent!r}:')
+            print(f'  line by line: {reference * 1000:9.1f} ms ({size_mb / reference:7.1f} MB/s)')
+            print(f'  single pass:  {single_pass * 1000:9.1f} ms ({size_mb / single_pass:7.1f} MB/s)')
+
+
+if __name__ == '__main__':
+    main()
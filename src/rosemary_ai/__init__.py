@@ -1,4 +1,5 @@
-from .rosemary import load, set_dry_run
+from .rosemary import load, reload, validate, set_dry_run, set_rml_parser, set_rml_cache_dir, set_import_cache_size, \
+    set_parse_workers, set_lazy_parse
 from .models.generator_registry import register_generator
 from .models.generator_registry import generator_list
 from .decorators import petal
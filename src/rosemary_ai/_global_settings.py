@@ -3,6 +3,11 @@ class GlobalSettings:
     def __init__(self):
         self._settings = {
             'DRY_RUN': False,
+            'RML_PARSER': 'earley',
+            'RML_CACHE_DIR': None,
+            'IMPORT_CACHE_SIZE': 256,
+            'PARSE_WORKERS': 1,
+            'LAZY_PARSE': False,
         }
 
     def set(self, key: str, value):
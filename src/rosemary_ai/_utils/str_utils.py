@@ -1,4 +1,6 @@
-from typing import Tuple, Set, List
+import re
+from functools import lru_cache
+from typing import Tuple, Set, List, Dict, Iterable, FrozenSet
 
 
 def full_name_to_indicator(full_name: str) -> Tuple[str, ...]:
@@ -6,81 +8,191 @@ def full_name_to_indicator(full_name: str) -> Tuple[str, ...]:
 
 
 def calc_leading_size(line: str) -> int:
-    leading_size = 0
-    while line.startswith(' ') or line.startswith('\t'):
-        leading_size += 1 if line[0] == ' ' else 4
-        line = line[1:]
+    leading = line[:len(line) - len(line.lstrip(' \t'))]
+    return len(leading) + 3 * leading.count('\t')
 
-    return leading_size
+
+def _indentation(size: int) -> str:
+    return '\t' * (size // 4) + ' ' * (size % 4)
 
 
 def clean_leading_ws_line(line: str, to_clean: int) -> str:
     leading_size = calc_leading_size(line)
     line = line.lstrip()
     if leading_size > to_clean:
-        remain_size = leading_size - to_clean
-        line = '\t' * (remain_size // 4) + ' ' * (remain_size % 4) + line
+        line = _indentation(leading_size - to_clean) + line
 
     return line
 
 
-def clean_leading_ws_lines(text: str, to_clean: int) -> str:
-    if to_clean == 0:
-        return text
-    lines = text.splitlines()
-    cleaned_lines = []
-    if lines:
-        cleaned_lines += [lines[0]]
-        lines = lines[1:]
-    for line in lines:
-        cleaned_lines += [clean_leading_ws_line(line, to_clean)]
+# The line boundaries of str.splitlines other than "\n".
+_LINE_BREAKS = re.compile('[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+_LEADING_WS = re.compile(r'^[^\S\n]*', re.MULTILINE)
 
-    return '\n'.join(cleaned_lines)
 
+def _lines_view(text: str) -> str:
+    """
+    The text with "\n" as the only line boundary, and without the trailing one, so that splitting it by "\n" gives
+    the same lines as text.splitlines() (except for an empty text, which has no line instead of one empty line).
+    The text is only copied when it has other line boundaries (or is a subclass of str, e.g. a lark token).
+    """
+    text = str(text)
+    if _LINE_BREAKS.search(text):
+        return '\n'.join(text.splitlines())
+    return text[:-1] if text.endswith('\n') else text
 
-def calc_leading_ws_and_remove_leading(text: str) -> Tuple[int, str]:
-    if not text:
-        return 0, ''
-    lines = list(reversed(text.splitlines()))
-    line = ''
-    while lines and not lines[-1].strip():
-        line = lines.pop()
 
-    if lines:
-        line = lines.pop()
+def _clean_leading_ws_all_lines(text: str, to_clean: int) -> str:
+    # the same as clean_leading_ws_line on each line, in one pass over the "\n"-separated text
+    replacements = {}
 
-    leading_size = calc_leading_size(line)
+    def replace(match: re.Match) -> str:
+        leading = match.group()
+        replacement = replacements.get(leading)
+        if replacement is None:
+            leading_size = calc_leading_size(leading)
+            replacement = _indentation(leading_size - to_clean) if leading_size > to_clean else ''
+            replacements[leading] = replacement
+        return replacement
 
-    lines += [line]
+    return _LEADING_WS.sub(replace, text)
 
-    return (leading_size,
-            '\n'.join(clean_leading_ws_line(line, leading_size) for line in reversed(lines)))
 
+def clean_leading_ws_lines(text: str, to_clean: int) -> str:
+    if to_clean == 0:
+        return text
 
-def remove_trailing_blank_lines(text: str) -> str:
-    lines = text.splitlines()
-    while lines and not lines[-1].strip():
-        lines.pop()
-    return '\n'.join(lines)
+    first_line, newline, other_lines = _lines_view(text).partition('\n')
+    if not newline:
+        return first_line
+    return first_line + '\n' + _clean_leading_ws_all_lines(other_lines, to_clean)
 
 
-VALID_CHARACTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_'
+def calc_leading_ws_and_remove_leading(text: str) -> Tuple[int, str]:
+    if not text:
+        return 0, ''
+    text = _lines_view(text)
 
+    first_content = len(text) - len(text.lstrip())
+    if first_content == len(text):  # blank lines only
+        return calc_leading_size(text[text.rfind('\n') + 1:]), ''
 
-def _get_edited_strings(s: str) -> List[str]:
-    edited_strings = []
-    for i in range(len(s)):
-        prefix = s[:i]
-        suffix = s[i + 1:]
-        edited_strings.append(prefix + suffix)  # Delete
-        for c in VALID_CHARACTERS:
-            edited_strings.append(prefix + c + suffix)   # Replace
-            edited_strings.append(prefix + c + s[i] + suffix)  # Insert
+    text = text[text.rfind('\n', 0, first_content) + 1:]  # from the first non-blank line
+    leading_size = calc_leading_size(text)
 
-    return edited_strings
+    return leading_size, _clean_leading_ws_all_lines(text, leading_size)
 
 
-def did_you_mean(s: str, candidates: Set[str]) -> str:
-    for edited_string in _get_edited_strings(s):
-        if edited_string in candidates:
-            return edited_string
+def remove_trailing_blank_lines(text: str) -> str:
+    text = _lines_view(text)
+    content_end = len(text.rstrip())
+    if content_end == 0:
+        return ''
+    line_end = text.find('\n', content_end)
+    return text if line_end == -1 else text[:line_end]
+
+
+def edit_distance(a: str, b: str, max_distance: int | None = None) -> int:
+    """
+    The Levenshtein distance between two strings.
+    If max_distance is given, only the cells within max_distance from the diagonal are computed,
+    and max_distance + 1 is returned as soon as the distance is known to exceed it.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is None:
+        max_distance = len(a)
+    elif len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    exceeded = max_distance + 1
+    previous = [j if j <= max_distance else exceeded for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [exceeded] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = current[low - 1]
+        for j in range(low, high + 1):
+            distance = min(previous[j - 1] + (ca != b[j - 1]), previous[j] + 1, current[j - 1] + 1, exceeded)
+            current[j] = distance
+            if distance < row_min:
+                row_min = distance
+        if row_min > max_distance:
+            return exceeded
+        previous = current
+
+    return previous[-1]
+
+
+def _deleted_strings(s: str, max_deletions: int) -> Set[str]:
+    deleted_strings = {s}
+    edge = {s}
+    for _ in range(max_deletions):
+        edge = {t[:i] + t[i + 1:] for t in edge for i in range(len(t))} - deleted_strings
+        deleted_strings |= edge
+
+    return deleted_strings
+
+
+def _find_names(deletions: Dict[str, List[str]], affix: str, max_distance: int) -> Set[str]:
+    names = set()
+    for deleted_string in _deleted_strings(affix, max_distance):
+        names.update(deletions.get(deleted_string, ()))
+    return names
+
+
+class SuggestionIndex:
+    """
+    An index of names to suggest the closest ones to a misspelled name, using symmetric deletion:
+    two strings within an edit distance of k always share a string obtained by deleting at most k characters
+    from each of their prefixes, and likewise for their suffixes. Only the names sharing such strings with the query,
+    for both the prefix and the suffix, are compared with it.
+    """
+
+    def __init__(self, names: Iterable[str] = (), max_distance: int = 2, affix_length: int = 7):
+        self.max_distance = max_distance
+        self.affix_length = max(affix_length, max_distance + 1)
+        self._names: Set[str] = set()
+        self._prefix_deletions: Dict[str, List[str]] = {}
+        self._suffix_deletions: Dict[str, List[str]] = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str):
+        if name in self._names:
+            return
+        self._names.add(name)
+        for deleted_string in _deleted_strings(name[:self.affix_length], self.max_distance):
+            self._prefix_deletions.setdefault(deleted_string, []).append(name)
+        for deleted_string in _deleted_strings(name[-self.affix_length:], self.max_distance):
+            self._suffix_deletions.setdefault(deleted_string, []).append(name)
+
+    def suggest(self, s: str, max_distance: int | None = None, limit: int = 1) -> List[str]:
+        """
+        The names within max_distance edits from s, closest first, and in alphabetical order for the same distance.
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        names = _find_names(self._prefix_deletions, s[:self.affix_length], max_distance)
+        if names:
+            names &= _find_names(self._suffix_deletions, s[-self.affix_length:], max_distance)
+
+        ranked = sorted((distance, name) for name in names
+                        if (distance := edit_distance(s, name, max_distance)) <= max_distance)
+        return [name for _, name in ranked[:limit]]
+
+    def __len__(self):
+        return len(self._names)
+
+
+@lru_cache(maxsize=256)
+def _suggestion_index(candidates: FrozenSet[str]) -> SuggestionIndex:
+    return SuggestionIndex(candidates, 1)
+
+
+def did_you_mean(s: str, candidates: Iterable[str]) -> str | None:
+    suggestions = _suggestion_index(frozenset(candidates)).suggest(s)
+    return suggestions[0] if suggestions else None
@@ -3,6 +3,11 @@ class RmlTagNotClosedException(Exception):
         super().__init__(f'Tag "{tag_name}" is not closed properly. Found "{wrong_tag_name}" instead.')
 
 
+class RmlTextOutsideElementException(Exception):
+    def __init__(self, text: str):
+        super().__init__(f'Text "{text}" is not put inside any element.')
+
+
 class RmlSyntaxException(Exception):
     def __init__(self, message, src_path):
         super().__init__(f'Error when parsing {src_path}: {message}.')
@@ -1,7 +1,7 @@
-from typing import Generator, Dict, Any, List, Tuple
+from typing import Generator, Dict, Any, List, Tuple, AsyncIterable
 
 from ._utils import shape_messages, update_options, reform_system_message
-from .generator import AbstractContentGenerator
+from .generator import AbstractContentGenerator, accumulate_deltas, accumulate_deltas_async
 from ..multi_modal.image import Image
 from .._utils.image import _image_to_base64
 from anthropic import Anthropic, NOT_GIVEN, AsyncAnthropic
@@ -24,6 +24,8 @@ def _image_to_form(image: Image) -> Dict[str, Any]:
 
 
 class ClaudeChatGenerator(AbstractContentGenerator[str]):
+    native_delta_stream = True
+
     def __init__(self, model_name: str):
         super().__init__('Anthropic')
         self.model_name = model_name
@@ -100,6 +102,17 @@ class ClaudeChatGenerator(AbstractContentGenerator[str]):
     def generate_stream(self, data: Dict[str, str | List[Dict[str, str | List]]],
                         options: Dict[str, Any],
                         dry_run: bool, api_key: str = None) -> Generator[str, None, None]:
+        return accumulate_deltas(self.generate_delta_stream(data, options, dry_run, api_key))
+
+    async def generate_stream_async(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                                    options: Dict[str, Any],
+                                    dry_run: bool, api_key: str = None) -> AsyncIterable[str]:
+        async for result in accumulate_deltas_async(self.generate_delta_stream_async(data, options, dry_run, api_key)):
+            yield result
+
+    def generate_delta_stream(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                              options: Dict[str, Any],
+                              dry_run: bool, api_key: str = None) -> Generator[str, None, None]:
         messages, system, options, api_key = self._set_up(data, options, dry_run, api_key)
 
         if dry_run:
@@ -109,18 +122,15 @@ class ClaudeChatGenerator(AbstractContentGenerator[str]):
         with client.messages.stream(model=self.model_name, messages=messages,
                                     **options,
                                     system=system) as completion_stream:
-            result = ''
-
             for chunk in completion_stream.text_stream:
                 LOGGER.info(f'Received response (streaming) from {self.model_name}: "{chunk}".')
 
                 if chunk is not None:
-                    result += chunk
-                    yield result
+                    yield chunk
 
-    async def generate_stream_async(self, data: Dict[str, str | List[Dict[str, str | List]]],
-                                    options: Dict[str, Any],
-                                    dry_run: bool, api_key: str = None) -> Generator[str, None, None]:
+    async def generate_delta_stream_async(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                                          options: Dict[str, Any],
+                                          dry_run: bool, api_key: str = None) -> AsyncIterable[str]:
         messages, system, options, api_key = self._set_up(data, options, dry_run, api_key)
 
         if dry_run:
@@ -130,11 +140,8 @@ class ClaudeChatGenerator(AbstractContentGenerator[str]):
         async with client.messages.stream(model=self.model_name, messages=messages,
                                           **options,
                                           system=system) as completion_stream:
-            result = ''
-
             async for chunk in completion_stream.text_stream:
                 LOGGER.info(f'Received response (streaming) from {self.model_name}: "{chunk}".')
 
                 if chunk is not None:
-                    result += chunk
-                    yield result
+                    yield chunk
@@ -1,7 +1,7 @@
-from typing import Generator, Dict, Any, List, Tuple
+from typing import Generator, Dict, Any, List, Tuple, AsyncIterable
 
 from ._utils import shape_messages, update_options, reform_system_message
-from .generator import AbstractContentGenerator
+from .generator import AbstractContentGenerator, accumulate_deltas, accumulate_deltas_async
 
 from .._logger import LOGGER
 from cohere import Client, AsyncClient
@@ -29,6 +29,8 @@ def _convert_to_cohere_message(messages: List[Dict[str, str]]) -> Tuple[List[Dic
 
 
 class CohereChatGenerator(AbstractContentGenerator[str]):
+    native_delta_stream = True
+
     def __init__(self, model_name: str):
         super().__init__('Cohere')
         self.model_name = model_name
@@ -101,6 +103,17 @@ class CohereChatGenerator(AbstractContentGenerator[str]):
     def generate_stream(self, data: Dict[str, str | List[Dict[str, str | List]]],
                         options: Dict[str, Any],
                         dry_run: bool, api_key: str = None) -> Generator[str, None, None]:
+        return accumulate_deltas(self.generate_delta_stream(data, options, dry_run, api_key))
+
+    async def generate_stream_async(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                                    options: Dict[str, Any],
+                                    dry_run: bool, api_key: str = None) -> AsyncIterable[str]:
+        async for result in accumulate_deltas_async(self.generate_delta_stream_async(data, options, dry_run, api_key)):
+            yield result
+
+    def generate_delta_stream(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                              options: Dict[str, Any],
+                              dry_run: bool, api_key: str = None) -> Generator[str, None, None]:
         messages, last_message, system, options, api_key = self._set_up(data, options, dry_run, api_key)
 
         if dry_run:
@@ -108,8 +121,6 @@ class CohereChatGenerator(AbstractContentGenerator[str]):
 
         client = Client(api_key=api_key)
 
-        result = ''
-
         for chunk in client.chat_stream(
                 model=self.model_name,
                 message=last_message,
@@ -122,12 +133,11 @@ class CohereChatGenerator(AbstractContentGenerator[str]):
                 continue
 
             if chunk is not None:
-                result += chunk.text
-                yield result
+                yield chunk.text
 
-    async def generate_stream_async(self, data: Dict[str, str | List[Dict[str, str | List]]],
-                                    options: Dict[str, Any],
-                                    dry_run: bool, api_key: str = None) -> Generator[str, None, None]:
+    async def generate_delta_stream_async(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                                          options: Dict[str, Any],
+                                          dry_run: bool, api_key: str = None) -> AsyncIterable[str]:
         messages, last_message, system, options, api_key = self._set_up(data, options, dry_run, api_key)
 
         if dry_run:
@@ -135,8 +145,6 @@ class CohereChatGenerator(AbstractContentGenerator[str]):
 
         client = AsyncClient(api_key=api_key)
 
-        result = ''
-
         async for chunk in client.chat_stream(
                 model=self.model_name,
                 message=last_message,
@@ -149,5 +157,4 @@ class CohereChatGenerator(AbstractContentGenerator[str]):
                 continue
 
             if chunk is not None:
-                result += chunk.text
-                yield result
+                yield chunk.text
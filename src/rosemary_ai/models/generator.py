@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Generator, TypeVar, Generic, Dict, Any, AsyncIterable
+from typing import Generator, TypeVar, Generic, Dict, Any, AsyncIterable, Iterable
 
 from .api_key_manager import get_api_key
 
@@ -7,7 +7,59 @@ from .api_key_manager import get_api_key
 T = TypeVar('T')
 
 
+def accumulate_deltas(deltas: Iterable[T]) -> Generator[T, None, None]:
+    """
+    Turn a stream of texts which arrived since the last one into a stream of the full texts so far.
+    Values which are not texts are yielded as they are.
+    """
+    text = ''
+    for delta in deltas:
+        if isinstance(delta, str):
+            text += delta
+            yield text
+        else:
+            yield delta
+
+
+async def accumulate_deltas_async(deltas: AsyncIterable[T]) -> AsyncIterable[T]:
+    text = ''
+    async for delta in deltas:
+        if isinstance(delta, str):
+            text += delta
+            yield text
+        else:
+            yield delta
+
+
+def _delta(text: T, last_text: str) -> T:
+    if isinstance(text, str) and text.startswith(last_text):
+        return text[len(last_text):]
+    return text
+
+
+def split_deltas(texts: Iterable[T]) -> Generator[T, None, None]:
+    """
+    Turn a stream of the full texts so far into a stream of the texts which arrived since the last one.
+    """
+    last_text = ''
+    for text in texts:
+        yield _delta(text, last_text)
+        if isinstance(text, str):
+            last_text = text
+
+
+async def split_deltas_async(texts: AsyncIterable[T]) -> AsyncIterable[T]:
+    last_text = ''
+    async for text in texts:
+        yield _delta(text, last_text)
+        if isinstance(text, str):
+            last_text = text
+
+
 class AbstractContentGenerator(ABC, Generic[T]):
+    # Whether the generator streams the deltas natively, so that the delta streams do not build the full texts
+    native_delta_stream = False
+
     def __init__(self, provider: str):
         self.provider = provider
 
@@ -37,3 +89,15 @@ class AbstractContentGenerator(ABC, Generic[T]):
     def generate_stream_async(self, data, options: Dict[str, Any],
                               dry_run: bool, api_key: str = None) -> AsyncIterable[T]:
         pass
+
+    ####
+    # Delta stream yields only the text which arrived since the last one. E.g.: 'this', ' is', ' a', ' test'
+    # It is built from the stream above, unless the generator streams the deltas natively.
+    ###
+    def generate_delta_stream(self, data, options: Dict[str, Any],
+                              dry_run: bool, api_key: str = None) -> Generator[T, None, None]:
+        return split_deltas(self.generate_stream(data, options, dry_run, api_key))
+
+    def generate_delta_stream_async(self, data, options: Dict[str, Any],
+                                    dry_run: bool, api_key: str = None) -> AsyncIterable[T]:
+        return split_deltas_async(self.generate_stream_async(data, options, dry_run, api_key))
@@ -1,5 +1,5 @@
 import inspect
-from typing import Generator, Dict, Any, List, Tuple, Callable, TypeAlias
+from typing import Generator, Dict, Any, List, Tuple, Callable, TypeAlias, AsyncIterable
 
 from openai import OpenAI, AsyncOpenAI
 from openai.types import Moderation
@@ -69,40 +69,46 @@ def _get_tools_list(funcs):
             tools.append(tool)
 
 
-def _concatenate_delta() -> Generator[GptReturnType, ChoiceDelta, None]:
-    text = None
-    tool_calls = []
+def _update_tool_calls(tool_calls: List[ChatCompletionMessageToolCall], delta: ChoiceDelta):
+    for delta_tool_call in delta.tool_calls:
+        tool_id = delta_tool_call.id
+        arguments = delta_tool_call.function.arguments
+        name = delta_tool_call.function.name
+
+        if name is None and arguments is not None:  # function exists and arguments need to be updated
+            tool_call = tool_calls[-1]
+            tool_call.function.arguments += arguments
+        elif name is not None:  # new function
+            tool_call = ChatCompletionMessageToolCall(
+                id=tool_id,
+                function=Function(
+                    arguments='',
+                    name=name,
+                ),
+                type='function'
+            )
+            tool_calls.append(tool_call)
 
-    while True:
-        if text:
-            delta = yield text  # type: ignore
-        else:
-            delta = yield tool_calls  # type: ignore
-        delta: ChoiceDelta
-
-        if delta.content:
-            if not text:
-                text = ''
-            text += delta.content
-        elif delta.tool_calls:
-            for delta_tool_call in delta.tool_calls:
-                tool_id = delta_tool_call.id
-                arguments = delta_tool_call.function.arguments
-                name = delta_tool_call.function.name
-
-                if name is None and arguments is not None:  # function exists and arguments need to be updated
-                    tool_call = tool_calls[-1]
-                    tool_call.function.arguments += arguments
-                elif name is not None:  # new function
-                    tool_call = ChatCompletionMessageToolCall(
-                        id=tool_id,
-                        function=Function(
-                            arguments='',
-                            name=name,
-                        ),
-                        type='function'
-                    )
-                    tool_calls.append(tool_call)
+
+def _delta_of(delta: ChoiceDelta, tool_calls: List[ChatCompletionMessageToolCall]) -> GptReturnType | None:
+    # the text of a delta, or the tool calls so far, which are updated in place
+    if delta.content:
+        return delta.content
+    elif delta.tool_calls:
+        _update_tool_calls(tool_calls, delta)
+        return tool_calls
+    return None
+
+
+def _accumulate(text: str, tool_calls: List[ChatCompletionMessageToolCall],
+                result: GptReturnType | None) -> Tuple[str, List[ChatCompletionMessageToolCall]]:
+    # as before the delta streams, a chunk without content yields the text so far, or the tool calls so far,
+    # e.g. an empty list for the first chunk
+    if isinstance(result, str):
+        return text + result, tool_calls
+    elif result is not None:
+        return text, result
+    return text, tool_calls
 
 
 def _get_result_from_completion(model_name, completion: ChatCompletion) -> GptReturnType:
@@ -119,6 +125,8 @@ def _get_result_from_completion(model_name, completion: ChatCompletion) -> GptRe
 
 
 class GPTChatGenerator(AbstractContentGenerator[GptReturnType]):
+    native_delta_stream = True
+
     def __init__(self, model_name: str):
         super().__init__('OpenAI')
         self.model_name = model_name
@@ -195,6 +203,39 @@ class GPTChatGenerator(AbstractContentGenerator[GptReturnType]):
     def generate_stream(self, data: Dict[str, str | List[Dict[str, str | List]]],
                         options: Dict[str, Any],
                         dry_run: bool, api_key: str = None) -> Generator[GptReturnType, None, None]:
+        text = ''
+        tool_calls = []
+        for result in self._generate_chunk_stream(data, options, dry_run, api_key):
+            text, tool_calls = _accumulate(text, tool_calls, result)
+            yield text if text else tool_calls
+
+    async def generate_stream_async(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                                    options: Dict[str, Any],
+                                    dry_run: bool, api_key: str = None) -> AsyncIterable[GptReturnType]:
+        text = ''
+        tool_calls = []
+        async for result in self._generate_chunk_stream_async(data, options, dry_run, api_key):
+            text, tool_calls = _accumulate(text, tool_calls, result)
+            yield text if text else tool_calls
+
+    def generate_delta_stream(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                              options: Dict[str, Any],
+                              dry_run: bool, api_key: str = None) -> Generator[GptReturnType, None, None]:
+        for result in self._generate_chunk_stream(data, options, dry_run, api_key):
+            if result is not None:
+                yield result
+
+    async def generate_delta_stream_async(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                                          options: Dict[str, Any],
+                                          dry_run: bool, api_key: str = None) -> AsyncIterable[GptReturnType]:
+        async for result in self._generate_chunk_stream_async(data, options, dry_run, api_key):
+            if result is not None:
+                yield result
+
+    def _generate_chunk_stream(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                               options: Dict[str, Any],
+                               dry_run: bool, api_key: str = None) -> Generator[GptReturnType | None, None, None]:
+        # yields the delta of each chunk, or None for a chunk without content
         messages, options, api_key, return_json = self._set_up(data, options, dry_run, api_key)
         if dry_run:
             return
@@ -207,19 +248,18 @@ class GPTChatGenerator(AbstractContentGenerator[GptReturnType]):
                                                            **options,
                                                            stream=True)
 
-        delta_stream = _concatenate_delta()
-        next(delta_stream)
+        tool_calls = []
 
         for chunk in completion_stream:
             delta = chunk.choices[0].delta
             LOGGER.info(f'Received response (streaming) from {self.model_name}: "{delta}".')
 
             if chunk.choices[0].finish_reason is None:
-                yield delta_stream.send(delta)
+                yield _delta_of(delta, tool_calls)
 
-    async def generate_stream_async(self, data: Dict[str, str | List[Dict[str, str | List]]],
-                                    options: Dict[str, Any],
-                                    dry_run: bool, api_key: str = None) -> Generator[GptReturnType, None, None]:
+    async def _generate_chunk_stream_async(self, data: Dict[str, str | List[Dict[str, str | List]]],
+                                           options: Dict[str, Any],
+                                           dry_run: bool, api_key: str = None) -> AsyncIterable[GptReturnType | None]:
         messages, options, api_key, return_json = self._set_up(data, options, dry_run, api_key)
         if dry_run:
             return
@@ -232,15 +272,14 @@ class GPTChatGenerator(AbstractContentGenerator[GptReturnType]):
                                                                  **options,
                                                                  stream=True)
 
-        delta_stream = _concatenate_delta()
-        next(delta_stream)
+        tool_calls = []
 
         async for chunk in completion_stream:
             LOGGER.info(f'Received response (streaming) from {self.model_name}: "{chunk.choices[0].delta}".')
 
             delta = chunk.choices[0].delta
             if delta is not None:
-                yield delta_stream.send(delta)
+                yield _delta_of(delta, tool_calls)
 
 
 class GPTImageGenerator(AbstractContentGenerator[str]):
@@ -1,3 +1,5 @@
+from typing import Dict, List, FrozenSet
+
 from .._logger import LOGGER
 from .._utils.str_utils import did_you_mean  # noqa
 from .transformer import RmlElement
@@ -22,6 +24,23 @@ RESERVED_ATTR_NAMES = {
     'or': set(),
 }
 
+BUILTIN_ELEMENT_NAMES = frozenset({'list', 'dict', 'list-item', 'dict-item', 'div', 'or', 'br', 'img', 'file', 'if',
+                                   'for', 'optional'})
+
+
+def is_inf_slot_only(slot_params: Dict[str, List[str]]) -> bool:
+    return len(slot_params) == 1 and list(slot_params.keys())[0].startswith('@')
+
+
+def stripped_slot_params(slot_params: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    return {name[1:] if name.startswith('*') else name: params for name, params in slot_params.items()}
+
+
+def template_slot_names(slot_params: Dict[str, List[str]]) -> FrozenSet[str]:
+    if is_inf_slot_only(slot_params):
+        return frozenset([list(slot_params.keys())[0][1:]])
+    return frozenset(stripped_slot_params(slot_params).keys())
+
 
 def check_invalid_attributes(element: RmlElement, reserved_attr_names: set[str]):
     attribute_names = set(element.attributes.keys())
@@ -0,0 +1,625 @@
+"""
+Compile RML trees of petals into trees of pre-bound Python closures.
+
+The compiled nodes produce exactly the same calls on the executor as the interpreter in traverse.py, but the
+dispatch on element indicators, the lookup of attributes and the resolution of templates are all done once
+instead of on every call.
+
+The bodies of templates are also specialized for the arguments given as constants at each call site,
+e.g. <option name="'max_tokens'" value="256"/>: the expressions depending only on constants are evaluated once,
+the "if" elements with constant conditions are inlined or dropped, and the consecutive texts are merged.
+"""
+import ast
+from typing import Callable, List, Iterable, TypeAlias, FrozenSet, Dict, Tuple, Any, Iterator
+
+from ..exceptions import RmlFormatException
+from ..multi_modal.image import Image
+from ._utils import is_inf_slot_only, stripped_slot_params, template_slot_names
+from .data_expression import DataExpression, new_context
+from .environment import Environment, Slot
+from .executor import Executor, TextRun
+from .leaf_elements import RosemaryTemplate, RosemaryPetal, RosemaryNamespace
+from .scope import run_loop, expand_slot, find_in_loop
+from .transformer import RmlElement, TextToken
+
+CompiledNode: TypeAlias = Callable[[Environment, Executor], bool]
+SlotFinder: TypeAlias = Callable[[Dict[str, Slot], Environment], None]
+
+_NOT_CONSTANT = object()
+
+# The nodes of the expressions which can be evaluated at load time, as they have no side effects.
+_CONSTANT_NODES = (ast.Expression, ast.Constant, ast.Name, ast.Load, ast.UnaryOp, ast.BinOp, ast.BoolOp, ast.Compare,
+                   ast.IfExp, ast.Tuple, ast.List, ast.Set, ast.Dict, ast.Subscript, ast.Slice,
+                   ast.unaryop, ast.operator, ast.boolop, ast.cmpop)
+_IMMUTABLE_TYPES = (str, int, float, complex, bool, bytes, type(None))
+
+
+def _is_immutable(value: Any) -> bool:
+    # a constant is shared by all the calls, so it must not be changed by any of them
+    if isinstance(value, (tuple, frozenset)):
+        return all(_is_immutable(item) for item in value)
+    return type(value) in _IMMUTABLE_TYPES
+
+
+def _constant_value(source: str, constants: Dict[str, Any]) -> Any:
+    expr = DataExpression(source)
+    try:
+        tree = ast.parse(expr.value(), mode='eval')
+    except SyntaxError:
+        return _NOT_CONSTANT
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _CONSTANT_NODES) or isinstance(node, ast.Name) and node.id not in constants:
+            return _NOT_CONSTANT
+
+    try:
+        value = expr.evaluate(new_context(constants))
+    except Exception:  # noqa, raised again when it is run
+        return _NOT_CONSTANT
+
+    return value if _is_immutable(value) else _NOT_CONSTANT
+
+
+class _CompileScope:
+    def __init__(self, namespace: RosemaryNamespace, slot_names: FrozenSet[str],
+                 constants: Dict[str, Any] = None, for_format: bool = False):
+        self.namespace = namespace
+        self.slot_names = slot_names
+        # the variables whose values are known when compiling, i.e. the constant arguments of the template
+        self.constants = {} if constants is None else constants
+        # the texts can only be merged when formatting, since the parser matches each of them separately
+        self.for_format = for_format
+
+    def constant(self, source: str) -> Any:
+        """
+        The value of the expression if it only depends on the constants, otherwise _NOT_CONSTANT.
+        """
+        return _constant_value(source, self.constants)
+
+    def without(self, names: Iterable[str] | None = None) -> '_CompileScope':
+        """
+        The same scope where the given variables, or all of them by default, are bound when running.
+        """
+        constants = {} if names is None else {k: v for k, v in self.constants.items() if k not in names}
+        return _CompileScope(self.namespace, self.slot_names, constants, self.for_format)
+
+
+def _raise_when_run(message: str) -> CompiledNode:
+    def run(env: Environment, executor: Executor) -> bool:
+        raise RmlFormatException(message)
+
+    return run
+
+
+def _no_op(env: Environment, executor: Executor) -> bool:
+    return True
+
+
+def _inline(elements: List[RmlElement], scope: _CompileScope) -> Iterator[RmlElement]:
+    # the "div" elements and the "if" elements with a constant condition are replaced by their children
+    for element in elements:
+        if element.is_text:
+            yield element
+        elif element.indicator == ('div',):
+            yield from _inline(element.children, scope)
+        elif element.indicator == ('if',) and 'cond' in element.attributes:
+            cond = scope.constant(element.attributes['cond'])
+            if cond is _NOT_CONSTANT:
+                yield element
+            elif cond:
+                yield from _inline(element.children, scope)
+        else:
+            yield element
+
+
+def _compile_all(elements: List[RmlElement], scope: _CompileScope) -> CompiledNode:
+    nodes = []
+    texts = []
+    for element in _inline(elements, scope):
+        if element.is_text:
+            texts.append(element)
+            continue
+        if texts:
+            nodes.append(_compile_text(texts, scope))
+            texts = []
+        nodes.append(_compile(element, scope))
+    if texts:
+        nodes.append(_compile_text(texts, scope))
+
+    if not nodes:
+        return _no_op
+    if len(nodes) == 1:
+        return nodes[0]
+
+    def run(env: Environment, executor: Executor) -> bool:
+        for node in nodes:
+            if not node(env, executor):
+                return False
+        return True
+
+    return run
+
+
+def _compile_text(elements: List[RmlElement], scope: _CompileScope) -> CompiledNode:
+    values = []
+    for element in elements:
+        for token in element.text_tokens:
+            if token.type == TextToken.TYPE.PLAIN_TEXT:
+                value = token.text
+            elif scope.for_format and (constant := scope.constant(token.text)) is not _NOT_CONSTANT:
+                value = str(constant)  # formatted as the placeholder would be
+            else:
+                value = DataExpression(token.text)
+
+            if scope.for_format and isinstance(value, str) and values and isinstance(values[-1], str):
+                values[-1] += value
+            else:
+                values.append(value)
+    text_run = TextRun(tuple(values))
+
+    def run(env: Environment, executor: Executor) -> bool:
+        return executor.execute_run(text_run, env.context)
+
+    return run
+
+
+def _compile_scope(element: RmlElement, scope: _CompileScope, scope_type: str) -> CompiledNode:
+    children = _compile_all(element.children, scope)
+
+    def run(env: Environment, executor: Executor) -> bool:
+        executor.begin_scope(scope_type)
+        succeed = children(env, executor)
+        executor.end_scope(scope_type)
+        return succeed
+
+    return run
+
+
+def _compile_list_item(element: RmlElement, scope: _CompileScope) -> CompiledNode:
+    if 'value' in element.attributes and (value := scope.constant(element.attributes['value'])) is not _NOT_CONSTANT:
+        def run(env: Environment, executor: Executor) -> bool:
+            executor.begin_scope('list_item')
+            succeed = executor.execute(value, env.context)
+            executor.end_scope('list_item', succeed)
+            return succeed
+    elif 'value' in element.attributes:
+        value_expr = DataExpression(element.attributes['value'])
+
+        def run(env: Environment, executor: Executor) -> bool:
+            executor.begin_scope('list_item')
+            succeed = executor.execute(env.eval(value_expr), env.context)
+            executor.end_scope('list_item', succeed)
+            return succeed
+    else:
+        children = _compile_all(element.children, scope)
+
+        def run(env: Environment, executor: Executor) -> bool:
+            executor.begin_scope('list_item')
+            succeed = children(env, executor)
+            executor.end_scope('list_item', succeed)
+            return succeed
+
+    return run
+
+
+def _compile_dict_item(element: RmlElement, scope: _CompileScope) -> CompiledNode:
+    if 'key' not in element.attributes and 'key_eval' not in element.attributes:
+        return _raise_when_run('Dict item must have a key, given by "key" or "key_eval" attribute.')
+
+    key = element.attributes.get('key')
+    key_expr = None
+    if 'key_eval' in element.attributes:
+        key = scope.constant(element.attributes['key_eval'])
+        if key is _NOT_CONSTANT:
+            key_expr = DataExpression(element.attributes['key_eval'])
+    value = _NOT_CONSTANT
+    value_expr = None
+    if 'value' in element.attributes:
+        value = scope.constant(element.attributes['value'])
+        if value is _NOT_CONSTANT:
+            value_expr = DataExpression(element.attributes['value'])
+    children = _compile_all(element.children, scope)
+
+    def run(env: Environment, executor: Executor) -> bool:
+        executor.begin_scope('dict_item', key if key_expr is None else key_expr.evaluate(env.context))
+
+        if value is not _NOT_CONSTANT:
+            succeed = executor.execute(value, env.context)
+        elif value_expr is not None:
+            succeed = executor.execute(env.eval(value_expr), env.context)
+        else:
+            succeed = children(env, executor)
+
+        executor.end_scope('dict_item', succeed)
+        return succeed
+
+    return run
+
+
+def _compile_br(element: RmlElement) -> CompiledNode:
+    if element.children:
+        return _raise_when_run('br element cannot have children.')
+
+    def run(env: Environment, executor: Executor) -> bool:
+        executor.execute('\n', env.context)
+        return True
+
+    return run
+
+
+def _compile_source(element: RmlElement, element_name: str, to_value: Callable) -> CompiledNode:
+    if 'src' not in element.attributes and 'src_eval' not in element.attributes:
+        return _raise_when_run(f'{element_name} must have a source, given by "src" or "src_eval" attribute.')
+
+    src = element.attributes.get('src')
+    src_expr = DataExpression(element.attributes['src_eval']) if 'src_eval' in element.attributes else None
+
+    def run(env: Environment, executor: Executor) -> bool:
+        executor.execute(to_value(src if src_expr is None else src_expr.evaluate(env.context)), env.context)
+        return True
+
+    return run
+
+
+def _compile_if(element: RmlElement, scope: _CompileScope) -> CompiledNode:
+    if 'cond' not in element.attributes:
+        return _raise_when_run('If must have a condition, given by "cond" attribute.')
+
+    cond_expr = DataExpression(element.attributes['cond'])
+    children = _compile_all(element.children, scope)
+
+    def run(env: Environment, executor: Executor) -> bool:
+        if cond_expr.evaluate(env.context):
+            return children(env, executor)
+        return True
+
+    return run
+
+
+def _range_expression(range_str: str) -> Callable[[Environment], range]:
+    range_expr = DataExpression('range(' + range_str + ')')
+
+    def get_range(env: Environment) -> range:
+        try:
+            loop_range: range = range_expr.evaluate(env.context)
+            assert isinstance(loop_range, range)
+            return loop_range
+        except Exception:
+            raise RmlFormatException(f'"range" is not a valid range expression: {range_str}.')
+
+    return get_range
+
+
+def _compile_loop_in(element: RmlElement, children: CompiledNode) -> Callable[[Iterable, Environment, Executor], bool]:
+    try_expr = DataExpression(element.attributes['try']) if 'try' in element.attributes else None
+    var_name = element.attributes.get('var')
+
+    def loop_in(loop_range: Iterable, curr_env: Environment, executor: Executor) -> bool:
+        end_if_failed = False
+        if try_expr is not None:
+            end_if_failed = try_expr.evaluate(curr_env.context)
+
+        return run_loop(curr_env, var_name, loop_range, children, executor, end_if_failed)
+
+    return loop_in
+
+
+def _compile_for(element: RmlElement, scope: _CompileScope) -> CompiledNode:
+    if 'slot' in element.attributes:  # the parameters of the slot are bound to the elements found for it
+        children = _compile_all(element.children, scope.without())
+    else:
+        children = _compile_all(element.children, scope.without([element.attributes.get('var')]))
+
+    if 'slot' in element.attributes:
+        slot_name = element.attributes['slot']
+
+        def run(env: Environment, executor: Executor) -> bool:
+            return expand_slot(env, slot_name, children, executor)
+
+        return run
+
+    loop_in = _compile_loop_in(element, children)
+
+    if 'range' in element.attributes:
+        get_range = _range_expression(element.attributes['range'])
+
+        def run(env: Environment, executor: Executor) -> bool:
+            return loop_in(get_range(env), env, executor)
+    elif 'in' in element.attributes:
+        in_expr = DataExpression(element.attributes['in'])
+
+        def run(env: Environment, executor: Executor) -> bool:
+            loop_list = in_expr.evaluate(env.context)
+            if not isinstance(loop_list, Iterable):
+                raise RmlFormatException('Loop target must be iterable.')
+            return loop_in(loop_list, env, executor)
+    else:
+        return _raise_when_run('For must have a slot, a range or an iterable object,'
+                               ' given by "slot", "range" or "in" attribute.')
+
+    return run
+
+
+def _compile_optional(element: RmlElement, scope: _CompileScope) -> CompiledNode:
+    required = scope.constant(element.attributes['required']) if 'required' in element.attributes else False
+    required_expr = DataExpression(element.attributes['required']) if required is _NOT_CONSTANT else None
+
+    def is_required(env: Environment) -> bool:
+        return required_expr.evaluate(env.context) if required_expr is not None else required
+
+    if not any(child.indicator == ('or',) for child in element.children):  # consider the whole element as optional
+        children = _compile_all(element.children, scope)
+
+        def run(env: Environment, executor: Executor) -> bool:
+            snapshot = executor.get_snapshot()
+            if children(env, executor):
+                return True
+            executor.back_to_snapshot(snapshot)
+            return not is_required(env)
+    else:  # choose first successful branch
+        branches = tuple(
+            _compile(child, scope) if child.indicator == ('or',) else
+            _raise_when_run('Only "or" elements are allowed in an "optional" element.')
+            for child in element.children
+        )
+
+        def run(env: Environment, executor: Executor) -> bool:
+            for branch in branches:
+                snapshot = executor.get_snapshot()
+                if branch(env, executor):
+                    return True
+                executor.back_to_snapshot(snapshot)
+            return not is_required(env)
+
+    return run
+
+
+def _compile_slot(element: RmlElement) -> CompiledNode:
+    indicator = element.indicator[0]
+
+    if element.children:
+        return _raise_when_run(f'Slot element ("{indicator}") used in a template cannot have children.')
+
+    def run(env: Environment, executor: Executor) -> bool:
+        slot = env.slots[indicator]
+        if not slot.has_next():
+            raise RmlFormatException(f'Elements found for slot "{indicator}" is not enough.')
+
+        slot_content, slot_env, _ = slot.pop()
+
+        return slot_content(slot_env, executor)
+
+    return run
+
+
+def _has_assignment(element: RmlElement) -> bool:
+    if element.is_text:
+        return any(':=' in token.text for token in element.text_tokens if token.type != TextToken.TYPE.PLAIN_TEXT)
+    return (any(':=' in value for value in element.attributes.values()) or
+            any(_has_assignment(child) for child in element.children))
+
+
+def compile_template_body(template: RosemaryTemplate, constants: Dict[str, Any] = None,
+                          for_format: bool = False) -> CompiledNode:
+    """
+    Compile the body of a template, specialized for the arguments whose values are already known.
+    The bodies are kept by template for each combination of constant arguments.
+    """
+    if constants and _has_assignment(template.element):  # the arguments may be assigned in the body
+        constants = None
+    key = (for_format, tuple((name, repr(value)) for name, value in constants.items()) if constants else ())
+
+    if key not in template.compiled_bodies:
+        scope = _CompileScope(template.namespace, template_slot_names(template.slot_params), constants, for_format)
+        template.compiled_bodies[key] = _compile_all(template.element.children, scope)
+    return template.compiled_bodies[key]
+
+
+def _compile_slot_finder(element: RmlElement, scope: _CompileScope, slot_params: Dict[str, List[str]],
+                         in_loop: bool = False) -> SlotFinder:
+    if len(element.indicator) != 1:
+        message = f'Unexpected tag when generating slots: {".".join(element.indicator)}'
+
+        def find(new_slots: Dict[str, Slot], env: Environment):
+            raise RmlFormatException(message)
+
+        return find
+
+    indicator = element.indicator[0]
+
+    def compile_children(scope_: _CompileScope = scope, in_loop_: bool = in_loop) -> Tuple[SlotFinder, ...]:
+        return tuple(_compile_slot_finder(child, scope_, slot_params, in_loop_) for child in element.children)
+
+    if indicator == 'if':
+        children = compile_children()
+        cond_expr = DataExpression(element.attributes['cond']) if 'cond' in element.attributes else None
+        cond = _NOT_CONSTANT if cond_expr is None else scope.constant(element.attributes['cond'])
+
+        def find(new_slots: Dict[str, Slot], env: Environment):
+            if cond_expr is None:
+                raise RmlFormatException('If must have a condition, given by "cond" attribute.')
+
+            if cond if cond is not _NOT_CONSTANT else env.eval(cond_expr):
+                for child in children:
+                    child(new_slots, env)
+
+    elif indicator == 'for':
+        var_name = element.attributes.get('var')
+        children = compile_children(scope.without([var_name]), in_loop or bool(var_name))
+
+        if 'range' in element.attributes:
+            get_loop_range = _range_expression(element.attributes['range'])
+        elif 'in' in element.attributes:
+            in_expr = DataExpression(element.attributes['in'])
+
+            def get_loop_range(env: Environment) -> Iterable:
+                loop_list = env.eval(in_expr)
+                if not isinstance(loop_list, Iterable):
+                    raise RmlFormatException('"in" must be an iterable object.')
+                return loop_list
+        else:
+            def get_loop_range(env: Environment) -> Iterable:
+                raise RmlFormatException(
+                    'For must have a range or an iterable object,'
+                    ' given by "range" or "in" attribute.'
+                )
+
+        def find(new_slots: Dict[str, Slot], env: Environment):
+            def find_in_children():
+                for child in children:
+                    child(new_slots, env)
+
+            find_in_loop(env, var_name, get_loop_range(env), find_in_children)
+
+    elif indicator in stripped_slot_params(slot_params):
+        parameter_names = stripped_slot_params(slot_params)[indicator]
+
+        param_exprs = tuple((param_name, DataExpression(element.attributes[param_name])
+                             if param_name in element.attributes else None)
+                            for param_name in parameter_names)
+        content = _compile_all(element.children, scope)
+
+        def find(new_slots: Dict[str, Slot], env: Environment):
+            var_context = {}
+            for param_name, param_expr in param_exprs:
+                var_context[param_name] = None if param_expr is None else env.eval(param_expr)
+
+            new_slots[indicator].append(content, env, var_context, in_loop)
+
+    else:
+        def find(new_slots: Dict[str, Slot], env: Environment):
+            raise RmlFormatException(f'Slot not found: {indicator}')
+
+    return find
+
+
+class _TemplateCall:
+    """
+    A call of a template. The template is resolved and the call is compiled when it is run for the first time,
+    so that templates defined later in the file, or recursive templates, are supported.
+    """
+
+    def __init__(self, element: RmlElement, scope: _CompileScope):
+        self.element = element
+        self.scope = scope
+        self.call = None
+
+    def __call__(self, env: Environment, executor: Executor) -> bool:
+        if self.call is None:
+            self.call = self._link()
+        return self.call(env, executor)
+
+    def _link(self) -> CompiledNode:
+        element = self.element
+        indicator = element.indicator
+
+        try:
+            template: RosemaryTemplate = self.scope.namespace[indicator]
+        except Exception:
+            raise RmlFormatException(f'Unknown tag: {indicator}.')
+
+        if not isinstance(template, RosemaryTemplate):
+            raise RmlFormatException(
+                f'The given tag name cannot be interpreted as a template or slot: {indicator}.'
+            )
+
+        # the arguments which are constants are evaluated once, and the body is specialized for them
+        constants = {}
+        param_exprs = []
+        for param_name in template.parameter_names:
+            value = self.scope.constant(element.attributes[param_name]) if param_name in element.attributes else None
+            if value is _NOT_CONSTANT:
+                param_exprs.append((param_name, DataExpression(element.attributes[param_name])))
+            else:
+                constants[param_name] = value
+
+        slot_params = template.slot_params
+        body = compile_template_body(template, constants, self.scope.for_format)
+        new_namespace = template.namespace
+        base_context = new_context({param_name: constants.get(param_name) for param_name in template.parameter_names})
+
+        if body is _no_op and not param_exprs and not element.children:
+            return _no_op
+
+        if is_inf_slot_only(slot_params):
+            slot_name = list(slot_params.keys())[0][1:]
+            content = _compile_all(element.children, self.scope)
+
+            def build_slots(env: Environment) -> Dict[str, Slot]:
+                return {slot_name: Slot([(content, env, {})], [], True)}
+        else:
+            finders = tuple(_compile_slot_finder(child, self.scope, slot_params) for child in element.children)
+
+            def build_slots(env: Environment) -> Dict[str, Slot]:
+                new_slots = {}
+                for name, slot_var in slot_params.items():
+                    if name.startswith('*'):
+                        new_slots[name[1:]] = Slot([], slot_var, True)
+                    else:
+                        new_slots[name] = Slot([], slot_var, False)
+                for finder in finders:
+                    finder(new_slots, env)
+                for slot in new_slots.values():
+                    slot.reverse()
+                return new_slots
+
+        def call(env: Environment, executor: Executor) -> bool:
+            context = base_context.copy()
+            for param_name, param_expr in param_exprs:
+                context[param_name] = param_expr.evaluate(env.context)
+
+            return body(Environment(context, build_slots(env), new_namespace), executor)
+
+        return call
+
+
+def _compile(element: RmlElement, scope: _CompileScope) -> CompiledNode:
+    if element.is_text:
+        return _compile_text([element], scope)
+
+    indicator = element.indicator
+    match indicator:
+        case ('list',):
+            return _compile_scope(element, scope, 'list')
+        case ('dict',):
+            return _compile_scope(element, scope, 'dict')
+        case ('list-item',):
+            return _compile_list_item(element, scope)
+        case ('dict-item',):
+            return _compile_dict_item(element, scope)
+        case ('div',) | ('or',):
+            return _compile_all(element.children, scope)
+        case ('br',):
+            return _compile_br(element)
+        case ('img',):
+            return _compile_source(element, 'Image', Image)
+        case ('file',):
+            return _compile_source(element, 'File', lambda src: open(src, 'rb'))
+        case ('if',):
+            return _compile_if(element, scope)
+        case ('for',):
+            return _compile_for(element, scope)
+        case ('optional',):
+            return _compile_optional(element, scope)
+        case _:
+            if len(indicator) == 1 and indicator[0] in scope.slot_names:
+                return _compile_slot(element)
+            else:
+                return _TemplateCall(element, scope)
+
+
+def compile_elements(elements: List[RmlElement], namespace: RosemaryNamespace,
+                     for_format: bool = False) -> CompiledNode:
+    return _compile_all(elements, _CompileScope(namespace, frozenset(), for_format=for_format))
+
+
+def compiled_formatter(petal: RosemaryPetal) -> CompiledNode:
+    if petal.compiled_formatter is None:
+        petal.compiled_formatter = compile_elements(petal.formatter_rml.children, petal.namespace, True)
+    return petal.compiled_formatter
+
+
+def compiled_parser(petal: RosemaryPetal) -> CompiledNode:
+    if petal.compiled_parser is None:
+        petal.compiled_parser = compile_elements(petal.parser_rml.children, petal.namespace)
+    return petal.compiled_parser
@@ -1,26 +1,85 @@
+import builtins
 import inspect
-from typing import TypeAlias, Dict, Any
+import keyword
+import re
+from functools import lru_cache
+from operator import attrgetter
+from types import CodeType
+from typing import TypeAlias, Dict, Any, Tuple
 
 from ..exceptions import ExecutionException
 
 VariableContext: TypeAlias = Dict[str, Any]
 
+_CODE_CACHE_SIZE = 4096
+
+BUILTINS_NAME = '__builtins__'
+
+_ATTRIBUTE_PATH = re.compile(r'[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*')
+_MISSING = object()
+
+
+def new_context(variables: VariableContext) -> VariableContext:
+    # Python inserts the builtins into the globals of eval when they are missing,
+    # so they are put in advance to keep the evaluation from changing the context.
+    return {**variables, BUILTINS_NAME: builtins.__dict__}
+
+
+def _attribute_path(source: str) -> Tuple[str | None, attrgetter | None]:
+    """
+    The variable name and the getter of the attributes of an expression made of a variable name followed by
+    attribute names, e.g. "user.name", which can be resolved without eval, or None for any other expression.
+    """
+    if not _ATTRIBUTE_PATH.fullmatch(source):
+        return None, None
+    name, _, attributes = source.partition('.')
+    if any(keyword.iskeyword(part) for part in source.split('.')):  # e.g. "None" or "True"
+        return None, None
+    return name, attrgetter(attributes) if attributes else None
+
+
+@lru_cache(maxsize=_CODE_CACHE_SIZE)
+def _compile(source: str, mode: str) -> CodeType:
+    # Shared by all the expressions in the process, so the same source is compiled only once.
+    return compile(source, '<string>', mode)
+
 
 class DataExpression:
     def __init__(self, value: str):
         self._value = inspect.cleandoc(value)
+        self._eval_code: CodeType | None = None
+        self._exec_code: CodeType | None = None
+        # Only assignment expressions can bind names in the context during an evaluation.
+        self._has_assignment = ':=' in self._value
+        self._name, self._get_attributes = _attribute_path(self._value)
 
     def value(self):
         return self._value
 
     def evaluate(self, context: VariableContext, need_copy=True):
-        # The eval function is destructive to the context dict.
-        # For time complexity issues, the caller should decide when to not copy the context.
+        # The eval function is destructive to the context dict only when it binds a name or inserts the builtins,
+        # so the context is copied only in those cases, unless the caller allows it to be changed.
+        if self._name is not None:
+            value = context.get(self._name, _MISSING)
+            # the builtins and the undefined names are left to eval, which also raises the error
+            if value is not _MISSING:
+                if self._get_attributes is None:
+                    return value
+                try:
+                    # the same lookups as the evaluation of the code, so the same errors are raised
+                    return self._get_attributes(value)
+                except AssertionError as e:
+                    raise e
+                except Exception as e:
+                    raise ExecutionException(f'Failed to evaluate Python code "{self._value}": {e}.')
+
         try:
-            if need_copy:
-                return eval(self._value, context.copy())
+            if self._eval_code is None:
+                self._eval_code = _compile(self._value, 'eval')
+            if need_copy and (self._has_assignment or BUILTINS_NAME not in context):
+                return eval(self._eval_code, context.copy())
             else:
-                return eval(self._value, context)
+                return eval(self._eval_code, context)
         except AssertionError as e:
             raise e
         except Exception as e:
@@ -28,10 +87,12 @@ class DataExpression:
 
     def execute(self, context: VariableContext, need_copy=True):
         try:
+            if self._exec_code is None:
+                self._exec_code = _compile(self._value, 'exec')
             if need_copy:
-                exec(self._value, context.copy())
+                exec(self._exec_code, context.copy())
             else:
-                exec(self._value, context)
+                exec(self._exec_code, context)
         except AssertionError as e:
             raise e
         except Exception as e:
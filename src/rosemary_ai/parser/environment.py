@@ -1,8 +1,9 @@
-from typing import List, Tuple, TypeAlias, Dict
+from contextlib import contextmanager
+from typing import List, Tuple, TypeAlias, Dict, Any, Iterator
 
 from ._utils import check_invalid_attributes, RESERVED_ATTR_NAMES
 from ..exceptions import RmlSyntaxException
-from ..parser.data_expression import VariableContext, DataExpression
+from ..parser.data_expression import VariableContext, DataExpression, new_context
 from ..parser.leaf_elements import RosemaryPetal, RosemaryTemplate, RosemaryNamespace
 from ..parser.transformer import RmlElement
 
@@ -14,8 +15,10 @@ class Slot:
         self.parameter_names = parameter_names
         self.is_inf = is_inf
 
-    def append(self, element: RmlElement, environment: 'Environment', var_context: VariableContext):
-        self.element_with_info.append((element, environment, var_context))
+    def append(self, element: RmlElement, environment: 'Environment', var_context: VariableContext,
+               in_loop: bool = False):
+        # the loop variables are restored after the search, so the slots found in loops keep a snapshot
+        self.element_with_info.append((element, environment.snapshot() if in_loop else environment, var_context))
 
     def pop(self) -> Tuple[RmlElement, 'Environment', VariableContext]:
         if self.is_inf and len(self.element_with_info) == 1:
@@ -32,6 +35,8 @@ class Slot:
 
 Slots: TypeAlias = Dict[str, Slot]
 
+_UNBOUND = object()
+
 
 class Environment:
     def __init__(self, context: VariableContext, slots: Slots, namespace: RosemaryNamespace):
@@ -42,6 +47,32 @@ class Environment:
     def __copy__(self):
         return Environment(self.context.copy(), self.slots.copy(), self.namespace)
 
+    def snapshot(self) -> 'Environment':
+        # Variables are shadowed in place, so an environment kept for later use must not share the context.
+        return Environment(self.context.copy(), self.slots, self.namespace)
+
+    def get_binding(self, name: str) -> Any:
+        return self.context.get(name, _UNBOUND)
+
+    def restore_binding(self, name: str, binding: Any):
+        # Undo the shadowing of a variable when leaving its scope, e.g. the loop variable of a "for" element.
+        if binding is _UNBOUND:
+            self.context.pop(name, None)
+        else:
+            self.context[name] = binding
+
+    @contextmanager
+    def shadowing(self, *names: str | None) -> Iterator[None]:
+        """
+        The scope of the given variables, which are bound in place inside it. The names which are None are skipped.
+        """
+        bindings = [(name, self.get_binding(name)) for name in names if name]
+        try:
+            yield
+        finally:
+            for name, binding in bindings:
+                self.restore_binding(name, binding)
+
     def eval(self, expr: str | DataExpression, need_copy=True):
         if isinstance(expr, str):
             expr = DataExpression(expr)
@@ -57,7 +88,7 @@ class Environment:
 
 
 def build_environment(petal, data: VariableContext) -> Environment:
-    context = data
+    context = new_context(data)
     slots = {}
     namespace = petal.namespace
     return Environment(context, slots, namespace)
@@ -12,11 +12,30 @@ Value: TypeAlias = OutputValue | DataExpression
 IsSucceed: TypeAlias = bool
 
 
+class TextRun:
+    """
+    A run of consecutive texts and placeholders, e.g. "Name: {res['name'] = __}" in a parser, executed in a single call
+    instead of one call for each of them. The values are executed the same way, only their dispatch is batched.
+    The texts are also kept stripped for the parsers which are not strict.
+    """
+    __slots__ = ('values', 'stripped_values')
+
+    def __init__(self, values: Tuple[Value, ...]):
+        self.values = values
+        self.stripped_values = tuple(value.strip() if isinstance(value, str) else value for value in values)
+
+
 class Executor(metaclass=ABCMeta):
     @abstractmethod
     def execute(self, value: Value, variables: VariableContext) -> IsSucceed:
         pass
 
+    def execute_run(self, run: TextRun, variables: VariableContext) -> IsSucceed:
+        for value in run.values:
+            if not self.execute(value, variables):
+                return False
+        return True
+
     @abstractmethod
     def get_snapshot(self) -> Any:
         pass
@@ -34,6 +53,46 @@ class Executor(metaclass=ABCMeta):
         pass
 
 
+class _TextParts:
+    """
+    A string being concatenated in a scope, kept as a list of fragments which are joined once the scope ends,
+    so that building a long text does not copy it again for each fragment.
+    """
+    __slots__ = ('parts',)
+
+    def __init__(self, *parts: str):
+        self.parts = list(parts)
+
+
+def _is_text(value) -> bool:
+    return isinstance(value, (str, _TextParts))
+
+
+def _append_text(text: str | _TextParts, value: str) -> _TextParts:
+    if isinstance(text, str):
+        return _TextParts(text, value)
+    text.parts.append(value)
+    return text
+
+
+def _join(text):
+    return ''.join(text.parts) if isinstance(text, _TextParts) else text
+
+
+def _append_value(items: list, value):
+    # the text before a value is complete once the value is appended, so only the last item of a list may be
+    # a text still being concatenated, and the items given in the data are never walked
+    if items and isinstance(items[-1], _TextParts):
+        items[-1] = ''.join(items[-1].parts)
+    items.append(value)
+
+
+def _joined(obj):
+    if isinstance(obj, list) and obj and isinstance(obj[-1], _TextParts):
+        obj[-1] = ''.join(obj[-1].parts)
+    return _join(obj)
+
+
 class FormatExecutor(Executor):
     def __init__(self):
         self.scope_stack: List[OutputValue | List | Dict | None] = [None]
@@ -55,16 +114,24 @@ class FormatExecutor(Executor):
         3. Inputs are two images 'a.png' and 'b.png', the stored item will be [Image('a.png'), Image('b.png')].
         As long as the value type does not support list, the item will not be a list deeper than one level.
         """
-        if self.scope_stack[-1] is None:
+        top = self.scope_stack[-1]
+        if isinstance(value, str):
+            if top is None:
+                self.scope_stack[-1] = _TextParts(value)
+            elif _is_text(top):
+                self.scope_stack[-1] = _append_text(top, value)
+            elif not isinstance(top, list):
+                self.scope_stack[-1] = [top, _TextParts(value)]
+            elif _is_text(top[-1]):
+                top[-1] = _append_text(top[-1], value)
+            else:
+                top.append(_TextParts(value))
+        elif top is None:
             self.scope_stack[-1] = value
-        elif isinstance(self.scope_stack[-1], str) and isinstance(value, str):
-            self.scope_stack[-1] += value
-        elif not isinstance(self.scope_stack[-1], list):
-            self.scope_stack[-1] = [self.scope_stack[-1], value]
-        elif isinstance(value, str) and isinstance(self.scope_stack[-1][-1], str):
-            self.scope_stack[-1][-1] += value
+        elif not isinstance(top, list):
+            self.scope_stack[-1] = [_join(top), value]
         else:
-            self.scope_stack[-1].append(value)
+            _append_value(top, value)
 
         return True
 
@@ -107,9 +174,10 @@ class FormatExecutor(Executor):
         assert self.scope_stack
         if not succeed:  # simply not put the obj into the parent container
             return
+        obj = _joined(obj)
         if scope_type == 'list_item':
             assert isinstance(self.scope_stack[-1], list)
-            self.scope_stack[-1] += [obj]
+            _append_value(self.scope_stack[-1], obj)
         elif scope_type == 'dict_item':
             assert isinstance(self.scope_stack[-1], dict)
             self.scope_stack[-1][self.key_stack.pop()] = obj
@@ -117,17 +185,30 @@ class FormatExecutor(Executor):
             assert False
 
     def get_result(self):
+        self.scope_stack[0] = _joined(self.scope_stack[0])
         return self.scope_stack[0]
 
 
 OUTPUT_INDICATOR = '__'
 
 
+# The assignments found so far, as a linked list of (assignment, previous assignments) sharing the earlier ones,
+# so that a snapshot only keeps the head instead of copying the list.
+Assignments: TypeAlias = Tuple[Tuple[DataExpression, VariableContext], 'Assignments'] | None
+
+
 class ParseExecutor(Executor):
+    """
+    Matches the texts of a parser against the string, moving a cursor over it instead of slicing off the matched part,
+    so that parsing is linear in the length of the string.
+    """
+
     def __init__(self, raw_str: str, target: str, target_obj, is_parse_strict: bool):
         self.raw_str: str = raw_str
+        self.pos = 0  # the start of the part of the string which is not matched yet
         self.last_target_repr_with_var: Tuple[DataExpression, VariableContext] | None = None
-        self.assign_with_var_list: List[Tuple[DataExpression, VariableContext]] = []
+        self.assignments: Assignments = None
+        self.missing_texts: Dict[str, int] = {}  # the texts which were not found, with where they were searched from
         self.target = target
         self.target_obj = target_obj
         self.is_parse_strict = is_parse_strict
@@ -140,28 +221,54 @@ class ParseExecutor(Executor):
         elif isinstance(value, str):
             if not self.is_parse_strict:
                 value: str = value.strip()
-            pos = self.raw_str.find(value)
+            pos = self.raw_str.find(value, self.pos)
             if pos == -1:
+                self._store_missing_text(value, self.pos)
                 return False
-            leading = self.raw_str[:pos]
             if self.last_target_repr_with_var is not None:
-                self._store_assignment(leading)
+                self._store_assignment(self.raw_str[self.pos:pos])
                 self.last_target_repr_with_var = None
-            self.raw_str = self.raw_str[pos + len(value):]
+            self.pos = pos + len(value)
         else:
             assert False
 
         return True
 
-    def get_snapshot(self) -> Tuple[str, Tuple[DataExpression, VariableContext] | None,
-                                    List[Tuple[DataExpression, VariableContext]]]:
-
-        return self.raw_str, self.last_target_repr_with_var, self.assign_with_var_list.copy()
-
-    def back_to_snapshot(self, state: Tuple[str, Tuple[DataExpression, VariableContext] | None,
-                         List[Tuple[DataExpression, VariableContext]]]):
-
-        self.raw_str, self.last_target_repr_with_var, self.assign_with_var_list = state
+    def execute_run(self, run: TextRun, variables: VariableContext) -> IsSucceed:
+        # the same steps as executing the values one by one, batched in one call
+        raw_str = self.raw_str
+        pos = self.pos
+        last_target = self.last_target_repr_with_var
+        succeed = True
+
+        for value in run.values if self.is_parse_strict else run.stripped_values:
+            if isinstance(value, str):
+                found = raw_str.find(value, pos)
+                if found == -1:
+                    self._store_missing_text(value, pos)
+                    succeed = False
+                    break
+                if last_target is not None:
+                    target_repr, var = last_target
+                    var[OUTPUT_INDICATOR] = raw_str[pos:found]
+                    self.assignments = ((target_repr, var), self.assignments)
+                    last_target = None
+                pos = found + len(value)
+            elif isinstance(value, DataExpression):
+                if last_target is None:
+                    last_target = (value, variables.copy())
+            else:
+                assert False
+
+        self.pos = pos
+        self.last_target_repr_with_var = last_target
+        return succeed
+
+    def get_snapshot(self) -> Tuple[int, Tuple[DataExpression, VariableContext] | None, Assignments]:
+        return self.pos, self.last_target_repr_with_var, self.assignments
+
+    def back_to_snapshot(self, state: Tuple[int, Tuple[DataExpression, VariableContext] | None, Assignments]):
+        self.pos, self.last_target_repr_with_var, self.assignments = state
 
     def begin_scope(self, scope_name: str, key=None):
         pass
@@ -169,11 +276,35 @@ class ParseExecutor(Executor):
     def end_scope(self, scope_name: str, succeed=True):
         pass
 
+    def extend(self, raw_str: str, is_extension: bool = False) -> bool:
+        """
+        Continue with a longer string, e.g. the response of a stream with the text which arrived since,
+        keeping the state of the parser. Returns whether the parser would take the same way on it, i.e. whether
+        none of the texts it failed to find is in the new text, as only the new text is searched.
+        Otherwise, the parser has to be run again.
+        With is_extension, the string is known to start with the current one, e.g. when it is built from the deltas
+        of a stream, which is then not checked.
+        """
+        old_length = len(self.raw_str)
+        if not is_extension and (len(raw_str) < old_length or not raw_str.startswith(self.raw_str)):
+            return False
+        for value, pos in self.missing_texts.items():
+            if raw_str.find(value, max(pos, old_length - len(value) + 1)) != -1:
+                return False
+
+        self.raw_str = raw_str
+        return True
+
+    def captured_texts(self, assign_remain: bool) -> List[Tuple[DataExpression, str]]:
+        """
+        The assignments which would be activated, with the texts they capture, to tell whether two runs of the parser
+        give the same result.
+        """
+        return [(assign, env[OUTPUT_INDICATOR]) for assign, env in self._assignment_list(assign_remain)]
+
     def activate_assignments(self, assign_remain: bool):
-        if self.last_target_repr_with_var is not None and assign_remain:
-            self._store_assignment(self.raw_str)
         result = self.target_obj
-        for assign, env in self.assign_with_var_list:
+        for assign, env in self._assignment_list(assign_remain):
             if self.target:
                 env[self.target] = result
 
@@ -184,9 +315,28 @@ class ParseExecutor(Executor):
 
         return result
 
+    def _assignment_list(self, assign_remain: bool) -> List[Tuple[DataExpression, VariableContext]]:
+        # the remaining string is not stored as an assignment, so that the assignments can be activated again
+        # after the string is extended
+        assign_with_var_list = []
+        assignments = self.assignments
+        if self.last_target_repr_with_var is not None and assign_remain:
+            target_repr, var = self.last_target_repr_with_var
+            var[OUTPUT_INDICATOR] = self.raw_str[self.pos:]
+            assignments = ((target_repr, var), assignments)
+
+        while assignments is not None:
+            assign_with_var, assignments = assignments
+            assign_with_var_list.append(assign_with_var)
+        assign_with_var_list.reverse()
+        return assign_with_var_list
+
+    def _store_missing_text(self, value: str, pos: int):
+        # a text is found in a longer string if it is found from any later position, so the earliest one is enough
+        if pos < self.missing_texts.get(value, pos + 1):
+            self.missing_texts[value] = pos
+
     def _store_assignment(self, value: str):
         target_repr, var = self.last_target_repr_with_var
         var[OUTPUT_INDICATOR] = value
-        self.assign_with_var_list += [
-            (target_repr, var)
-        ]
+        self.assignments = ((target_repr, var), self.assignments)
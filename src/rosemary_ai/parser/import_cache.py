@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Tuple, TypeAlias
+
+from .._global_settings import SETTINGS
+from .leaf_elements import RosemaryNamespace
+from .transformer import RmlElement
+
+FileStamp: TypeAlias = Tuple[int, int]
+ImportKey: TypeAlias = Tuple[Path, str]
+
+
+def file_stamp(path: Path) -> FileStamp:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ImportedFile:
+    def __init__(self, namespace: RosemaryNamespace, stamps: Dict[Path, FileStamp], rml_tree: RmlElement):
+        self.namespace = namespace
+        self.stamps = stamps  # the file itself and all the files imported by it, directly or not
+        self.rml_tree = rml_tree
+
+    def is_fresh(self) -> bool:
+        try:
+            return all(file_stamp(path) == stamp for path, stamp in self.stamps.items())
+        except OSError:
+            return False
+
+
+class ImportCache:
+    """
+    Process-wide LRU cache of the namespaces of imported RML files, shared by all the Rosemary instances.
+    An entry is reused as long as neither the file nor any file it imports has been modified since it was loaded.
+    """
+
+    def __init__(self):
+        self._entries: OrderedDict[ImportKey, ImportedFile] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: ImportKey) -> ImportedFile | None:
+        with self._lock:
+            imported_file = self._entries.get(key)
+            if imported_file is None:
+                return None
+            self._entries.move_to_end(key)
+
+        if not imported_file.is_fresh():
+            with self._lock:
+                if self._entries.get(key) is imported_file:
+                    del self._entries[key]
+            return None
+
+        return imported_file
+
+    def put(self, key: ImportKey, imported_file: ImportedFile):
+        max_size = SETTINGS.get('IMPORT_CACHE_SIZE')
+        with self._lock:
+            if max_size <= 0:
+                self._entries.clear()
+                return
+            self._entries[key] = imported_file
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+IMPORT_CACHE = ImportCache()
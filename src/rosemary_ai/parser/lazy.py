@@ -0,0 +1,105 @@
+import re
+from typing import List, Tuple, Dict
+
+from .._utils.str_escape import escape_attribute_value
+from .transformer import RmlElement
+
+DEFERRED_INDICATORS = (('petal',), ('template',))
+
+_NAME = r'[a-zA-Z_-][a-zA-Z0-9_-]*(?![a-zA-Z0-9_-])'
+_INDICATOR = rf'{_NAME}(?:\s*\.\s*{_NAME})*'
+_ATTRIBUTE = rf'{_NAME}(?:\s*=\s*"(?:[^"\\]|\\["\\])*")?'
+_ATTRIBUTE_GROUPS = re.compile(rf'(?P<name>{_NAME})(?:\s*=\s*"(?P<value>(?:[^"\\]|\\["\\])*)")?')
+
+# The constructs which can contain tags or brackets without being elements are skipped as a whole.
+_SKIM = re.compile(rf'''
+    <!--.*?-->
+  | \[<RAW>\[.*?\]<RAW>\]
+  | << | >> | {{{{ | }}}}
+  | {{(?:[^{{}}]|{{{{|}}}})*}}
+  | (?P<close></\s*{_INDICATOR}\s*>)
+  | (?P<open><\s*(?P<name>{_INDICATOR})(?P<attributes>(?:\s*{_ATTRIBUTE})*)\s*(?P<empty>/)?>)
+''', re.DOTALL | re.VERBOSE)
+
+
+class DeferredElement(RmlElement):
+    """
+    A top-level petal or template of a lazily parsed file. Only its attributes are parsed,
+    while its children are kept as source code until it is first looked up.
+    """
+    __slots__ = ('source',)
+
+    def __init__(self, indicator: Tuple[str, ...], attributes, source: str):
+        super().__init__(False, indicator, attributes=attributes)
+        self.source = source
+
+    def __reduce__(self):
+        return DeferredElement, (self.indicator, dict(self.attributes) if self.attributes else None, self.source)
+
+
+def _attributes(src: str) -> Dict[str, str]:
+    # the same as the attributes of the transformer, without running the parser on them
+    attributes = {}
+    for match in _ATTRIBUTE_GROUPS.finditer(src):
+        value = match.group('value')
+        attributes[match.group('name')] = 'True' if value is None else escape_attribute_value(value)
+    return attributes
+
+
+def split_definitions(src: str) -> Tuple[str, List[Tuple[int, DeferredElement]], int] | None:
+    """
+    Index the top-level petals and templates of the source code by their offsets, without parsing their bodies.
+    Returns the source code without them, the deferred elements in order, each with the number of the other
+    top-level elements before it, and the number of the other top-level elements,
+    or None if the structure of the file could not be recognized.
+    """
+    skeleton = []
+    definitions = []
+    n_elements = 0
+    depth = 0
+    start = 0
+    opening_tag = None
+
+    for match in _SKIM.finditer(src):
+        if match.group('open') is not None:
+            if depth == 0:
+                opening_tag = match
+            if match.group('empty') is None:
+                depth += 1
+        elif match.group('close') is not None:
+            depth -= 1
+            if depth < 0:
+                return None
+        else:
+            continue
+
+        if depth == 0:
+            indicator = tuple(map(str.strip, opening_tag.group('name').split('.')))
+            if indicator in DEFERRED_INDICATORS:
+                skeleton.append(src[start:opening_tag.start()])
+                definitions.append((n_elements, DeferredElement(indicator, _attributes(opening_tag.group('attributes')),
+                                                                src[opening_tag.start():match.end()])))
+                start = match.end()
+            else:
+                n_elements += 1
+
+    if depth != 0:
+        return None
+
+    skeleton.append(src[start:])
+    return ''.join(skeleton), definitions, n_elements
+
+
+def defer_definitions(skeleton_tree: RmlElement, definitions: List[Tuple[int, DeferredElement]]) -> RmlElement:
+    """
+    Insert the deferred elements back among the top-level elements of the tree parsed from the rest of the file.
+    """
+    children = []
+    end = 0
+    for position, definition in definitions:
+        children += skeleton_tree.children[end:position]
+        children.append(definition)
+        end = position
+    children += skeleton_tree.children[end:]
+
+    return RmlElement(False, skeleton_tree.indicator, children=children)
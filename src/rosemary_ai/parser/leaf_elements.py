@@ -14,6 +14,7 @@ class RosemaryTemplate:
         self.parameter_names = parameter_names
         self.slot_params = slot_params
         self.namespace = namespace
+        self.compiled_bodies = {}
 
 
 class RosemaryPetal:
@@ -29,6 +30,8 @@ class RosemaryPetal:
         self.init = init
         self.is_parse_strict = is_parse_strict
         self.default_model_name = default_model_name
+        self.compiled_formatter = None
+        self.compiled_parser = None
 
     def __str__(self):
         return f'Rosemary Petal {self.name}'
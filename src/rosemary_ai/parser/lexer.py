@@ -0,0 +1,149 @@
+import re
+from typing import Iterator
+
+from lark import Token
+from lark.common import LexerConf
+from lark.exceptions import UnexpectedCharacters, UnexpectedEOF, UnexpectedInput
+from lark.lexer import Lexer
+
+COMMENT_START = '<!--'
+COMMENT_END = '-->'
+RAW_START = '[<RAW>['
+RAW_END = ']<RAW>]'
+
+_WS = re.compile(r'[ \t\f\r\n]+')
+# The same texts as the PLAIN_TEXT terminal, where the brackets are escaped by doubling them, e.g. "<<",
+# but the raw text delimiters are only looked ahead for at the square brackets, instead of at every character.
+_PLAIN_TEXT = re.compile(r'(?:[^<>{}\[\]]+|<<|>>|{{|}}|\[(?!<RAW>\[)|\](?!<RAW>\]))+')
+_RAW_STOP = re.compile(r'\[<RAW>\[|\]<RAW>\]')
+
+_TEXT, _TAG, _ATTRIBUTE_VALUE, _PLACEHOLDER, _RAW = range(5)
+
+
+class RmlLexer(Lexer):
+    """
+    Lexer of the RML grammar for the LALR parser, producing the same tokens as the contextual lexer Lark generates.
+    The plain texts, raw texts and comments are scanned without the lookaheads at every character of their terminals,
+    which make the Lark lexer slow on long text bodies.
+    """
+
+    def __init__(self, lexer_conf: LexerConf):
+        names = {terminal.pattern.value: terminal.name for terminal in lexer_conf.terminals}
+        patterns = {terminal.name: terminal.pattern for terminal in lexer_conf.terminals}
+
+        self.less_than = names['<']
+        self.more_than = names['>']
+        self.close_tag_start = names['</']
+        self.empty_tag_end = names['/>']
+        self.dot = names['.']
+        self.equal = names['=']
+        self.quote = names['"']
+        self.left_brace = names['{']
+        self.right_brace = names['}']
+        self.raw_start = names[RAW_START]
+        self.raw_end = names[RAW_END]
+
+        self.indicator_name = re.compile(patterns['INDICATOR_NAME'].to_regexp())
+        self.attribute_value = re.compile(patterns['ATTRIBUTE_VALUE'].to_regexp())
+        self.data_indicator = re.compile(patterns['DATA_INDICATOR'].to_regexp())
+
+    def lex(self, data: str) -> Iterator[Token]:  # noqa
+        pos = 0
+        line = 1
+        line_start = 0
+        mode = _TEXT
+
+        def token(token_type: str, end: int) -> Token:
+            nonlocal pos, line, line_start
+            start_line, start_column = line, pos - line_start + 1
+            newlines = data.count('\n', pos, end)
+            if newlines:
+                line += newlines
+                line_start = data.rindex('\n', pos, end) + 1
+            result = Token(token_type, data[pos:end], pos, start_line, start_column, line, end - line_start + 1, end)
+            pos = end
+            return result
+
+        def unexpected(*expected: str) -> UnexpectedInput:
+            if pos < len(data):
+                return UnexpectedCharacters(data, pos, line, pos - line_start + 1)
+            # the input is truncated, e.g. in a placeholder, which is reported where it ends
+            error = UnexpectedEOF(list(expected))
+            error.pos_in_stream, error.line, error.column = pos, line, pos - line_start + 1
+            return error
+
+        while pos < len(data):
+            char = data[pos]
+
+            if mode == _TEXT:
+                next_char = data[pos + 1:pos + 2]
+                if char == '<' and next_char != '<':
+                    if data.startswith(COMMENT_START, pos):
+                        end = data.find(COMMENT_END, pos + len(COMMENT_START))
+                        if end == -1:
+                            raise unexpected()
+                        yield token('COMMENT', end + len(COMMENT_END))
+                    elif next_char == '/':
+                        yield token(self.close_tag_start, pos + 2)
+                        mode = _TAG
+                    else:
+                        yield token(self.less_than, pos + 1)
+                        mode = _TAG
+                elif char == '{' and next_char != '{':
+                    yield token(self.left_brace, pos + 1)
+                    mode = _PLACEHOLDER
+                elif data.startswith(RAW_START, pos):
+                    yield token(self.raw_start, pos + len(RAW_START))
+                    mode = _RAW
+                elif match := _PLAIN_TEXT.match(data, pos):
+                    yield token('PLAIN_TEXT', match.end())
+                else:
+                    raise unexpected()
+
+            elif mode == _TAG:
+                if char in ' \t\f\r\n':
+                    token('WS', _WS.match(data, pos).end())  # ignored
+                elif match := self.indicator_name.match(data, pos):
+                    yield token('INDICATOR_NAME', match.end())
+                elif char == '.':
+                    yield token(self.dot, pos + 1)
+                elif char == '=':
+                    yield token(self.equal, pos + 1)
+                elif char == '"':
+                    yield token(self.quote, pos + 1)
+                    mode = _ATTRIBUTE_VALUE
+                elif char == '>':
+                    yield token(self.more_than, pos + 1)
+                    mode = _TEXT
+                elif data.startswith('/>', pos):
+                    yield token(self.empty_tag_end, pos + 2)
+                    mode = _TEXT
+                else:
+                    raise unexpected()
+
+            elif mode == _ATTRIBUTE_VALUE:
+                if match := self.attribute_value.match(data, pos):
+                    yield token('ATTRIBUTE_VALUE', match.end())
+                if not data.startswith('"', pos):
+                    raise unexpected(self.quote)
+                yield token(self.quote, pos + 1)
+                mode = _TAG
+
+            elif mode == _PLACEHOLDER:
+                if match := self.data_indicator.match(data, pos):
+                    yield token('DATA_INDICATOR', match.end())
+                if not data.startswith('}', pos):
+                    raise unexpected(self.right_brace)
+                yield token(self.right_brace, pos + 1)
+                mode = _TEXT
+
+            else:
+                match = _RAW_STOP.search(data, pos)
+                end = len(data) if match is None else match.start()
+                if end > pos:
+                    yield token('RAW_TEXT', end)
+                if pos < len(data):
+                    if not data.startswith(RAW_END, pos):
+                        raise unexpected()
+                    yield token(self.raw_end, pos + len(RAW_END))
+                    mode = _TEXT
@@ -1,40 +1,154 @@
-from typing import Dict, Tuple, TypeVar, Generic, List, Iterable
+from threading import RLock
+from weakref import WeakSet
+from typing import Dict, Tuple, TypeVar, Generic, List, Iterable, Callable, Set
 
 from .._utils.str_utils import full_name_to_indicator
 
 T = TypeVar('T')
 
+_UNRESOLVED = object()
+
+
+class LazyValue(Generic[T]):
+    """
+    A value of a namespace which is built the first time it is looked up, e.g. a petal whose body is parsed lazily.
+    The check is run once the value is available, so it may look up the value again.
+    """
+
+    def __init__(self, build: Callable[[], T], check: Callable[[T], None] = None):
+        self._build = build
+        self._check = check
+        self._value = _UNRESOLVED
+        self._lock = RLock()
+
+    def resolve(self) -> T:
+        if self._value is _UNRESOLVED:
+            with self._lock:
+                if self._value is _UNRESOLVED:
+                    value = self._build()
+                    self._value = value
+                    if self._check is not None:
+                        self._check(value)
+        return self._value
+
+    def __repr__(self):
+        return 'LazyValue<unresolved>' if self._value is _UNRESOLVED else f'LazyValue<{self._value!r}>'
+
 
 class Namespace(Generic[T]):
     def __init__(self, parent: 'Namespace' = None):
         self._local: Dict[str, T | 'Namespace'] = {}
         self._parent = parent
+        # the namespaces of the files imported with all their names, which are only loaded when a name is looked up
+        self._imported: List[LazyValue['Namespace']] = []
+        self._resolved: Dict[str | Tuple[str, ...], T | 'Namespace'] = {}
+        self._version = 0
+        # the namespaces whose resolved names were looked up through this one, i.e. its children, the namespaces
+        # importing it and those looking up a name inside it, which are invalidated with it
+        self._dependents: WeakSet['Namespace'] = WeakSet()
+        if parent is not None:
+            parent._dependents.add(self)
 
     def __getitem__(self, full_name_or_names: str | Iterable[str]):
+        try:
+            return self._resolved[full_name_or_names]
+        except (KeyError, TypeError):
+            pass
+
+        version = self._version
         if isinstance(full_name_or_names, str):
-            return self[full_name_to_indicator(full_name_or_names)]
+            key = full_name_or_names
+            value = self._get_by_indicator(full_name_to_indicator(full_name_or_names))
+        else:
+            key = (*full_name_or_names,)
+            value = self._get_by_indicator(key)
 
-        return self._get_by_indicator((*full_name_or_names,))
+        if version == self._version:  # not appended to while the name was looked up
+            self._resolved[key] = value
+        return value
 
     def _get_by_name(self, name: str):
-        if name in self._local:
-            return self._local[name]
+        try:
+            return self._get_local(name)
+        except KeyError:
+            pass
         if self._parent is not None:
             return self._parent[name]
         raise KeyError(f'Key {name} not found in namespace.')
 
+    def _get_local(self, name: str):
+        if name in self._local:
+            value = self._local[name]
+            if isinstance(value, LazyValue):
+                return value.resolve()
+            return value
+        for imported in reversed(self._imported):  # the names of the later imports override the earlier ones
+            namespace = imported.resolve()
+            namespace._dependents.add(self)
+            try:
+                return namespace._get_local(name)
+            except KeyError:
+                pass
+        raise KeyError(f'Key {name} not found in namespace.')
+
+    def _invalidate(self, invalidated: Set[int]):
+        if id(self) in invalidated:
+            return
+        invalidated.add(id(self))
+
+        self._version += 1
+        self._resolved.clear()
+        for dependent in list(self._dependents):
+            dependent._invalidate(invalidated)
+
     def append(self, key: str, value: T | 'Namespace'):
         self._local[key] = value
+        self._invalidate(set())
+
+    def append_import(self, imported: LazyValue['Namespace']):
+        """
+        Import all the names of a namespace which is only built when one of them is looked up.
+        The names of the namespace itself always take precedence over the imported ones.
+        """
+        self._imported.append(imported)
+        self._invalidate(set())
+
+    def resolve_all(self, visited: Set[int] = None):
+        """
+        Resolve all the lazy values of the namespace, and of the namespaces it contains or imports,
+        so that their errors are raised now instead of when they are first looked up.
+        """
+        if visited is None:
+            visited = set()
+        if id(self) in visited:
+            return
+        visited.add(id(self))
+
+        namespaces = [imported.resolve() for imported in self._imported]
+        for value in list(self._local.values()):
+            if isinstance(value, LazyValue):
+                value = value.resolve()
+            if isinstance(value, Namespace):
+                namespaces.append(value)
+
+        for namespace in namespaces:
+            namespace.resolve_all(visited)
 
     def _get_by_indicator(self, indicator: Tuple[str, ...]) -> T | 'Namespace':
         assert indicator
         if len(indicator) == 1:
             return self._get_by_name(indicator[0])
         else:
-            return self._get_by_name(indicator[0])._get_by_indicator(indicator[1:])
+            namespace = self._get_by_name(indicator[0])
+            namespace._dependents.add(self)
+            return namespace._get_by_indicator(indicator[1:])
 
     def items(self) -> List[Tuple[str, T | 'Namespace']]:
-        return list(self._local.items())
+        items = {}
+        for imported in self._imported:
+            items.update(imported.resolve().items())
+        items.update(self._local)
+        return list(items.items())
 
     def __str__(self):
         return f'Namespace{self._local}'
@@ -43,4 +157,4 @@ class Namespace(Generic[T]):
         return self.__str__()
 
     def __len__(self):
-        return len(self._local)
+        return len(self.items())
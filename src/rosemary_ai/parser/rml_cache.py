@@ -0,0 +1,95 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+
+from .._logger import LOGGER
+from .._utils.file_utils import read_and_close_file_to_root
+from .transformer import RmlElement
+
+# Bump this when the pickled representation of RmlElement changes.
+CACHE_FORMAT_VERSION = 2
+
+_CACHE_SUFFIX = '.rmlc'
+
+# The modules building the trees from the sources, whose code is part of the key along with the grammar, since the
+# package version does not change when they are modified in a checkout.
+_TREE_BUILDING_MODULES = ('transformer.py', 'lexer.py', 'rml_parser.py')
+
+
+def _package_version() -> str:
+    try:
+        return metadata.version('rosemary_ai')
+    except metadata.PackageNotFoundError:
+        return 'dev'
+
+
+@lru_cache(maxsize=None)
+def _sources_digest(grammar_path: str) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(read_and_close_file_to_root(grammar_path).encode('utf-8'))
+    for module in _TREE_BUILDING_MODULES:
+        hasher.update(b'\0' + (Path(__file__).parent / module).read_bytes())
+    return hasher.hexdigest()
+
+
+class RmlTreeCache:
+    """
+    On-disk cache of transformed RML trees.
+
+    Entries are keyed by the hash of the source code together with the grammar and the code building the trees,
+    the parser algorithm, the package version and the cache format version, so a changed file, an upgraded package
+    or a modified checkout will simply miss the cache. Entries are written to a temporary file and atomically moved
+    into place, so concurrent processes never see a partially written entry. Only point the cache to a directory
+    you trust, as entries are pickled.
+    """
+
+    def __init__(self, cache_dir: str | Path, grammar_path: str):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._key_prefix = '\0'.join([
+            str(CACHE_FORMAT_VERSION),
+            _package_version(),
+            _sources_digest(grammar_path),
+        ])
+
+    def _entry_path(self, src: str, algorithm: str) -> Path:
+        hasher = hashlib.sha256()
+        hasher.update(self._key_prefix.encode('utf-8'))
+        hasher.update(b'\0' + algorithm.encode('utf-8') + b'\0')
+        hasher.update(src.encode('utf-8'))
+        return self.cache_dir / (hasher.hexdigest() + _CACHE_SUFFIX)
+
+    def load(self, src: str, algorithm: str) -> RmlElement | None:
+        path = self._entry_path(src, algorithm)
+        try:
+            with open(path, 'rb') as f:
+                tree = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            LOGGER.warning(f'Failed to load cached RML tree from {path}: {e}. Will parse the source again.')
+            return None
+
+        if not isinstance(tree, RmlElement):
+            return None
+
+        return tree
+
+    def store(self, src: str, algorithm: str, tree: RmlElement):
+        path = self._entry_path(src, algorithm)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            LOGGER.warning(f'Failed to store parsed RML tree to {path}: {e}.')
@@ -1,34 +1,224 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from pathlib import Path
+from threading import Lock, RLock
+from typing import Dict, List, Tuple, Callable, TypeAlias
 
 from lark import Lark
 
+from .._global_settings import SETTINGS
 from .._utils.file_utils import read_and_close_file_to_root, read_and_close_file, _get_proj_root  # noqa
-from .namespace import Namespace
+from .lexer import RmlLexer
+from .import_cache import IMPORT_CACHE, ImportedFile, FileStamp, file_stamp
+from .lazy import DeferredElement, split_definitions, defer_definitions
+from .leaf_elements import LeafElement
+from .namespace import Namespace, LazyValue
+from .rml_cache import RmlTreeCache
 from .environment import rml_to_petal, rml_to_template, RosemaryNamespace
 from .transformer import RmlElement, TreeToRmlTreeTransformer
+from .validation import check_leaf_elements
 from ..exceptions import RmlSyntaxException
 
 GRAMMAR_PATH = "parser/rosemary.lark"
 RML_COMMON_PATH = "rml_common/common.rml"
 
+PARSER_ALGORITHMS = ('lalr', 'earley')
+# Lark can only run the transformer while parsing with LALR, the Earley parser still builds the parse tree first.
+# The LALR parser also uses the hand-written lexer, while the Earley parser keeps the dynamic lexer of Lark.
+EMBEDDED_TRANSFORMER_ALGORITHMS = ('lalr',)
+
+_LARK_PARSERS: Dict[str, Lark] = {}
+_LARK_PARSERS_LOCK = Lock()
+
+
+def get_lark_parser(algorithm: str = 'earley') -> Lark:
+    """
+    Get the Lark parser of the RML grammar. The parser is built only once per process for each algorithm
+    and shared by all the RosemaryParser instances.
+    With LALR, the RML tree is built during parsing and returned by the parser, without the intermediate parse tree.
+    """
+    if algorithm not in PARSER_ALGORITHMS:
+        raise ValueError(f'Unknown parser algorithm "{algorithm}", should be one of {PARSER_ALGORITHMS}.')
+
+    if algorithm not in _LARK_PARSERS:
+        with _LARK_PARSERS_LOCK:
+            if algorithm not in _LARK_PARSERS:
+                grammar = read_and_close_file_to_root(GRAMMAR_PATH)
+                if algorithm in EMBEDDED_TRANSFORMER_ALGORITHMS:
+                    _LARK_PARSERS[algorithm] = Lark(grammar, start='rosemary', parser=algorithm, lexer=RmlLexer,
+                                                    transformer=TreeToRmlTreeTransformer(True))
+                else:
+                    _LARK_PARSERS[algorithm] = Lark(grammar, start='rosemary', parser=algorithm)
+
+    return _LARK_PARSERS[algorithm]
+
+
+def parse_rml_tree(parser: Lark, src: str) -> RmlElement:
+    tree = parser.parse(src)
+    if parser.options.transformer is None:
+        tree = TreeToRmlTreeTransformer().transform(tree)
+    return tree
+
+
+_TREE_CACHES: Dict[str, RmlTreeCache] = {}
+
+
+def get_tree_cache() -> RmlTreeCache | None:
+    cache_dir = SETTINGS.get('RML_CACHE_DIR')
+    if cache_dir is None:
+        return None
+
+    cache_dir = str(cache_dir)
+    if cache_dir not in _TREE_CACHES:
+        _TREE_CACHES[cache_dir] = RmlTreeCache(cache_dir, GRAMMAR_PATH)
+
+    return _TREE_CACHES[cache_dir]
+
+
+# The total size of the files of an import wave from which they are parsed in the process pool. Starting the workers,
+# building their Lark parser and sending the trees back is only worth it for a few hundred milliseconds of parsing,
+# and the LALR parser parses about 40 times as fast as the Earley parser.
+MIN_PARALLEL_PARSE_SIZE = {'lalr': 512 * 1024, 'earley': 16 * 1024}
+
+_PARSE_POOL: ProcessPoolExecutor | None = None
+_PARSE_POOL_WORKERS = 0
+_PARSE_POOL_LOCK = Lock()
+
+
+def get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Get the process pool used to parse the imported files in parallel. The pool is kept for the next loads,
+    so that the workers only build their Lark parser once.
+    The workers are spawned rather than forked, as the pool may be started while other threads are running,
+    e.g. the one watching the files.
+    """
+    global _PARSE_POOL, _PARSE_POOL_WORKERS
+
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None or _PARSE_POOL_WORKERS != workers:
+            if _PARSE_POOL is not None:
+                _PARSE_POOL.shutdown(wait=False)
+            _PARSE_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _PARSE_POOL_WORKERS = workers
+
+    return _PARSE_POOL
+
+
+def discard_parse_pool(pool: ProcessPoolExecutor):
+    """
+    Discard a broken pool, e.g. whose workers failed to start, so that the next loads start a new one.
+    """
+    global _PARSE_POOL
+
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is pool:
+            _PARSE_POOL = None
+    pool.shutdown(wait=False)
+
+
+def _parse_rml_file(path: Path, algorithm: str, cache_dir: str | None) -> RmlElement:
+    # Run in the worker processes, where the settings of the parent process are not available.
+    src = read_and_close_file(path)
+    tree_cache = None if cache_dir is None else RmlTreeCache(cache_dir, GRAMMAR_PATH)
+
+    if tree_cache is not None:
+        tree = tree_cache.load(src, algorithm)
+        if tree is not None:
+            return tree
+
+    tree = parse_rml_tree(get_lark_parser(algorithm), src)
+
+    if tree_cache is not None:
+        tree_cache.store(src, algorithm, tree)
+
+    return tree
+
+
+LeafElementBuilder: TypeAlias = Callable[[RmlElement, RosemaryNamespace, str], LeafElement]
+
+
+def _build_leaf_element(element: RmlElement, namespace: RosemaryNamespace, src_path: str,
+                        to_leaf_element: LeafElementBuilder) -> LeafElement:
+    try:
+        return to_leaf_element(element, namespace, src_path)
+    except Exception as e:
+        raise RmlSyntaxException(f'Failed to parse {element.indicator[0]}', src_path) from e
+
+
+def _build_deferred_element(element: DeferredElement, namespace: RosemaryNamespace, src_path: str, algorithm: str,
+                            to_leaf_element: LeafElementBuilder) -> LeafElement:
+    try:
+        tree = parse_rml_tree(get_lark_parser(algorithm), element.source)
+    except Exception as e:
+        raise RmlSyntaxException('Failed to parse code', src_path) from e
+
+    return _build_leaf_element(tree.children[0], namespace, src_path, to_leaf_element)
+
+
+def _check_deferred_element(leaf_element: LeafElement):
+    check_leaf_elements([leaf_element])
+
+
+def _import_paths(tree: RmlElement, directory: Path) -> List[Path]:
+    paths = []
+    for child in tree.children:
+        if child.is_text:
+            continue
+        elif child.indicator == ('import',):
+            path_str = child.attributes.get('path')
+            if path_str and path_str != 'common':
+                paths.append((directory / Path(path_str)).resolve())
+        elif child.indicator == ('corolla',):
+            paths += _import_paths(child, directory)
+
+    return paths
+
 
 class RosemaryParser:
-    def __init__(self, src_path: str):
-        grammar = read_and_close_file_to_root(GRAMMAR_PATH)
-        self.parser = Lark(grammar, start='rosemary')
-        self.transformer = TreeToRmlTreeTransformer()
+    def __init__(self, src_path: str, algorithm: str = None,
+                 previous_trees: Dict[Path, Tuple[FileStamp, RmlElement]] = None):
+        self.algorithm = SETTINGS.get('RML_PARSER') if algorithm is None else algorithm
+        self.lazy = SETTINGS.get('LAZY_PARSE')
+        self.parser = get_lark_parser(self.algorithm)
+        self.tree_cache = get_tree_cache()
 
         self.imported_namespaces = {}
+        self.imported_files: Dict[Path, ImportedFile] = {}
+        # in lazy mode, the imported files are loaded when a name is first looked up in them, one at a time
+        self.lazy_imports: Dict[Path, LazyValue[RosemaryNamespace]] = {}
+        self.lazy_import_lock = RLock()
+        self.leaf_elements = []
         self.src_path = src_path
 
+        # the trees of a previous load, which are reused for the files that have not been modified since
+        self.previous_trees = {} if previous_trees is None else previous_trees
+        # the trees of all the loaded files, and the stamps of the files the loaded file depends on
+        self.trees: Dict[Path, Tuple[FileStamp, RmlElement]] = {}
+        self.stamps: Dict[Path, FileStamp] = {}
+        self.stamp_stack: List[Dict[Path, FileStamp]] = []
+        # the trees of the imported files parsed in parallel before the namespaces are built
+        self.prefetched_trees: Dict[Path, Tuple[FileStamp, RmlElement]] = {}
+
         if src_path == 'common':
             rml_tree = self._src_to_rml_tree(read_and_close_file_to_root(RML_COMMON_PATH))
             self.path_stack = [_get_proj_root() / RML_COMMON_PATH]
         else:
-            rml_tree = self._src_to_rml_tree(read_and_close_file(src_path))
-            self.path_stack = [Path(src_path).resolve()]
+            path = Path(src_path).resolve()
+            self.stamp_stack = [self.stamps]
+            rml_tree = self._load_rml_tree(path)
+            self.path_stack = [path]
+
+            parse_workers = SETTINGS.get('PARSE_WORKERS')
+            if parse_workers > 1 and not self.lazy:  # the lazily parsed files are only indexed, which is faster
+                self._prefetch_imported_trees(path, rml_tree, parse_workers)
 
         self.namespace = self._rml_tree_to_namespace(rml_tree)
+        self.stamp_stack = []
+
+        # all the templates are known once the whole file is loaded, so their call sites can be checked as well
+        check_leaf_elements(self.leaf_elements)
 
     def _handle_import(self, child: RmlElement, namespace: Namespace):
         if 'path' not in child.attributes or not child.attributes['path']:
@@ -36,12 +226,18 @@ class RosemaryParser:
 
         path = child.attributes['path']
 
-        child_namespace = self._parse_file(path)
+        if self.lazy and path != 'common':
+            child_namespace = self._lazy_import(path)
+        else:
+            child_namespace = self._parse_file(path)
 
         if 'element' not in child.attributes:
             if 'as' not in child.attributes:
-                for name, element in child_namespace.items():
-                    namespace.append(name, element)
+                if isinstance(child_namespace, LazyValue):
+                    namespace.append_import(child_namespace)
+                else:
+                    for name, element in child_namespace.items():
+                        namespace.append(name, element)
             else:
                 if not child.attributes['as']:
                     raise RmlSyntaxException('Empty "as" attribute in <import>', self.src_path)
@@ -65,13 +261,10 @@ class RosemaryParser:
                     )
 
             for element_name, as_name in zip(element_names, as_names):
-                try:
-                    element = child_namespace[element_name]
-                except KeyError:
-                    raise RmlSyntaxException(
-                        f'Element "{element_name}" not found in imported file "{path}"',
-                        self.src_path
-                    )
+                if isinstance(child_namespace, LazyValue):
+                    element = LazyValue(partial(self._get_imported_element, child_namespace, element_name, path))
+                else:
+                    element = self._get_imported_element(child_namespace, element_name, path)
 
                 if as_name is None:
                     namespace.append(element_name.split('.')[-1], element)
@@ -81,6 +274,17 @@ class RosemaryParser:
 
                     namespace.append(as_name, element)
 
+    def _get_imported_element(self, child_namespace: RosemaryNamespace | LazyValue[RosemaryNamespace],
+                              element_name: str, path_str: str):
+        if isinstance(child_namespace, LazyValue):
+            child_namespace = child_namespace.resolve()
+        try:
+            return child_namespace[element_name]
+        except KeyError:
+            raise RmlSyntaxException(
+                f'Element "{element_name}" not found in imported file "{path_str}"',
+                self.src_path
+            )
 
     def _rml_tree_to_namespace(self, tree: RmlElement, parent_namespace: RosemaryNamespace = None) -> RosemaryNamespace:
         namespace = Namespace(parent_namespace)
@@ -96,47 +300,213 @@ class RosemaryParser:
             elif child.indicator == ('petal',):
                 if 'name' not in child.attributes or not child.attributes['name']:
                     raise RmlSyntaxException('Petal must have a name', self.src_path)
-
-                try:
-                    namespace.append(child.attributes['name'], rml_to_petal(child, namespace, self.src_path))
-                except Exception as e:
-                    raise RmlSyntaxException('Failed to parse petal', self.src_path) from e
+                namespace.append(child.attributes['name'], self._leaf_element(child, namespace, rml_to_petal))
             elif child.indicator == ('template',):
                 if 'name' not in child.attributes or not child.attributes['name']:
                     raise RmlSyntaxException('Template must have a name', self.src_path)
-                try:
-                    namespace.append(child.attributes['name'], rml_to_template(child, namespace, self.src_path))
-                except Exception as e:
-                    raise RmlSyntaxException('Failed to parse template', self.src_path) from e
+                namespace.append(child.attributes['name'], self._leaf_element(child, namespace, rml_to_template))
             else:
                 raise RmlSyntaxException(f'Unknown element {child.indicator}', self.src_path)
 
         return namespace
 
+    def _leaf_element(self, element: RmlElement, namespace: RosemaryNamespace,
+                      to_leaf_element: LeafElementBuilder) -> LeafElement | LazyValue[LeafElement]:
+        if isinstance(element, DeferredElement):
+            # checked on its own once parsed, since the templates it uses are only known by then
+            return LazyValue(partial(_build_deferred_element, element, namespace, self.src_path, self.algorithm,
+                                     to_leaf_element), _check_deferred_element)
+
+        leaf_element = _build_leaf_element(element, namespace, self.src_path, to_leaf_element)
+        self.leaf_elements.append(leaf_element)
+        return leaf_element
+
     def _parse_file(self, path_str: str) -> RosemaryNamespace:
         if path_str == 'common':
-            return _COMMON_NAMESPACE
+            return get_common_namespace()
 
         assert self.path_stack
         path = (self.path_stack[-1].parent / Path(path_str)).resolve()
 
-        if path in self.imported_namespaces:
-            return self.imported_namespaces[path]
+        if path not in self.imported_namespaces:
+            imported_file = self._load_imported_file(path)
+            self.imported_namespaces[path] = imported_file.namespace
+            self.imported_files[path] = imported_file
 
+        if self.stamp_stack:  # the file being loaded depends on the imported file and all its imports
+            self.stamp_stack[-1].update(self.imported_files[path].stamps)
+
+        return self.imported_namespaces[path]
+
+    def _lazy_import(self, path_str: str) -> LazyValue[RosemaryNamespace]:
+        assert self.path_stack
+        path = (self.path_stack[-1].parent / Path(path_str)).resolve()
+
+        if path not in self.lazy_imports:
+            self.lazy_imports[path] = LazyValue(partial(self._load_lazy_import, path, path_str))
+
+        return self.lazy_imports[path]
+
+    def _load_lazy_import(self, path: Path, path_str: str) -> RosemaryNamespace:
+        with self.lazy_import_lock:
+            leaf_elements, self.leaf_elements = self.leaf_elements, []
+            self.path_stack, self.stamp_stack = [], []
+            try:
+                imported_file = self._load_imported_file(path)
+            except FileNotFoundError as e:
+                # raised when a name is looked up, so it is reported like the other errors of the import
+                raise RmlSyntaxException(f'Imported file "{path_str}" not found', self.src_path) from e
+            finally:
+                new_leaf_elements, self.leaf_elements = self.leaf_elements, leaf_elements
+
+            self.imported_namespaces[path] = imported_file.namespace
+            self.imported_files[path] = imported_file
+            # the loaded file depends on the imported file from now on, so it is reloaded when the file is modified
+            self.stamps.update(imported_file.stamps)
+
+        check_leaf_elements(new_leaf_elements)
+        return imported_file.namespace
+
+    def _load_imported_file(self, path: Path) -> ImportedFile:
+        key = (path, self.algorithm)
+        # the stamps of a lazily loaded file miss the files it imports, which are not loaded yet
+        imported_file = None if self.lazy else IMPORT_CACHE.get(key)
+        if imported_file is not None:
+            self.trees[path] = (imported_file.stamps[path], imported_file.rml_tree)
+            return imported_file
+
+        stamps = {}
+
+        self.stamp_stack += [stamps]
+        rml_tree = self._load_rml_tree(path)
         self.path_stack += [path]
-        rml_tree = self._src_to_rml_tree(read_and_close_file(path))
         namespace = self._rml_tree_to_namespace(rml_tree)
-        self.imported_namespaces[path] = namespace
         self.path_stack.pop()
-        return namespace
+        self.stamp_stack.pop()
+
+        imported_file = ImportedFile(namespace, stamps, rml_tree)
+        if not self.lazy:
+            IMPORT_CACHE.put(key, imported_file)
+        return imported_file
+
+    def _load_rml_tree(self, path: Path) -> RmlElement:
+        stamp = file_stamp(path)  # taken before reading, so that a concurrent change is not missed
+        self.stamp_stack[-1][path] = stamp
+
+        if path in self.previous_trees and self.previous_trees[path][0] == stamp:
+            rml_tree = self.previous_trees[path][1]
+        elif path in self.prefetched_trees and self.prefetched_trees[path][0] == stamp:
+            rml_tree = self.prefetched_trees[path][1]
+        else:
+            rml_tree = self._src_to_rml_tree(read_and_close_file(path))
+
+        self.trees[path] = (stamp, rml_tree)
+        return rml_tree
+
+    def _prefetch_imported_trees(self, path: Path, rml_tree: RmlElement, parse_workers: int):
+        """
+        Discover the import graph wave by wave, parsing the files of each wave in a process pool if they are large
+        enough.
+        The namespaces are still built in dependency order afterwards, from the prefetched trees.
+        Files that fail to be read or parsed here are simply parsed again when they are imported,
+        so that the errors are reported as usual.
+        """
+        cache_dir = None if self.tree_cache is None else str(self.tree_cache.cache_dir)
+        seen = {path}
+        wave = _import_paths(rml_tree, path.parent)
+
+        while wave:
+            to_parse = []
+            next_wave = []
+            for imported_path in wave:
+                if imported_path in seen:
+                    continue
+                seen.add(imported_path)
+
+                if IMPORT_CACHE.get((imported_path, self.algorithm)) is not None:
+                    continue  # the files it imports are up to date in the cache as well
+
+                try:
+                    stamp = file_stamp(imported_path)
+                except OSError:
+                    continue
+
+                if imported_path in self.previous_trees and self.previous_trees[imported_path][0] == stamp:
+                    next_wave += _import_paths(self.previous_trees[imported_path][1], imported_path.parent)
+                else:
+                    to_parse.append((imported_path, stamp))
+
+            futures = {}
+            # a single file is not worth the round trip to a worker, nor are small files
+            parse_size = sum(size for _, (_, size) in to_parse)
+            if len(to_parse) > 1 and parse_size >= MIN_PARALLEL_PARSE_SIZE[self.algorithm]:
+                pool = get_parse_pool(parse_workers)
+                try:
+                    for imported_path, _ in to_parse:
+                        futures[imported_path] = pool.submit(_parse_rml_file, imported_path, self.algorithm,
+                                                             cache_dir)
+                except BrokenProcessPool:
+                    discard_parse_pool(pool)
+
+            for imported_path, stamp in to_parse:
+                try:
+                    if imported_path in futures:
+                        tree = futures[imported_path].result()
+                    else:
+                        tree = _parse_rml_file(imported_path, self.algorithm, cache_dir)
+                except BrokenProcessPool:
+                    discard_parse_pool(pool)
+                    continue
+                except Exception:  # noqa
+                    continue
+
+                self.prefetched_trees[imported_path] = (stamp, tree)
+                next_wave += _import_paths(tree, imported_path.parent)
+
+            wave = next_wave
 
     def _src_to_rml_tree(self, src: str) -> RmlElement:
+        if self.lazy:
+            split = split_definitions(src)
+            if split is not None:
+                skeleton, definitions, n_elements = split
+                skeleton_tree = self._parse_src(skeleton)
+                if len(skeleton_tree.children) == n_elements:
+                    return defer_definitions(skeleton_tree, definitions)
+
+        return self._parse_src(src)
+
+    def _parse_src(self, src: str) -> RmlElement:
+        if self.tree_cache is not None:
+            tree = self.tree_cache.load(src, self.algorithm)
+            if tree is not None:
+                return tree
+
         try:
-            tree = self.transformer.transform(self.parser.parse(src))
+            tree = parse_rml_tree(self.parser, src)
         except Exception as e:
             raise RmlSyntaxException('Failed to parse code', self.src_path) from e
 
+        if self.tree_cache is not None:
+            self.tree_cache.store(src, self.algorithm, tree)
+
         return tree
 
 
-_COMMON_NAMESPACE = RosemaryParser('common').namespace
+_COMMON_NAMESPACE: RosemaryNamespace | None = None
+_COMMON_NAMESPACE_LOCK = Lock()
+
+
+def get_common_namespace() -> RosemaryNamespace:
+    """
+    Get the namespace of the built-in templates. The common RML files are parsed the first time they are used,
+    instead of at import time.
+    """
+    global _COMMON_NAMESPACE
+
+    if _COMMON_NAMESPACE is None:
+        with _COMMON_NAMESPACE_LOCK:
+            if _COMMON_NAMESPACE is None:
+                _COMMON_NAMESPACE = RosemaryParser('common').namespace
+
+    return _COMMON_NAMESPACE
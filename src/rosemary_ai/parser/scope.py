@@ -0,0 +1,80 @@
+"""
+The scoping of the variables bound by "for" elements, shared by the interpreter in traverse.py and the compiled
+petals in compiler.py, so that both keep the same semantics.
+
+The variables are bound in place on the context of the environment, and their previous bindings are restored when
+leaving the element.
+"""
+from typing import Callable, Iterable
+
+from ..exceptions import RmlFormatException
+from .environment import Environment, Slot
+from .executor import Executor
+
+Body = Callable[[Environment, Executor], bool]
+
+
+def _check_var_name(var_name: str | None):
+    if var_name == '':
+        raise RmlFormatException('Loop variable name must not be empty.')
+
+
+def run_loop(env: Environment, var_name: str | None, loop_range: Iterable, body: Body,
+             executor: Executor, end_if_failed: bool) -> bool:
+    """
+    Run the body for each value of the range, bound to the loop variable if any, which only exists in the loop.
+    A failed iteration fails the loop, or is undone and ends it with end_if_failed.
+    """
+    _check_var_name(var_name)
+
+    with env.shadowing(var_name):
+        context = env.context
+        for value in loop_range:
+            snapshot = executor.get_snapshot()
+            if var_name:
+                context[var_name] = value
+            if not body(env, executor):
+                if end_if_failed:
+                    executor.back_to_snapshot(snapshot)
+                    break
+                return False
+
+    return True
+
+
+def expand_slot(env: Environment, slot_name: str, body: Body, executor: Executor) -> bool:
+    """
+    Run the body for each element found for the slot, with the slot standing for that element only, and the parameters
+    of the slot bound to the values given to it.
+    """
+    slot = env.slots[slot_name]
+
+    if slot.is_inf:
+        raise RmlFormatException('Infinite slot is not allowed in for expansion.')
+
+    with env.shadowing(*slot.parameter_names):
+        try:
+            while slot.has_next():
+                slot_info = slot.pop()
+
+                env.slots[slot_name] = Slot([slot_info], slot.parameter_names)
+                env.context.update(slot_info[2])
+
+                if not body(env, executor):
+                    return False
+            return True
+        finally:
+            env.slots[slot_name] = slot
+
+
+def find_in_loop(env: Environment, var_name: str | None, loop_range: Iterable, find: Callable[[], None]):
+    """
+    Search the slots in the children of a "for" element for each value of the range, bound to the loop variable if any.
+    """
+    _check_var_name(var_name)
+
+    with env.shadowing(var_name):
+        for value in loop_range:
+            if var_name:
+                env.context[var_name] = value
+            find()
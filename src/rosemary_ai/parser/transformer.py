@@ -1,30 +1,50 @@
+import sys
 from enum import Enum
-from typing import List, Tuple
+from itertools import islice
+from types import MappingProxyType
+from typing import List, Tuple, Dict, Mapping
 
 from lark import Transformer
 
 from .._utils.str_escape import escape_data_indicator, escape_attribute_value, escape_plain_text  # noqa
 from .._utils.str_utils import (calc_leading_ws_and_remove_leading, clean_leading_ws_lines, # noqa
                                 remove_trailing_blank_lines)
-from ..exceptions import RmlTagNotClosedException
+from ..exceptions import RmlTagNotClosedException, RmlTextOutsideElementException
+
+
+_EMPTY_ATTRIBUTES: Mapping[str, str] = MappingProxyType({})
+_INDICATORS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def intern_indicator(indicator: Tuple[str, ...]) -> Tuple[str, ...]:
+    # The same few tags are used all over a library, so all the elements share one tuple per tag.
+    interned = _INDICATORS.get(indicator)
+    if interned is None:
+        interned = _INDICATORS.setdefault(indicator, tuple(sys.intern(name) for name in indicator))
+    return interned
 
 
 class RmlElement:
+    """
+    A node of an RML tree. Nodes are never changed after they are built, so the children and text tokens are stored
+    as tuples, and the elements without attributes share one empty, read-only mapping.
+    """
+    __slots__ = ('is_text', 'indicator', 'text_tokens', 'children', 'attributes')
+
     def __init__(self, is_text: bool, indicator: Tuple[str, ...], text_tokens=None, children=None, attributes=None):
-        if text_tokens is None:
-            text_tokens = []
-        if attributes is None:
-            attributes = {}
-        if children is None:
-            children = []
         self.is_text = is_text
-        self.indicator = indicator
-        self.text_tokens = text_tokens
-        self.children = children
-        self.attributes = attributes
+        self.indicator = intern_indicator(indicator)
+        self.text_tokens: Tuple[TextToken, ...] = tuple(text_tokens) if text_tokens else ()
+        self.children: Tuple[RmlElement, ...] = tuple(children) if children else ()
+        self.attributes: Mapping[str, str] = \
+            {sys.intern(name): value for name, value in attributes.items()} if attributes else _EMPTY_ATTRIBUTES
+
+    def __reduce__(self):
+        return RmlElement, (self.is_text, self.indicator, self.text_tokens, self.children,
+                            dict(self.attributes) if self.attributes else None)
 
     def __str__(self):
-        return f'<{self.indicator}@{self.attributes}>{self.text_tokens if self.is_text else self.children}'
+        return f'<{self.indicator}@{dict(self.attributes)}>{list(self.text_tokens if self.is_text else self.children)}'
 
     def __repr__(self):
         return self.__str__()
@@ -35,6 +55,8 @@ class TextToken:
         PLAIN_TEXT = 1
         INDICATOR = 2
 
+    __slots__ = ('type', 'text')
+
     def __init__(self, text_type: TYPE, text: str):
         self.type = text_type
         self.text = text
@@ -49,55 +71,65 @@ class TextToken:
         return self.__str__()
 
 
-def cleandoc(items: List[TextToken]):
-    if not items:
-        return []
+def cleandoc(items: List[TextToken], drop_trailing_blank_text: bool = False):
     cleaned = []
 
-    items = list(reversed(items))
-
-    while items and items[-1].type == TextToken.TYPE.INDICATOR:
-        cleaned += [items.pop()]
-    if not items:
+    first_plain = 0
+    while first_plain < len(items) and items[first_plain].type == TextToken.TYPE.INDICATOR:
+        cleaned.append(items[first_plain])
+        first_plain += 1
+    if first_plain == len(items):
         return cleaned
-    leading_ws, non_empty_part = calc_leading_ws_and_remove_leading(items.pop().text)
+
+    leading_ws, non_empty_part = calc_leading_ws_and_remove_leading(items[first_plain].text)
     if non_empty_part:
-        cleaned += [TextToken(TextToken.TYPE.PLAIN_TEXT, non_empty_part)]
+        cleaned.append(TextToken(TextToken.TYPE.PLAIN_TEXT, non_empty_part))
 
-    for item in reversed(items):
+    for item in islice(items, first_plain + 1, None):
         if item.type == TextToken.TYPE.INDICATOR:
-            cleaned += [item]
+            cleaned.append(item)
         else:
             cleaned_line = clean_leading_ws_lines(item.text, leading_ws)
             if cleaned_line:
-                cleaned += [TextToken(TextToken.TYPE.PLAIN_TEXT, cleaned_line)]
+                cleaned.append(TextToken(TextToken.TYPE.PLAIN_TEXT, cleaned_line))
 
     if cleaned and cleaned[-1].type == TextToken.TYPE.PLAIN_TEXT:
         cleaned[-1].text = remove_trailing_blank_lines(cleaned[-1].text)
+        if not cleaned[-1].text and drop_trailing_blank_text:
+            # trailing blank lines only, e.g. the indentation before a closing tag
+            cleaned.pop()
 
     return cleaned
 
 
 class TreeToRmlTreeTransformer(Transformer):
+    def __init__(self, drop_trailing_blank_text: bool = False):
+        """
+        The Earley parser drops the blank lines at the end of a text only when it splits them off as a separate text,
+        which the LALR parser never does. With drop_trailing_blank_text, they are always dropped instead of being left
+        as an empty text, which parsers match immediately.
+        """
+        super().__init__()
+        self.drop_trailing_blank_text = drop_trailing_blank_text
+
     def rosemary(self, items):  # noqa
-        element = RmlElement(False, ('$rosemary',))
-        element.children = [item for item in items if item]
+        element = RmlElement(False, ('$rosemary',), children=[item for item in items if item])
+        for child in element.children:
+            if child.is_text:
+                raise RmlTextOutsideElementException(''.join(token.text for token in child.text_tokens))
         return element
 
     def element_without_body(self, items):  # noqa
-        element = RmlElement(False, items[0])
-        element.attributes = items[1]
-        return element
+        return RmlElement(False, items[0], attributes=items[1])
 
     def element_with_body(self, items):  # noqa
         if items[0] != items[3]:
             raise RmlTagNotClosedException('.'.join(items[0]), '.'.join(items[3]))
 
-        element = RmlElement(False, items[0])
-        element.attributes = items[1]
-        element.children = [child for child in items[2].children if child is not None]
+        return RmlElement(False, items[0], children=items[2], attributes=items[1])
 
-        return element
+    def element_body_items(self, items):  # noqa
+        return [item for item in items if item is not None]
 
     def element_indicator(self, items: List[str]) -> Tuple[str, ...]:  # noqa
         return tuple(items)
@@ -118,7 +150,7 @@ class TreeToRmlTreeTransformer(Transformer):
             return None
         if len(items) == 1 and items[0].type == TextToken.TYPE.PLAIN_TEXT and not items[0].text.strip():
             return None
-        tokens = cleandoc(items)
+        tokens = cleandoc(items, self.drop_trailing_blank_text)
         element = RmlElement(True, ('$text',), text_tokens=tokens)
         return element
 
@@ -1,20 +1,30 @@
-from copy import copy
+"""
+Interpret the RML trees of petals and templates.
+
+Petals are run by the closures compiled by compiler.py instead. This interpreter is the reference implementation
+which the compiled petals are tested against in test/compiler_tests, and follows the RML trees as directly as possible.
+The scoping of the variables bound by "for" elements is shared with the compiler, in scope.py.
+"""
+from functools import lru_cache
 from typing import List, Iterable
 
 from ..exceptions import RmlFormatException
 from ..multi_modal.image import Image
-from .data_expression import DataExpression
+from .data_expression import DataExpression, new_context
 from .executor import Executor
 from .leaf_elements import RosemaryTemplate
 from .environment import Slot, Environment
+from .scope import run_loop, expand_slot, find_in_loop
 from .transformer import RmlElement, TextToken
 
-from ._utils import RESERVED_ATTR_NAMES, check_invalid_attributes
-from .._utils.str_utils import did_you_mean  # noqa
+
+@lru_cache(maxsize=4096)
+def _expression(repr_: str) -> DataExpression:
+    return DataExpression(repr_)
 
 
 def _eval(repr_, context, need_copy=True):
-    return DataExpression(repr_).evaluate(context, need_copy)
+    return _expression(repr_).evaluate(context, need_copy)
 
 
 def _get_range_from_str(range_str: str, env: Environment):
@@ -27,78 +37,51 @@ def _get_range_from_str(range_str: str, env: Environment):
 
 
 def _find_and_add_slot(element: RmlElement, new_slots: dict[str, Slot],
-                       env: Environment):
+                       env: Environment, in_loop: bool = False):
     if len(element.indicator) != 1:
         raise RmlFormatException(f'Unexpected tag when generating slots: {".".join(element.indicator)}')
 
     indicator = element.indicator[0]
     if indicator == 'if':
-        check_invalid_attributes(element, RESERVED_ATTR_NAMES['if'])
-
         if 'cond' not in element.attributes:
             raise RmlFormatException('If must have a condition, given by "cond" attribute.')
 
         if env.eval(element.attributes['cond']):
             for child in element.children:
-                _find_and_add_slot(child, new_slots, env)
+                _find_and_add_slot(child, new_slots, env, in_loop)
     elif indicator == 'for':
-        check_invalid_attributes(element, RESERVED_ATTR_NAMES['for'])
-
         if 'range' in element.attributes:
             range_str = element.attributes['range']
             loop_range = _get_range_from_str(range_str, env)
-
-            var_name = None
-            has_var = 'var' in element.attributes
-            if has_var:
-                var_name = element.attributes['var']
-                if not var_name:
-                    raise RmlFormatException('Loop variable name must not be empty.')
-
-            for i in loop_range:
-                new_env = copy(env)
-                if has_var:
-                    new_env.context[var_name] = i
-                for child in element.children:
-                    _find_and_add_slot(child, new_slots, new_env)
-
         elif 'in' in element.attributes:
-            loop_list = env.eval(element.attributes['in'])
-            if not isinstance(loop_list, Iterable):
+            loop_range = env.eval(element.attributes['in'])
+            if not isinstance(loop_range, Iterable):
                 raise RmlFormatException('"in" must be an iterable object.')
-
-            var_name = None
-            has_var = 'var' in element.attributes
-            if has_var:
-                var_name = element.attributes['var']
-                if not var_name:
-                    raise RmlFormatException('Loop variable name must not be empty.')
-
-            for obj in loop_list:
-                new_env = copy(env)
-                if has_var:
-                    new_env.context[var_name] = obj
-                for child in element.children:
-                    _find_and_add_slot(child, new_slots, new_env)
         else:
             raise RmlFormatException(
                 'For must have a range or an iterable object,'
                 ' given by "range" or "in" attribute.'
             )
 
+        var_name = element.attributes.get('var')
+
+        def find_in_children():
+            for child in element.children:
+                _find_and_add_slot(child, new_slots, env, in_loop or var_name is not None)
+
+        find_in_loop(env, var_name, loop_range, find_in_children)
+
     elif indicator in new_slots:
         slot = new_slots[indicator]
         var_context = {}
 
-        check_invalid_attributes(element, set(slot.parameter_names))
-
         for param_name in slot.parameter_names:
             if param_name in element.attributes:
                 var_context[param_name] = env.eval(element.attributes[param_name])
             else:
                 var_context[param_name] = None
 
-        slot.append(element, env, var_context)
+        slot.append(element, env, var_context, in_loop)
 
     else:
         raise RmlFormatException(f'Slot not found: {indicator}')
@@ -107,32 +90,12 @@ def _find_and_add_slot(element: RmlElement, new_slots: dict[str, Slot],
 def _loop_in(element: RmlElement, loop_range: Iterable, curr_env: Environment, executor: Executor) -> bool:
     end_if_failed = False
     if 'try' in element.attributes:
-        end_if_failed = DataExpression(element.attributes['try']).evaluate(curr_env.context)
-
-    var_name = None
-    if 'var' in element.attributes:
-        var_name = element.attributes['var']
-        if not var_name:
-            raise RmlFormatException('Loop variable name must not be empty.')
+        end_if_failed = _expression(element.attributes['try']).evaluate(curr_env.context)
 
-    if var_name:  # loop variable only exists in the loop
-        loop_env = copy(curr_env)
-    else:
-        loop_env = curr_env
-
-    for i in loop_range:
-        snapshot = executor.get_snapshot()
-        if var_name:
-            loop_env.context[var_name] = i
-        succeed = traverse_all(loop_env, element.children, executor)
-        if not succeed:
-            if end_if_failed:
-                executor.back_to_snapshot(snapshot)
-                break
-            else:
-                return False
+    def body(env: Environment, executor_: Executor) -> bool:
+        return traverse_all(env, element.children, executor_)
 
-    return True
+    return run_loop(curr_env, element.attributes.get('var'), loop_range, body, executor, end_if_failed)
 
 
 def traverse_all(env: Environment, children: List[RmlElement], executor: Executor) -> bool:
@@ -143,29 +106,11 @@ def traverse_all(env: Environment, children: List[RmlElement], executor: Executo
 
 
 def _traverse_for(curr_env: Environment, element: RmlElement, executor: Executor) -> bool:
-    check_invalid_attributes(element, RESERVED_ATTR_NAMES['for'])
-
     if 'slot' in element.attributes:  # only allowed in templates
-        slot_name = element.attributes['slot']
-        slot = curr_env.slots[slot_name]
-
-        if slot.is_inf:
-            raise RmlFormatException('Infinite slot is not allowed in for expansion.')
+        def body(env: Environment, executor_: Executor) -> bool:
+            return traverse_all(env, element.children, executor_)
 
-        while slot.has_next():
-            new_env = copy(curr_env)
-            slot_info = slot.pop()
-
-            new_env.slots[slot_name] = Slot([slot_info],
-                                            slot.parameter_names)
-
-            var_context = slot_info[2]
-            new_env.context.update(var_context)
-
-            succeed = traverse_all(new_env, element.children, executor)
-            if not succeed:
-                return False
-        return True
+        return expand_slot(curr_env, element.attributes['slot'], body, executor)
 
     elif 'range' in element.attributes:
         range_str = element.attributes['range']
@@ -173,7 +118,7 @@ def _traverse_for(curr_env: Environment, element: RmlElement, executor: Executor
 
         return _loop_in(element, loop_range, curr_env, executor)
     elif 'in' in element.attributes:
-        loop_list = DataExpression(element.attributes['in']).evaluate(curr_env.context)
+        loop_list = _expression(element.attributes['in']).evaluate(curr_env.context)
         if not isinstance(loop_list, Iterable):
             raise RmlFormatException('Loop target must be iterable.')
 
@@ -186,8 +131,6 @@ def _traverse_for(curr_env: Environment, element: RmlElement, executor: Executor
 
 
 def _traverse_optional(curr_env: Environment, element: RmlElement, executor: Executor) -> bool:
-    check_invalid_attributes(element, RESERVED_ATTR_NAMES['optional'])
-
     has_or = False
     for child in element.children:
         if child.indicator == ('or',):
@@ -212,15 +155,13 @@ def _traverse_optional(curr_env: Environment, element: RmlElement, executor: Exe
             executor.back_to_snapshot(snapshot)
 
     required = ('required' in element.attributes and
-                DataExpression(element.attributes['required']).evaluate(curr_env.context))
+                _expression(element.attributes['required']).evaluate(curr_env.context))
     return not required
 
 
 def _traverse_slot(curr_env: Environment, element: RmlElement, executor: Executor) -> bool:
     assert len(element.indicator) == 1
 
-    check_invalid_attributes(element, set())
-
     indicator = element.indicator[0]
 
     if element.children:
@@ -252,9 +193,7 @@ def _traverse_template(curr_env: Environment, element: RmlElement, executor: Exe
 
     new_namespace = template.namespace
 
-    check_invalid_attributes(element, set(template.parameter_names))
-
-    context = {}
+    context = new_context({})
     for param_name in template.parameter_names:
         if param_name in element.attributes:
             context[param_name] = _eval(element.attributes[param_name], curr_env.context)
@@ -299,7 +238,7 @@ def traverse(curr_env: Environment, element: RmlElement, executor: Executor) ->
             if is_plain_text:
                 succeed = executor.execute(token.text, curr_env.context)
             else:
-                succeed = executor.execute(DataExpression(token.text), curr_env.context)
+                succeed = executor.execute(_expression(token.text), curr_env.context)
 
             if not succeed:
                 return False
@@ -307,24 +246,18 @@ def traverse(curr_env: Environment, element: RmlElement, executor: Executor) ->
     else:
         match element.indicator:
             case ('list',):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['list'])
-
                 executor.begin_scope('list')
                 succeed = traverse_all(curr_env, element.children, executor)
                 executor.end_scope('list')
 
                 return succeed
             case ('dict',):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['dict'])
-
                 executor.begin_scope('dict')
                 succeed = traverse_all(curr_env, element.children, executor)
                 executor.end_scope('dict')
 
                 return succeed
             case ('list-item',):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['list-item'])
-
                 executor.begin_scope('list_item')
 
                 if 'value' in element.attributes:
@@ -337,8 +270,6 @@ def traverse(curr_env: Environment, element: RmlElement, executor: Executor) ->
 
                 return succeed
             case ('dict-item',):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['dict-item'])
-
                 if 'key' not in element.attributes and 'key_eval' not in element.attributes:
                     raise RmlFormatException('Dict item must have a key, given by "key" or "key_eval" attribute.')
 
@@ -360,24 +291,16 @@ def traverse(curr_env: Environment, element: RmlElement, executor: Executor) ->
 
                 return succeed
             case ('div',):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['div'])
-
                 return traverse_all(curr_env, element.children, executor)
             case ('or', ):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['or'])
-
                 return traverse_all(curr_env, element.children, executor)
             case ('br',):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['br'])
-
                 if element.children:
                     raise RmlFormatException('br element cannot have children.')
                 executor.execute('\n', curr_env.context)
 
                 return True
             case ('img',):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['img'])
-
                 if 'src' not in element.attributes and 'src_eval' not in element.attributes:
                     raise RmlFormatException('Image must have a source, given by "src" or "src_eval" attribute.')
 
@@ -390,8 +313,6 @@ def traverse(curr_env: Environment, element: RmlElement, executor: Executor) ->
                 executor.execute(Image(src), curr_env.context)
                 return True
             case ('file', ):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['file'])
-
                 if 'src' not in element.attributes and 'src_eval' not in element.attributes:
                     raise RmlFormatException('File must have a source, given by "src" or "src_eval" attribute.')
 
@@ -404,19 +325,13 @@ def traverse(curr_env: Environment, element: RmlElement, executor: Executor) ->
                 executor.execute(open(src, 'rb'), curr_env.context)
                 return True
             case ('if',):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['if'])
-
                 if 'cond' not in element.attributes:
                     raise RmlFormatException('If must have a condition, given by "cond" attribute.')
                 if _eval(element.attributes['cond'], curr_env.context):
                     return traverse_all(curr_env, element.children, executor)
             case ('for',):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['for'])
-
                 return _traverse_for(curr_env, element, executor)
             case ('optional',):
-                check_invalid_attributes(element, RESERVED_ATTR_NAMES['optional'])
-
                 return _traverse_optional(curr_env, element, executor)
             case indicator:
                 if len(indicator) == 1 and indicator[0] in curr_env.slots:
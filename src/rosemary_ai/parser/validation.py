@@ -0,0 +1,76 @@
+"""
+Static checks of the attributes used in petals and templates.
+
+The RML trees never change after they are loaded, so the attributes of the built-in elements, slots and template
+calls are checked once here, instead of on every traversal.
+"""
+from typing import Iterable, List, Dict, FrozenSet
+
+from ._utils import (RESERVED_ATTR_NAMES, BUILTIN_ELEMENT_NAMES, check_invalid_attributes, is_inf_slot_only,
+                     stripped_slot_params, template_slot_names)
+from .leaf_elements import LeafElement, RosemaryPetal, RosemaryTemplate, RosemaryNamespace
+from .transformer import RmlElement
+
+
+def _check_elements(elements: List[RmlElement], namespace: RosemaryNamespace, slot_names: FrozenSet[str]):
+    for element in elements:
+        _check_element(element, namespace, slot_names)
+
+
+def _check_element(element: RmlElement, namespace: RosemaryNamespace, slot_names: FrozenSet[str]):
+    if element.is_text:
+        return
+
+    indicator = element.indicator
+    if len(indicator) == 1 and indicator[0] in BUILTIN_ELEMENT_NAMES:
+        check_invalid_attributes(element, RESERVED_ATTR_NAMES[indicator[0]])
+        _check_elements(element.children, namespace, slot_names)
+    elif len(indicator) == 1 and indicator[0] in slot_names:
+        check_invalid_attributes(element, set())
+    else:
+        _check_template_call(element, namespace, slot_names)
+
+
+def _check_template_call(element: RmlElement, namespace: RosemaryNamespace, slot_names: FrozenSet[str]):
+    try:
+        template = namespace[element.indicator]
+    except Exception:
+        return  # unknown tags are reported when they are formatted or parsed
+
+    if not isinstance(template, RosemaryTemplate):
+        return
+
+    check_invalid_attributes(element, set(template.parameter_names))
+
+    if is_inf_slot_only(template.slot_params):
+        _check_elements(element.children, namespace, slot_names)
+    else:
+        slot_params = stripped_slot_params(template.slot_params)
+        for child in element.children:
+            _check_slot_element(child, namespace, slot_names, slot_params)
+
+
+def _check_slot_element(element: RmlElement, namespace: RosemaryNamespace, slot_names: FrozenSet[str],
+                        slot_params: Dict[str, List[str]]):
+    if element.is_text or len(element.indicator) != 1:
+        return
+
+    indicator = element.indicator[0]
+    if indicator == 'if' or indicator == 'for':
+        check_invalid_attributes(element, RESERVED_ATTR_NAMES[indicator])
+        for child in element.children:
+            _check_slot_element(child, namespace, slot_names, slot_params)
+    elif indicator in slot_params:
+        check_invalid_attributes(element, set(slot_params[indicator]))
+        _check_elements(element.children, namespace, slot_names)
+
+
+def check_leaf_elements(leaf_elements: Iterable[LeafElement]):
+    for leaf_element in leaf_elements:
+        if isinstance(leaf_element, RosemaryPetal):
+            for rml in (leaf_element.formatter_rml, leaf_element.parser_rml):
+                if rml is not None:
+                    _check_elements(rml.children, leaf_element.namespace, frozenset())
+        else:
+            _check_elements(leaf_element.element.children, leaf_element.namespace,
+                            template_slot_names(leaf_element.slot_params))
@@ -1,5 +1,6 @@
 import typing
 from inspect import Signature, isclass
+from threading import Lock, Thread, Event
 from typing import Callable, Dict, Any, Tuple, Generator
 
 from ._global_settings import SETTINGS
@@ -10,10 +11,11 @@ from .exceptions import ParsingFailedException, RmlFormatException
 from .models.generator_registry import get_generator
 from .parser.executor import FormatExecutor, ParseExecutor
 from .parser.leaf_elements import RosemaryPetal
-from .parser.environment import build_environment
-from .parser.traverse import traverse_all
+from .parser.environment import build_environment, Environment
+from .parser.compiler import compiled_formatter, compiled_parser
 from .parser.namespace import Namespace
-from .parser.rml_parser import RosemaryParser
+from .parser.import_cache import IMPORT_CACHE, file_stamp
+from .parser.rml_parser import RosemaryParser, PARSER_ALGORITHMS
 from ._utils.str_utils import full_name_to_indicator  # noqa
 
 _EMPTY = Signature.empty
@@ -70,7 +72,7 @@ async def _generate_async(petal: RosemaryPetal, model_name: str, options: Dict[s
 def _generate_stream(petal: RosemaryPetal, model_name: str, options: Dict[str, Any],
                      dry_run: bool, dry_run_generator: Generator,
                      target_obj, args: Dict[str, Any],
-                     api_key: str) -> Generator[Any, None, None]:
+                     api_key: str, delta: bool = False) -> Generator[Any, None, None]:
     if options is None:
         options = {}
 
@@ -78,32 +80,36 @@ def _generate_stream(petal: RosemaryPetal, model_name: str, options: Dict[str, A
 
     generator = get_generator(model_name if model_name else petal.default_model_name)
 
-    succeed = False
-    raw_data = None
+    parse_stream = _ParseStream(petal, args, target_obj)
 
-    if not dry_run:
-        for raw_data in generator.generate_stream(data, options, dry_run, api_key):
-            target_obj, succeed = _parse(petal, args, raw_data, target_obj)
+    # the deltas are fed to the parser only if the generator streams them natively, otherwise they would be split
+    # from the full texts only to be joined again
+    if delta and generator.native_delta_stream:
+        generate_stream, feed = generator.generate_delta_stream, parse_stream.feed_delta
+    else:
+        generate_stream, feed = generator.generate_stream, parse_stream.feed
 
-            yield target_obj
+    if not dry_run:
+        for raw_data in generate_stream(data, options, dry_run, api_key):
+            if feed(raw_data):
+                yield parse_stream.result
     else:
         # For logging purpose
-        for _ in generator.generate_stream(data, options, dry_run, api_key):
+        for _ in generate_stream(data, options, dry_run, api_key):
             pass
 
         for raw_data in dry_run_generator:
-            target_obj, succeed = _parse(petal, args, raw_data, target_obj)
+            if (parse_stream.feed_delta if delta else parse_stream.feed)(raw_data):
+                yield parse_stream.result
 
-            yield target_obj
-
-    if not succeed:
-        raise ParsingFailedException(f'Failed to parse from the model response: {raw_data}')
+    if not parse_stream.succeed:
+        raise ParsingFailedException(f'Failed to parse from the model response: {parse_stream.raw_data}')
 
 
 async def _generate_stream_async(petal: RosemaryPetal, model_name: str, options: Dict[str, Any],
                                  dry_run: bool, dry_run_generator,
                                  target_obj, args: Dict[str, Any],
-                                 api_key: str) -> Generator[Any, None, None]:
+                                 api_key: str, delta: bool = False) -> Generator[Any, None, None]:
     if options is None:
         options = {}
 
@@ -111,26 +117,30 @@ async def _generate_stream_async(petal: RosemaryPetal, model_name: str, options:
 
     generator = get_generator(model_name if model_name else petal.default_model_name)
 
-    succeed = False
-    raw_data = None
+    parse_stream = _ParseStream(petal, args, target_obj)
 
-    if not dry_run:
-        async for raw_data in generator.generate_stream_async(data, options, dry_run, api_key):
-            target_obj, succeed = _parse(petal, args, raw_data, target_obj)
+    # the deltas are fed to the parser only if the generator streams them natively, otherwise they would be split
+    # from the full texts only to be joined again
+    if delta and generator.native_delta_stream:
+        generate_stream, feed = generator.generate_delta_stream_async, parse_stream.feed_delta
+    else:
+        generate_stream, feed = generator.generate_stream_async, parse_stream.feed
 
-            yield target_obj
+    if not dry_run:
+        async for raw_data in generate_stream(data, options, dry_run, api_key):
+            if feed(raw_data):
+                yield parse_stream.result
     else:
         # For logging purpose
-        async for _ in generator.generate_stream_async(data, options, dry_run, api_key):
+        async for _ in generate_stream(data, options, dry_run, api_key):
             pass
 
         async for raw_data in dry_run_generator:
-            target_obj, succeed = _parse(petal, args, raw_data, target_obj)
+            if (parse_stream.feed_delta if delta else parse_stream.feed)(raw_data):
+                yield parse_stream.result
 
-            yield target_obj
-
-    if not succeed:
-        raise ParsingFailedException(f'Failed to parse from the model response: {raw_data}')
+    if not parse_stream.succeed:
+        raise ParsingFailedException(f'Failed to parse from the model response: {parse_stream.raw_data}')
 
 
 def _print_unsupported_types_hint(signatures: Signature):
@@ -205,7 +215,7 @@ def _format(petal: RosemaryPetal, data: Dict[str, Any]) -> Any:
     env = build_environment(petal, data_with_default)
     executor = FormatExecutor()
 
-    succeed = traverse_all(env, petal.formatter_rml.children, executor)
+    succeed = compiled_formatter(petal)(env, executor)
 
     if not succeed:
         raise RmlFormatException('Failed to format')
@@ -213,10 +223,8 @@ def _format(petal: RosemaryPetal, data: Dict[str, Any]) -> Any:
     return executor.get_result()
 
 
-def _parse(petal: RosemaryPetal, data: Dict[str, Any], raw_data: Any, target_obj=None) -> Tuple[Any, bool]:
-    if petal.parser_rml is None:
-        return raw_data, True
-
+def _parse_executor(petal: RosemaryPetal, data: Dict[str, Any], raw_data: Any,
+                    target_obj) -> Tuple[Environment, ParseExecutor]:
     if petal.parameter_names:
         data = {name: None for name in petal.parameter_names} | data
 
@@ -229,28 +237,170 @@ def _parse(petal: RosemaryPetal, data: Dict[str, Any], raw_data: Any, target_obj
     env = build_environment(petal, data)
     executor = ParseExecutor(raw_data, petal.target, target_obj, petal.is_parse_strict)
 
+    return env, executor
+
+
+def _parse(petal: RosemaryPetal, data: Dict[str, Any], raw_data: Any, target_obj=None) -> Tuple[Any, bool]:
+    if petal.parser_rml is None:
+        return raw_data, True
+
+    env, executor = _parse_executor(petal, data, raw_data, target_obj)
+
     try:
-        succeed = traverse_all(env, petal.parser_rml.children, executor)
+        succeed = compiled_parser(petal)(env, executor)
         return executor.activate_assignments(succeed), succeed
     except AssertionError as e:
         LOGGER.info(f'Assertion error when parsing: {e}')
         return None, False
 
 
+class _ParseStream:
+    """
+    Parses the cumulative responses of a stream, keeping the state of the parser between them, so that only the text
+    which arrived since is searched as long as the parser takes the same way, and the parser is run again only when
+    a text it failed to find arrives, e.g. when a field is completed.
+    """
+
+    def __init__(self, petal: RosemaryPetal, data: Dict[str, Any], target_obj):
+        self.petal = petal
+        self.data = data
+        self.target_obj = target_obj
+        self.executor: ParseExecutor | None = None
+        self.captured_texts = None
+        self.raw_data = None
+        self.text = ''  # the text of the deltas so far
+        self.result = None
+        self.succeed = False
+
+    def feed(self, raw_data: Any, is_extension: bool = False) -> bool:
+        """
+        Parse the response received so far. Returns whether the result changed, i.e. whether it should be emitted.
+        With is_extension, the response is known to start with the last one.
+        """
+        self.raw_data = raw_data
+        if self.petal.parser_rml is None or not isinstance(raw_data, str):
+            self.executor, self.captured_texts = None, None
+            self.result, self.succeed = _parse(self.petal, self.data, raw_data, self.target_obj)
+            return True
+
+        try:
+            if self._extend(raw_data, is_extension):
+                return False
+            if self.petal.target and self.target_obj is None:
+                self.executor.target_obj = eval(self.petal.init)  # the assignments are activated on a new object
+            self.result = self.executor.activate_assignments(self.succeed)
+        except AssertionError as e:
+            LOGGER.info(f'Assertion error when parsing: {e}')
+            self.executor, self.captured_texts, self.result, self.succeed = None, None, None, False
+        except Exception:
+            self.executor, self.captured_texts = None, None  # the parser is run again on the next response
+            raise
+        return True
+
+    def feed_delta(self, delta: Any) -> bool:
+        """
+        Parse the response received so far, given the text which arrived since the last one, as the delta streams of
+        the generators yield. Values which are not texts are parsed as they are.
+        """
+        if not isinstance(delta, str):
+            return self.feed(delta)
+        self.text += delta
+        return self.feed(self.text, True)
+
+    def _extend(self, raw_data: str, is_extension: bool) -> bool:
+        # returns whether the result stays the same
+        executor = self.executor
+        old_length = -1 if executor is None else len(executor.raw_str)
+        if executor is not None and executor.extend(raw_data, is_extension):
+            # the same assignments, only the remaining string of the last one may have grown
+            if len(raw_data) == old_length or not self.succeed or executor.last_target_repr_with_var is None:
+                return True
+            self.captured_texts = executor.captured_texts(self.succeed)
+            return False
+
+        env, self.executor = _parse_executor(self.petal, self.data, raw_data, self.target_obj)
+        succeed = compiled_parser(self.petal)(env, self.executor)
+        captured_texts = self.executor.captured_texts(succeed)
+        if succeed == self.succeed and captured_texts == self.captured_texts:
+            return True
+        self.succeed, self.captured_texts = succeed, captured_texts
+        return False
+
+
 class Rosemary:
 
     def __init__(self, src_path: str):
+        self.src_path = src_path
+        self._reload_lock = Lock()
+        self._watch_thread: Thread | None = None
+        self._stop_watching = Event()
         self._build_from_src(src_path)
 
-    def _build_from_src(self, src_path: str):
-        rosemary_parser = RosemaryParser(src_path)
+    def _build_from_src(self, src_path: str, previous_trees=None):
+        rosemary_parser = RosemaryParser(src_path, previous_trees=previous_trees)
+        self._trees = rosemary_parser.trees
+        self._stamps = rosemary_parser.stamps
+        # swapped at once, so the functions already running keep using the petals they started with
         self.namespace: Namespace = rosemary_parser.namespace
 
+    def validate(self):
+        """
+        Load all the imported files, petals and templates which are only loaded on first use in lazy mode,
+        and raise the errors in any of them, e.g. an import of a missing file or element.
+        """
+        self.namespace.resolve_all()
+
+    def is_outdated(self) -> bool:
+        try:
+            # the stamps of the lazily imported files are added when they are loaded
+            return any(file_stamp(path) != stamp for path, stamp in list(self._stamps.items()))
+        except OSError:
+            return True
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Reload the RML file if it or any file it imports has been modified, and return whether it was reloaded.
+        Only the modified files are parsed again. The files importing them rebuild their namespaces from the trees
+        of the previous load, and the other imported files are taken from the import cache.
+        If the reload fails, the previous namespace is kept.
+        """
+        with self._reload_lock:
+            if not force and not self.is_outdated():
+                return False
+            self._build_from_src(self.src_path, self._trees)
+            return True
+
+    def watch(self, interval: float = 1.0):
+        """
+        Check the RML files in a background thread every interval seconds, and reload them when they are modified.
+        """
+        if self._watch_thread is not None:
+            return
+
+        def watch_files():
+            while not self._stop_watching.wait(interval):
+                try:
+                    if self.reload():
+                        LOGGER.info(f'Reloaded "{self.src_path}".')
+                except Exception as e:
+                    LOGGER.warning(f'Failed to reload "{self.src_path}": {e}')
+
+        self._stop_watching.clear()
+        self._watch_thread = Thread(target=watch_files, name=f'rosemary-watch-{self.src_path}', daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        if self._watch_thread is None:
+            return
+        self._stop_watching.set()
+        self._watch_thread.join()
+        self._watch_thread = None
+
     def get_function(self, function_name: str, signature: Signature = None,
                      model_name: str = None, options: Dict[str, Any] = None,
                      dry_run_val=None, is_async: bool = False,
                      api_key: str = None) -> Callable:
-        petal = self.namespace[function_name]
+        self.namespace[function_name]  # the petal is looked up on each call, to follow the reloads
         default_model_name = model_name
         default_options = options
         default_api_key = api_key
@@ -287,6 +437,7 @@ class Rosemary:
                            **kwargs) -> Any:
                 full_args, options_, max_tries, inf_tries, dry_run_ = \
                     __set_up(kwargs, args, options, max_tries, dry_run)
+                petal = self.namespace[function_name]
 
                 for time_try in range(max_tries):
                     try:
@@ -309,6 +460,7 @@ class Rosemary:
                      **kwargs) -> Any:
                 full_args, options_, max_tries, inf_tries, dry_run_ = \
                     __set_up(kwargs, args, options, max_tries, dry_run)
+                petal = self.namespace[function_name]
 
                 for time_try in range(max_tries):
                     try:
@@ -330,8 +482,9 @@ class Rosemary:
                             model_name: str = None, options: Dict[str, Any] = None,
                             dry_run_generator: Generator = None,
                             is_async: bool = False,
-                            api_key: str = None) -> Callable:
-        petal = self.namespace[function_name]
+                            api_key: str = None,
+                            delta: bool = False) -> Callable:
+        self.namespace[function_name]  # the petal is looked up on each call, to follow the reloads
         default_model_name = model_name
         default_options = options
         default_api_key = api_key
@@ -370,10 +523,11 @@ class Rosemary:
                            max_tries: int = 1, dry_run: bool = None, api_key: str = default_api_key,
                            **kwargs) -> (Generator[Any, None, None]):
                 full_args, options_, dry_run_ = __set_up(kwargs, args, options, max_tries, dry_run)
+                petal = self.namespace[function_name]
 
                 async for data in _generate_stream_async(petal, model_name, options_,
                                                          dry_run_, dry_run_generator,
-                                                         target_obj, full_args, api_key):
+                                                         target_obj, full_args, api_key, delta):
                     if data_type:
                         _check_return_type(data, data_type)
 
@@ -383,10 +537,11 @@ class Rosemary:
                      max_tries: int = 1, dry_run: bool = None, api_key: str = default_api_key,
                      **kwargs) -> (Generator[Any, None, None]):
                 full_args, options_, dry_run_ = __set_up(kwargs, args, options, max_tries, dry_run)
+                petal = self.namespace[function_name]
 
                 for data in _generate_stream(petal, model_name, options_,
                                              dry_run_, dry_run_generator,
-                                             target_obj, full_args, api_key):
+                                             target_obj, full_args, api_key, delta):
                     if data_type:
                         _check_return_type(data, data_type)
 
@@ -395,18 +550,18 @@ class Rosemary:
         return func
 
     def get_formatter(self, function_name: str) -> Callable:
-        petal = self.namespace[function_name]
+        self.namespace[function_name]  # the petal is looked up on each call, to follow the reloads
 
         def formatter(**args):
-            return _format(petal, args)
+            return _format(self.namespace[function_name], args)
 
         return formatter
 
     def get_parser(self, function_name: str) -> Callable:
-        petal = self.namespace[function_name]
+        self.namespace[function_name]  # the petal is looked up on each call, to follow the reloads
 
         def parser(raw_str: str, target_obj=None, **args):
-            return _parse(petal, args, raw_str, target_obj)
+            return _parse(self.namespace[function_name], args, raw_str, target_obj)
 
         return parser
 
@@ -418,9 +573,19 @@ def _build(src_path: str) -> Rosemary:
 _ROSEMARY_INSTANCE = {}
 
 
-def load(name: str, src_path: str):
+def load(name: str, src_path: str, watch: bool = False):
     if src_path not in _ROSEMARY_INSTANCE:
         _ROSEMARY_INSTANCE[name] = _build(src_path)
+    if watch:
+        _ROSEMARY_INSTANCE[name].watch()
+
+
+def reload(name: str) -> bool:
+    return _ROSEMARY_INSTANCE[name].reload()
+
+
+def validate(name: str):
+    _ROSEMARY_INSTANCE[name].validate()
 
 
 def get_function(name: str, function_name: str, signature: Signature = None,
@@ -438,11 +603,56 @@ def get_function_stream(name: str, function_name: str, signature: Signature,
                         dry_run_generator: Generator = None,
                         is_async: bool = False,
                         api_key: str = None,
+                        delta: bool = False,
                         ) -> Callable:
     return _ROSEMARY_INSTANCE[name].get_function_stream(
-        function_name, signature, model_name, options, dry_run_generator, is_async, api_key
+        function_name, signature, model_name, options, dry_run_generator, is_async, api_key, delta
     )
 
 
 def set_dry_run(dry_run: bool = True):
     SETTINGS.set('DRY_RUN', dry_run)
+
+
+def set_rml_parser(algorithm: str = 'earley'):
+    if algorithm not in PARSER_ALGORITHMS:
+        raise ValueError(f'Unknown parser algorithm "{algorithm}", should be one of {PARSER_ALGORITHMS}.')
+    SETTINGS.set('RML_PARSER', algorithm)
+
+
+def set_rml_cache_dir(cache_dir: str | None):
+    """
+    Enable the on-disk cache of parsed RML files in the given directory, or disable it by passing None.
+    """
+    SETTINGS.set('RML_CACHE_DIR', cache_dir)
+
+
+def set_import_cache_size(size: int):
+    """
+    Set the maximum number of imported RML files kept in memory and shared by all the loaded files,
+    or disable the cache by passing 0.
+    """
+    SETTINGS.set('IMPORT_CACHE_SIZE', size)
+    if size <= 0:
+        IMPORT_CACHE.clear()
+
+
+def set_parse_workers(workers: int):
+    """
+    Parse the files imported by a loaded RML file in a pool of the given number of processes,
+    or in the current process only by passing 1.
+    The pool is only used for the imported files which are large enough to be worth it.
+    Its processes are spawned, so the main module of the program has to be importable without side effects,
+    i.e. guarded by if __name__ == '__main__'.
+    """
+    SETTINGS.set('PARSE_WORKERS', workers)
+
+
+def set_lazy_parse(lazy: bool = True):
+    """
+    Only index the top-level petals and templates of the loaded RML files, and parse each of them the first time
+    it is used. The imported files are likewise only loaded once a name is looked up in them.
+    The errors in their bodies and in the imports are then raised when they are used instead of when they are loaded,
+    or by an explicit call to validate().
+    """
+    SETTINGS.set('LAZY_PARSE', lazy)
@@ -0,0 +1,202 @@
+"""
+Differential tests of compiled petals against the interpreter
+"""
+import asyncio
+import copy
+import os
+from inspect import Signature
+from pathlib import Path
+
+import pytest
+
+from src.rosemary_ai.parser.compiler import compiled_formatter, compiled_parser, _no_op  # noqa
+from src.rosemary_ai.parser.environment import build_environment
+from src.rosemary_ai.parser.executor import FormatExecutor, ParseExecutor
+from src.rosemary_ai.parser.traverse import traverse_all
+from src.rosemary_ai import rosemary
+from src.rosemary_ai.models.generator import AbstractContentGenerator, accumulate_deltas
+from src.rosemary_ai.rosemary import _build, _parse as parse_petal, _ParseStream, Rosemary
+
+
+def _path(path: str) -> str:
+    return str(Path(os.path.abspath(__file__)).parent / path)
+
+
+@pytest.fixture(scope='module')
+def compiler_rml() -> Rosemary:
+    return _build(_path('compiler.rml'))
+
+
+def _run(func):
+    try:
+        return repr(func())
+    except Exception as e:
+        return type(e).__name__, str(e)
+
+
+def _format(petal, args, compiled: bool):
+    env = build_environment(petal, dict(args))
+    executor = FormatExecutor()
+    if compiled:
+        succeed = compiled_formatter(petal)(env, executor)
+    else:
+        succeed = traverse_all(env, petal.formatter_rml.children, executor)
+    return succeed, executor.get_result()
+
+
+def _parse(petal, raw_str, compiled: bool):
+    target_obj = eval(petal.init)
+    env = build_environment(petal, {petal.target: target_obj})
+    executor = ParseExecutor(raw_str, petal.target, target_obj, petal.is_parse_strict)
+    if compiled:
+        succeed = compiled_parser(petal)(env, executor)
+    else:
+        succeed = traverse_all(env, petal.parser_rml.children, executor)
+    return succeed, executor.activate_assignments(succeed)
+
+
+FORMAT_CASES = [
+    ('chat', {'name': 'Alice', 'items': [1, 2], 'flag': True}),
+    ('chat', {'name': 'Bob', 'items': [], 'flag': False}),
+    ('plain', {'a': 'A', 'b': '', 'n': 3}),
+    ('plain', {'a': 'B', 'b': 'bb', 'n': 0}),
+    ('struct', {'xs': [1, 2], 'd': {'q': 1}}),
+    ('struct', {'xs': [], 'd': None}),
+    ('common_templates', {'p': 'cat'}),
+    ('inf_slot_in_for', {}),
+    ('scopes', {'i': 7, 'n': 1}),
+    ('constants', {'a': 'A'}),
+    ('constants', {'a': 'error'}),
+    *[('errors', {'case': case}) for case in ['no_cond', 'unknown_tag', 'unknown_slot', 'br', 'empty_var',
+                                              'bad_range', 'bad_eval', 'not_template', 'inf_slot', 'optional']],
+]
+
+PARSE_CASES = [
+    ('parse_simple', 'Name: Bob\nAge: 3'),
+    ('parse_simple', 'Name: Bob\nAge: x'),
+    ('parse_simple', 'Nam'),
+    ('parse_loop', 'Items:\n- a;\n- b;\nEND'),
+    ('parse_loop', 'Items: - a; - b'),
+    ('parse_loop', 'nothing'),
+    ('parse_optional', 'A=1|C=3|tail:zz'),
+    ('parse_optional', 'B=2|tail:'),
+    ('parse_optional', 'xx'),
+]
+
+
+@pytest.mark.parametrize('petal_name, args', FORMAT_CASES)
+def test_format(compiler_rml, petal_name, args):
+    petal = compiler_rml.namespace[petal_name]
+
+    expected = _run(lambda: _format(petal, args, False))
+    assert _run(lambda: _format(petal, args, True)) == expected
+    assert _run(lambda: _format(petal, args, True)) == expected  # run again with the linked template calls
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+def test_scopes(compiler_rml, compiled):
+    petal = compiler_rml.namespace['scopes']
+    args = {'i': 7, 'n': 1}
+
+    assert _format(petal, args, compiled) == (True, '7|01|7|51|a71;b71;|[aaa][bbb]|7')
+    assert args == {'i': 7, 'n': 1}
+
+
+def test_constant_arguments(compiler_rml):
+    _format(compiler_rml.namespace['constants'], {'a': 'A'}, True)
+
+    # the bodies are specialized for the constant arguments, and the conditions on them are folded
+    opt_bodies = compiler_rml.namespace['opt'].compiled_bodies
+    assert opt_bodies[(True, (('name', "'k2'"), ('value', 'None')))] is _no_op
+    assert opt_bodies[(True, (('value', '256'),))] is not _no_op  # calls are not evaluated at load time
+    assert (True, (('name', "'k3'"),)) in opt_bodies
+    # the arguments may be reassigned in the body, so it is not specialized
+    assert list(compiler_rml.namespace['assigned'].compiled_bodies) == [(True, ())]
+
+
+@pytest.mark.parametrize('petal_name, raw_str', PARSE_CASES)
+def test_parse(compiler_rml, petal_name, raw_str):
+    petal = compiler_rml.namespace[petal_name]
+
+    for prefix_size in range(len(raw_str) + 1):
+        prefix = raw_str[:prefix_size]
+        assert _run(lambda: _parse(petal, prefix, True)) == _run(lambda: _parse(petal, prefix, False))
+
+
+def _feed(parse_stream, raw_str, emitted):
+    if parse_stream.feed(raw_str):
+        emitted.append(repr((parse_stream.result, parse_stream.succeed)))
+    return parse_stream.result, parse_stream.succeed
+
+
+@pytest.mark.parametrize('petal_name, raw_str', PARSE_CASES)
+def test_parse_stream(compiler_rml, petal_name, raw_str):
+    petal = compiler_rml.namespace[petal_name]
+    parse_stream = _ParseStream(petal, {}, None)
+    emitted = []
+
+    for prefix_size in range(len(raw_str) + 1):
+        prefix = raw_str[:prefix_size]
+        assert _run(lambda: _feed(parse_stream, prefix, emitted)) == _run(lambda: parse_petal(petal, {}, prefix))
+
+    # only the changed results are emitted
+    assert all(result != next_result for result, next_result in zip(emitted, emitted[1:]))
+
+
+@pytest.mark.parametrize('petal_name, raw_str', PARSE_CASES)
+def test_parse_delta_stream(compiler_rml, petal_name, raw_str):
+    petal = compiler_rml.namespace[petal_name]
+    parse_stream = _ParseStream(petal, {}, None)
+
+    def feed_delta(delta):
+        parse_stream.feed_delta(delta)
+        return parse_stream.result, parse_stream.succeed
+
+    # an empty delta first, then one character at a time
+    for prefix_size in range(len(raw_str) + 1):
+        delta = raw_str[prefix_size - 1:prefix_size] if prefix_size else ''
+        assert _run(lambda: feed_delta(delta)) == _run(lambda: parse_petal(petal, {}, raw_str[:prefix_size]))
+
+
+class _DeltaGenerator(AbstractContentGenerator[str]):
+    native_delta_stream = True
+
+    def __init__(self, deltas):
+        super().__init__('test')
+        self.deltas = deltas
+
+    def generate(self, data, options, dry_run, api_key=None):
+        pass
+
+    async def generate_async(self, data, options, dry_run, api_key=None):
+        pass
+
+    def generate_stream(self, data, options, dry_run, api_key=None):
+        return accumulate_deltas(self.deltas)
+
+    async def generate_stream_async(self, data, options, dry_run, api_key=None):
+        for text in accumulate_deltas(self.deltas):
+            yield text
+
+    def generate_delta_stream(self, data, options, dry_run, api_key=None):
+        yield from self.deltas
+
+    async def generate_delta_stream_async(self, data, options, dry_run, api_key=None):
+        for delta in self.deltas:
+            yield delta
+
+
+def test_function_stream_delta(compiler_rml, monkeypatch):
+    deltas = ['Items:\n', '- a', ';\n- ', 'b;', '\nEND']
+    monkeypatch.setattr(rosemary, 'get_generator', lambda model_name: _DeltaGenerator(deltas))
+
+    def stream(delta: bool, is_async: bool = False):
+        return compiler_rml.get_function_stream('parse_loop', Signature(), is_async=is_async, delta=delta)()
+
+    async def collect(results):
+        return [copy.copy(result) async for result in results]
+
+    expected = [copy.copy(result) for result in stream(False)]
+    assert expected[-1] == [(0, ' a'), (1, ' b')]
+    assert [copy.copy(result) for result in stream(True)] == expected
+    assert asyncio.run(collect(stream(True, True))) == expected
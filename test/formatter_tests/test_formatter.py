@@ -3,9 +3,14 @@ Tests for formatters of petals
 """
 import os
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
+from src.rosemary_ai._global_settings import SETTINGS
+from src.rosemary_ai.exceptions import ExecutionException
+from src.rosemary_ai.parser.data_expression import DataExpression, new_context
+from src.rosemary_ai.parser.executor import FormatExecutor
 from src.rosemary_ai.rosemary import _build, Rosemary
 
 
@@ -28,3 +33,68 @@ def test_fixed_str_formatter(simple_rml):
     format = simple_rml.get_formatter('fixed_str')
 
     assert format() == 'fixed'
+
+
+@pytest.mark.parametrize('algorithm, caption', [('earley', 'caption Aand B'), ('lalr', 'caption A and B')])
+def test_whitespace_between_placeholders(monkeypatch, algorithm, caption):
+    # the Earley parser splits the text after an element in two, and the second one is dedented as a first line
+    monkeypatch.setitem(SETTINGS._settings, 'RML_PARSER', algorithm)
+    rosemary = _build(_path('simple.rml'))
+
+    assert rosemary.get_formatter('placeholders_after_image')(a='A', b='B')[1] == caption
+    # the leading whitespace of the first text after the placeholders is removed as the indentation of the first line
+    assert rosemary.get_formatter('placeholders')(a='A', b='B') == 'Aand B, AB A  B'
+
+
+class _Raising:
+    @property
+    def value(self):
+        raise ValueError('no value')
+
+
+@pytest.mark.parametrize('source', ['user', 'user.name', 'user.name.upper', 'user.age', 'd.name', 'len', 'undefined',
+                                    'raising.value', 'None', 'user.None', '_', 'user .name', 'user.name.__class__'])
+def test_simple_expressions(source):
+    context = new_context({'user': SimpleNamespace(name='Alice'), 'd': {'name': 'x'}, 'raising': _Raising(), '_': 1})
+
+    def evaluate(expression: DataExpression):
+        try:
+            return expression.evaluate(context)
+        except ExecutionException as e:
+            return str(e)
+
+    expression = DataExpression(source)
+    reference = DataExpression(source)
+    reference._name = None  # always evaluated by eval
+
+    assert evaluate(expression) == evaluate(reference)
+
+
+def test_format_executor_texts():
+    executor = FormatExecutor()
+    executor.begin_scope('list')
+    for texts in [['a', 'b'], ['c']]:
+        executor.begin_scope('list_item')
+        for text in texts:
+            executor.execute(text, {})
+        executor.end_scope('list_item')
+    executor.execute('d', {})  # concatenated to the last item of the list
+    executor.execute(b'e', {})
+    executor.execute('f', {})
+
+    assert executor.get_result() == ['ab', 'cd', b'e', 'f']
+    executor.execute('g', {})
+    assert executor.get_result() == ['ab', 'cd', b'e', 'fg']
+
+
+def test_nested_list_values(simple_rml):
+    format = simple_rml.get_formatter('list_value')
+
+    nested = [['a'], [['b'], 'c']]
+    result = format(v=nested)
+    assert result == [nested, 'text'] and result[0] is nested
+    assert nested == [['a'], [['b'], 'c']]
+
+    recursive = [1]
+    recursive.append(recursive)
+    assert format(v=recursive)[0] is recursive
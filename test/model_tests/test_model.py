@@ -1,3 +1,86 @@
 """
 Tests for model generators
-"""
\ No newline at end of file
+"""
+import asyncio
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from src.rosemary_ai.models import claude_generator, gpt_generator
+from src.rosemary_ai.models.claude_generator import ClaudeChatGenerator
+from src.rosemary_ai.models.generator import AbstractContentGenerator, accumulate_deltas
+from src.rosemary_ai.models.gpt_generator import GPTChatGenerator
+
+TEXTS = ['', 'this', 'this is', 'this is a', 'this is a test']
+DELTAS = ['', 'this', ' is', ' a', ' test']
+
+
+class _CumulativeGenerator(AbstractContentGenerator[str]):
+    def __init__(self):
+        super().__init__('test')
+
+    def generate(self, data, options, dry_run, api_key=None):
+        return TEXTS[-1]
+
+    async def generate_async(self, data, options, dry_run, api_key=None):
+        return TEXTS[-1]
+
+    def generate_stream(self, data, options, dry_run, api_key=None):
+        yield from TEXTS
+
+    async def generate_stream_async(self, data, options, dry_run, api_key=None):
+        for text in TEXTS:
+            yield text
+
+
+async def _collect(stream):
+    return [value async for value in stream]
+
+
+def test_delta_stream():
+    generator = _CumulativeGenerator()
+    assert not generator.native_delta_stream
+
+    assert list(generator.generate_delta_stream({}, {}, False)) == DELTAS
+    assert asyncio.run(_collect(generator.generate_delta_stream_async({}, {}, False))) == DELTAS
+    assert list(accumulate_deltas(DELTAS)) == TEXTS
+
+
+def test_native_delta_stream(monkeypatch):
+    class _Messages:
+        @contextmanager
+        def stream(self, **kwargs):
+            yield type('Stream', (), {'text_stream': iter(DELTAS[1:])})
+
+    monkeypatch.setattr(claude_generator, 'Anthropic', lambda api_key: type('Client', (), {'messages': _Messages()}))
+
+    def data():
+        return {'messages': [{'role': 'user', 'content': 'test'}]}
+
+    generator = ClaudeChatGenerator('claude')
+    assert generator.native_delta_stream
+    assert list(generator.generate_delta_stream(data(), {}, False, 'key')) == DELTAS[1:]
+    assert list(generator.generate_stream(data(), {}, False, 'key')) == TEXTS[1:]
+
+
+def test_gpt_stream(monkeypatch):
+    def chunk(content, finish_reason=None):
+        delta = SimpleNamespace(content=content, tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+    chunks = [chunk('')] + [chunk(delta) for delta in DELTAS[1:]] + [chunk(None, 'stop')]
+
+    class _Completions:
+        def create(self, **kwargs):
+            return iter(chunks)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=_Completions()))
+    monkeypatch.setattr(gpt_generator, 'OpenAI', lambda api_key: client)
+
+    def data():
+        return {'messages': [{'role': 'user', 'content': 'test'}]}
+
+    generator = GPTChatGenerator('gpt')
+    assert generator.native_delta_stream
+    # the first chunk has no content, for which the stream yields the tool calls so far
+    assert list(generator.generate_stream(data(), {}, False, 'key')) == [[]] + TEXTS[1:]
+    assert list(generator.generate_delta_stream(data(), {}, False, 'key')) == DELTAS[1:]
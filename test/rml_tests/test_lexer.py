@@ -0,0 +1,124 @@
+"""
+Conformance tests of the hand-written RML lexer against the contextual lexer Lark generates from the grammar
+"""
+import random
+from pathlib import Path
+
+import pytest
+from lark import Lark
+from lark.exceptions import UnexpectedInput, UnexpectedEOF
+
+from src.rosemary_ai._utils.file_utils import read_and_close_file_to_root, _get_proj_root  # noqa
+from src.rosemary_ai.parser.rml_parser import get_lark_parser, GRAMMAR_PATH
+from src.rosemary_ai.parser.transformer import TreeToRmlTreeTransformer
+
+_REFERENCE_PARSER = Lark(read_and_close_file_to_root(GRAMMAR_PATH), start='rosemary', parser='lalr',
+                         transformer=TreeToRmlTreeTransformer(True))
+
+SNIPPETS = [
+    '', '  ', '<a/>', '  <a/>\n', '<a>  hi  </a>', '< a . b\n>x</ a.b >', '<a b = " x y " c/>', '<a b="" />',
+    '<a>{ }</a>', '<a>{}</a>', '<a>{x.y[0]}</a>', '<a>{a}}}</a>', '<a>{{x}} <<b>> </a>', '<a>x<<<b/></a>',
+    '<a>[<RAW>[  <b>{x}</b> ]<RAW>]</a>', '<a>[<RAW>[]<RAW>]</a>', '<a> <!-- c --> t<!----></a>', '<!-- <a> -->',
+    '<a k="\\"q\\" \\\\"/>', '<a>\r\n\tx\f</a>',
+    # invalid
+    '<a>x}</a>', '<a>x>y</a>', '<a>x]<RAW>]</a>', '<a>[<RAW>[x[<RAW>[</a>', '<a><!--></a>', '<a k="\\n"/>', '<a>{x',
+    '<a>{x{y}}</a>', '<a k="v/>', '<a></b>', '<1/>', '<a/', 'text outside <a/>',
+]
+
+# inputs ending in the middle of a placeholder, an attribute value, a tag or a comment
+TRUNCATED = ['<a>{x', '<a>{', '<a k="v/>', '<a k="v', '<a k', '<a', '<a>x<', '<!-- x', '<a>[<RAW>[x',
+             '<petal name="p"><formatter>{x</formatter></petal>']
+
+_FRAGMENTS = ['<', '>', '</', '/>', '{', '}', '{{', '}}', '<<', '>>', '[<RAW>[', ']<RAW>]', '<!--', '-->', '"', '=', '.',
+              '\\', '[', ']', '/', '!', ' ', '\n', '\t', 'x', 'RAW']
+_TEXTS = ['text', ' ', '\n    ', '\t', '<<', '>>', '{{', '}}', '[', ']', '"', '=', '/', '!', '\\', '.', '--', 'RAW']
+
+
+def _error(e: Exception) -> str:
+    # the lexers may tell the errors of the input apart differently, but both raise errors of Lark for them
+    return 'UnexpectedInput' if isinstance(e, UnexpectedInput) else type(e).__name__
+
+
+def _tokens(parser: Lark, src: str):
+    tokens = []
+    try:
+        for token in parser.parse_interactive(src).iter_parse():
+            tokens.append((token.type, str(token), token.start_pos, token.line, token.column,
+                           token.end_line, token.end_column, token.end_pos))
+    except Exception as e:  # noqa
+        tokens.append(_error(e))
+    try:
+        result = str(parser.parse(src))
+    except Exception as e:  # noqa
+        result = ('error', _error(e))
+    return tokens, result
+
+
+def _assert_conforms(src: str):
+    expected_tokens, expected_result = _tokens(_REFERENCE_PARSER, src)
+    tokens, result = _tokens(get_lark_parser('lalr'), src)
+    assert result == expected_result
+    if not isinstance(expected_result, tuple):
+        assert tokens == expected_tokens
+
+
+def _random_element(rng: random.Random, depth: int) -> str:
+    name = rng.choice(['a', 'b.c', 'for', '_x-1'])
+    attributes = ''.join(rng.choice([' k', ' k="v"', ' k=""', ' k="\\"\\\\ x"', '\n\tk = "v"'])
+                         for _ in range(rng.randrange(3)))
+    if depth == 0 or rng.random() < 0.3:
+        return f'<{name}{attributes}{rng.choice(["/>", " />"])}'
+    body = ''.join(_random_body_item(rng, depth - 1) for _ in range(rng.randrange(5)))
+    return f'<{name}{attributes}>{body}</{name}>'
+
+
+def _random_body_item(rng: random.Random, depth: int) -> str:
+    match rng.randrange(5):
+        case 0:
+            return _random_element(rng, depth)
+        case 1:
+            return '{' + ''.join(rng.choice(['x', ' ', '.y', '[0]', '{{', '}}', '<', '"']) for _ in range(3)) + '}'
+        case 2:
+            return '[<RAW>[' + ''.join(rng.choice(['<b>', '{x}', ' ', '\n', ']', '[']) for _ in range(3)) + ']<RAW>]'
+        case 3:
+            return '<!--' + ''.join(rng.choice(['<a>', '--', '>', ' ']) for _ in range(3)) + '-->'
+        case _:
+            return ''.join(rng.choice(_TEXTS) for _ in range(rng.randint(1, 6)))
+
+
+def _rml_files():
+    return sorted(set(_get_proj_root().glob('**/*.rml')) | set(Path(__file__).parent.parent.glob('**/*.rml')))
+
+
+@pytest.mark.parametrize('src', SNIPPETS)
+def test_lexer_snippets(src):
+    _assert_conforms(src)
+
+
+@pytest.mark.parametrize('src', TRUNCATED)
+def test_lexer_truncated(src):
+    _assert_conforms(src)
+
+    with pytest.raises(UnexpectedInput) as error:
+        get_lark_parser('lalr').parse(src)
+    if isinstance(error.value, UnexpectedEOF):  # raised by the lexer, where the input ends
+        assert (error.value.line, error.value.column) == (1, len(src) + 1)
+
+
+def test_lexer_rml_files():
+    files = _rml_files()
+    assert files
+    for path in files:
+        _assert_conforms(path.read_text(encoding='utf-8'))
+
+
+def test_lexer_random():
+    rng = random.Random(0)
+    for _ in range(1000):
+        src = ''.join(_random_element(rng, 3) if rng.random() < 0.7 else rng.choice([' ', '\n', '<!-- x -->'])
+                      for _ in range(3))
+        _assert_conforms(src)
+        # mutations of valid code, which are mostly invalid
+        i = rng.randrange(len(src) + 1)
+        _assert_conforms(src[:i] + rng.choice(_FRAGMENTS) + src[i:])
+        _assert_conforms(src[:i])
@@ -6,13 +6,35 @@ from pathlib import Path
 
 import pytest
 
-from src.rosemary_ai.rosemary import _build, Rosemary
+from src.rosemary_ai._global_settings import SETTINGS
+from src.rosemary_ai._logger import LOGGER
+from src.rosemary_ai.exceptions import RmlSyntaxException
+from src.rosemary_ai.parser import rml_cache
+from src.rosemary_ai.parser.import_cache import IMPORT_CACHE
+from src.rosemary_ai.parser.namespace import Namespace, LazyValue
+from src.rosemary_ai.parser.rml_parser import RosemaryParser, get_lark_parser, PARSER_ALGORITHMS, \
+    MIN_PARALLEL_PARSE_SIZE, GRAMMAR_PATH, _TREE_CACHES
+from src.rosemary_ai.parser.rml_cache import RmlTreeCache
+from src.rosemary_ai.rosemary import _build, _format, Rosemary, set_rml_cache_dir, set_import_cache_size, \
+    set_parse_workers, set_lazy_parse
 
 
 def _path(path: str) -> str:
     return str(Path(os.path.abspath(__file__)).parent / path)
 
 
+@pytest.fixture(autouse=True)
+def isolated_settings(monkeypatch):
+    # the settings changed by a test are restored to their values before it, and the caches shared by all the loads
+    # are emptied around it, so that no test depends on the ones run before
+    monkeypatch.setattr(SETTINGS, '_settings', dict(SETTINGS._settings))
+    _TREE_CACHES.clear()
+    IMPORT_CACHE.clear()
+    yield
+    _TREE_CACHES.clear()
+    IMPORT_CACHE.clear()
+
+
 def test_not_found():
     with pytest.raises(FileNotFoundError):
         rosemary: Rosemary = _build(_path('not_exist.rml'))
@@ -22,3 +44,210 @@ def test_empty():
     rosemary: Rosemary = _build(_path('empty.rml'))
     assert rosemary is not None
     assert len(rosemary.namespace) == 0
+
+
+def test_text_outside_element():
+    with pytest.raises(RmlSyntaxException):
+        _build(_path('text_outside.rml'))
+
+
+def test_invalid_attributes(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(LOGGER, 'warning', warnings.append)
+
+    rosemary = _build(_path('invalid_attributes.rml'))
+    assert sorted(warnings) == [
+        'Attribute "b" is not used in <pair>. Did you mean: "a"?',
+        'Attribute "rnage" is not used in <for>.',
+        'Attribute "tyr" is not used in <for>.',
+        'Attribute "v" is not used in <item>. Did you mean: "k"?',
+    ]
+
+    warnings.clear()
+    rosemary.get_formatter('attrs')(xs=[1, 2])
+    assert warnings == []
+
+
+def test_namespace_lookup():
+    root = Namespace()
+    corolla = Namespace(root)
+    root.append('corolla', corolla)
+    root.append('x', 1)
+
+    assert corolla['x'] == 1
+    assert root['corolla.x'] == 1
+    assert root[['corolla', 'x']] == 1
+
+    corolla.append('x', 2)  # shadows the name of the parent
+    assert corolla['x'] == 2
+    assert root['corolla.x'] == 2
+    assert root['x'] == 1
+
+    with pytest.raises(KeyError):
+        _ = root['y']
+    root.append('y', 3)
+    assert corolla['y'] == 3
+
+
+def test_namespace_invalidation():
+    root = Namespace()
+    corolla = Namespace(root)
+    root.append('corolla', corolla)
+    imported = Namespace()
+    importing = Namespace()
+    importing.append_import(LazyValue(lambda: imported))
+    unrelated = Namespace()
+    root.append('x', 1)
+    imported.append('z', 1)
+    importing.append('w', 0)
+    assert len(importing) == len(importing.items()) == 2  # the imported names are counted as well
+
+    assert corolla['x'] == 1 and importing['z'] == 1 and root['corolla.x'] == 1
+    unrelated.append('x', 2)  # other namespaces keep their resolved names
+    assert corolla._resolved and importing._resolved and root._resolved
+
+    imported.append('z', 2)  # the namespaces importing it are invalidated
+    assert importing['z'] == 2 and corolla._resolved
+    root.append('x', 3)  # and the children of the parent
+    assert corolla['x'] == 3 and importing._resolved
+    corolla.append('x', 4)  # and the namespaces looking up a name inside it
+    assert root['corolla.x'] == 4 and root['x'] == 3
+
+
+@pytest.mark.parametrize('algorithm', PARSER_ALGORITHMS)
+def test_parser_algorithm(algorithm):
+    rosemary_parser = RosemaryParser(_path('empty.rml'), algorithm)
+    assert rosemary_parser.parser is get_lark_parser(algorithm)
+
+
+def test_tree_cache(tmp_path, monkeypatch):
+    set_rml_cache_dir(str(tmp_path))
+    _build(_path('../formatter_tests/simple.rml'))
+    assert len(list(tmp_path.iterdir())) == 1
+
+    def fail_parse(*args, **kwargs):
+        raise AssertionError('The cached tree should be used')
+
+    monkeypatch.setattr(get_lark_parser(), 'parse', fail_parse)
+    rosemary = _build(_path('../formatter_tests/simple.rml'))
+    assert rosemary.get_formatter('fixed_str')() == 'fixed'
+
+
+def test_tree_cache_key(tmp_path, monkeypatch):
+    def entry_path():
+        rml_cache._sources_digest.cache_clear()
+        return RmlTreeCache(tmp_path, GRAMMAR_PATH)._entry_path('<template name="t">t</template>', 'earley')
+
+    key = entry_path()
+    # the trees may be built differently by a modified checkout, whose package version is the same
+    monkeypatch.setattr(rml_cache, '_TREE_BUILDING_MODULES', rml_cache._TREE_BUILDING_MODULES[:-1])
+    try:
+        assert entry_path() != key
+    finally:
+        rml_cache._sources_digest.cache_clear()
+
+
+def test_import_cache(tmp_path):
+    (tmp_path / 'main.rml').write_text('<import path="lib.rml" as="lib"/>')
+    (tmp_path / 'lib.rml').write_text('<import path="base.rml"/><template name="t">lib</template>')
+    (tmp_path / 'base.rml').write_text('<template name="b">base</template>')
+
+    first = _build(str(tmp_path / 'main.rml'))
+    second = _build(str(tmp_path / 'main.rml'))
+    assert first.namespace['lib'] is second.namespace['lib']
+
+    (tmp_path / 'base.rml').write_text('<template name="b">base, modified</template>')
+    third = _build(str(tmp_path / 'main.rml'))
+    assert third.namespace['lib'] is not first.namespace['lib']
+    assert third.namespace['lib.b'].element.children[0].text_tokens[0].text == 'base, modified'
+
+
+def test_reload(tmp_path, monkeypatch):
+    (tmp_path / 'main.rml').write_text('<import path="lib.rml"/><import path="other.rml"/>'
+                                       '<petal name="p"><formatter><t/><o/></formatter></petal>')
+    (tmp_path / 'lib.rml').write_text('<import path="base.rml"/><template name="t"><b/></template>')
+    (tmp_path / 'base.rml').write_text('<template name="b">base</template>')
+    (tmp_path / 'other.rml').write_text('<template name="o">other</template>')
+
+    rosemary = _build(str(tmp_path / 'main.rml'))
+    formatter = rosemary.get_formatter('p')
+    assert formatter() == 'baseother'
+    assert not rosemary.reload()
+
+    parsed_sources = []
+    parse = get_lark_parser().parse
+    monkeypatch.setattr(get_lark_parser(), 'parse', lambda src: parsed_sources.append(src) or parse(src))
+
+    (tmp_path / 'base.rml').write_text('<template name="b">modified</template>')
+    assert rosemary.reload()
+    assert formatter() == 'modifiedother'
+    assert parsed_sources == ['<template name="b">modified</template>']
+
+
+def test_parallel_parse(tmp_path, monkeypatch):
+    tmp_path = tmp_path.resolve()
+    monkeypatch.setitem(MIN_PARALLEL_PARSE_SIZE, 'earley', 0)  # parse the small files in the pool as well
+    (tmp_path / 'main.rml').write_text('<import path="a.rml"/><import path="b.rml"/><corolla name="c">'
+                                       '<import path="sub/c.rml"/></corolla>'
+                                       '<petal name="p"><formatter><a/><b/><c.c/></formatter></petal>')
+    (tmp_path / 'a.rml').write_text('<import path="sub/c.rml"/><template name="a">a<c/></template>')
+    (tmp_path / 'b.rml').write_text('<template name="b">b</template>')
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'c.rml').write_text('<import path="../b.rml"/><template name="c"><b/>c</template>')
+
+    set_import_cache_size(0)
+    set_parse_workers(2)
+    rosemary_parser = RosemaryParser(str(tmp_path / 'main.rml'))
+
+    assert set(rosemary_parser.prefetched_trees) == {tmp_path / 'a.rml', tmp_path / 'b.rml',
+                                                     tmp_path / 'sub' / 'c.rml'}
+    assert _format(rosemary_parser.namespace['p'], {}) == 'abcbbc'
+
+
+def test_lazy_parse(tmp_path):
+    (tmp_path / 'main.rml').write_text('<petal name="p" param="x"><formatter><t/>{x}</formatter></petal>'
+                                       '<petal name="broken"><formatter>{x</formatter></petal>'
+                                       '<corolla name="c"><template name="u">u</template></corolla>'
+                                       '<template name="t">t<c.u/></template>')
+
+    set_lazy_parse(True)
+    rosemary = _build(str(tmp_path / 'main.rml'))
+
+    definitions = dict(rosemary.namespace.items())
+    assert all(isinstance(definitions[name], LazyValue) for name in ['p', 'broken', 't'])
+    assert not isinstance(definitions['c']['u'], LazyValue)
+
+    assert _format(rosemary.namespace['p'], {'x': 1}) == 'tu1'
+    assert repr(definitions['t']) != 'LazyValue<unresolved>'  # resolved when p is checked
+    assert repr(definitions['broken']) == 'LazyValue<unresolved>'
+    with pytest.raises(RmlSyntaxException):
+        _ = rosemary.namespace['broken']
+
+
+def test_lazy_import(tmp_path):
+    (tmp_path / 'lib.rml').write_text('<template name="t">t</template><template name="u">u</template>')
+    (tmp_path / 'broken.rml').write_text('<template name="t">{x</template>')
+    (tmp_path / 'main.rml').write_text('<import path="lib.rml"/><import path="lib.rml" as="lib"/>'
+                                       '<import path="lib.rml" element="u" as="v"/>'
+                                       '<import path="missing.rml" as="missing"/>'
+                                       '<import path="broken.rml" element="t" as="broken"/>'
+                                       '<petal name="p"><formatter><t/><lib.u/><v/></formatter></petal>')
+
+    set_lazy_parse(True)
+    rosemary = _build(str(tmp_path / 'main.rml'))
+
+    assert list(rosemary._stamps) == [tmp_path / 'main.rml']
+    assert rosemary.get_formatter('p')() == 'tuu'
+    assert sorted(path.name for path in rosemary._stamps) == ['lib.rml', 'main.rml']
+    assert not rosemary.is_outdated()
+
+    with pytest.raises(RmlSyntaxException) as exc_info:
+        rosemary.validate()
+    assert isinstance(exc_info.value.__cause__, FileNotFoundError)
+    (tmp_path / 'missing.rml').write_text('<template name="m">m</template>')
+    with pytest.raises(RmlSyntaxException):
+        rosemary.validate()
+    (tmp_path / 'broken.rml').write_text('<template name="t">{x}</template>')
+    assert rosemary.reload()
+    rosemary.validate()
+    assert rosemary.namespace['missing.m'] is not None